@@ -3,9 +3,9 @@ from utils.logger import App_Logger
 from utils.read_params import get_log_dic, read_params
 
 
-class Data_Getter_Train:
+class Data_Getter_Pred:
     """
-    Description :   This class shall be used for obtaining the df from the input files s3 bucket where the training file is present
+    Description :   This class shall be used for obtaining the df from the input files s3 bucket where the prediction file is present
 
     Version     :   1.0
     Revisions   :   None
@@ -16,10 +16,12 @@ class Data_Getter_Train:
 
         self.log_file = log_file
 
-        self.train_csv_file = self.config["export_csv_file"]["pred"]
+        self.pred_csv_file = self.config["export_csv_file"]["pred"]
 
         self.input_files_bucket = self.config["s3_bucket"]["input_files_bucket"]
 
+        self.chunksize = self.config["streaming_prediction"]["chunksize"]
+
         self.s3 = S3_Operation()
 
         self.log_writer = App_Logger()
@@ -43,7 +45,7 @@ class Data_Getter_Train:
 
         try:
             df = self.s3.read_csv(
-                self.train_csv_file, self.input_files_bucket, self.log_file
+                self.pred_csv_file, self.input_files_bucket, self.log_file
             )
 
             self.log_writer.start_log("exit", **log_dic)
@@ -52,3 +54,38 @@ class Data_Getter_Train:
 
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
+
+    def get_data_chunks(self, chunksize=None):
+        """
+        Method Name :   get_data_chunks
+        Description :   This method reads the data from the input files s3 bucket where the prediction file is stored,
+                        as an iterator of chunks. chunksize defaults to streaming_prediction chunksize in params.yaml
+        Output      :   An iterator of pandas dataframes
+
+        On Failure  :   Write an exception log and then raise exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_data_chunks.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            chunksize = self.chunksize if chunksize is None else chunksize
+
+            chunks = self.s3.read_csv_chunks(
+                self.pred_csv_file, self.input_files_bucket, self.log_file, chunksize
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return chunks
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
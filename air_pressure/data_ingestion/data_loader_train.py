@@ -20,6 +20,8 @@ class Data_Getter_Train:
 
         self.input_files_bucket = self.config["s3_bucket"]["input_files_bucket"]
 
+        self.chunksize = self.config["chunked_preprocessing"]["chunksize"]
+
         self.s3 = S3_Operation()
 
         self.log_writer = App_Logger()
@@ -52,3 +54,38 @@ class Data_Getter_Train:
 
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
+
+    def get_data_chunks(self, chunksize=None):
+        """
+        Method Name :   get_data_chunks
+        Description :   This method reads the data from the input files s3 bucket where the training file is stored,
+                        as an iterator of chunks. chunksize defaults to chunked_preprocessing chunksize in params.yaml
+        Output      :   An iterator of pandas dataframes
+
+        On Failure  :   Write an exception log and then raise exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_data_chunks.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            chunksize = self.chunksize if chunksize is None else chunksize
+
+            chunks = self.s3.read_csv_chunks(
+                self.train_csv_file, self.input_files_bucket, self.log_file, chunksize
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return chunks
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
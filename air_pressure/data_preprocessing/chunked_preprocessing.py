@@ -0,0 +1,423 @@
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.decomposition import IncrementalPCA
+from sklearn.impute import KNNImputer
+from sklearn.preprocessing import StandardScaler
+
+from air_pressure.data_preprocessing.missing_indicator import Missing_Indicator
+from air_pressure.data_preprocessing.preprocessing import Preprocessor
+from air_pressure.data_preprocessing.preprocessing_pipeline import (
+    Preprocessing_Pipeline,
+)
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+
+class Chunked_Preprocessor:
+    """
+    Description :   This class shall be used to clean and transform the training data chunk by chunk, when the
+                    data does not fit in memory. The imputer is fitted on a fixed reference set taken from the
+                    first chunks, the scaler and PCA are fitted incrementally, and the transformed data is written
+                    to local numpy files which can be memory mapped for training. When the missing indicator is
+                    enabled, the missing value bitmap is spooled next to the imputed data and its features are
+                    appended after the principal components.
+
+    Version     :   1.0
+    Revisions   :   None
+    """
+
+    def __init__(self, log_file):
+        self.log_writer = App_Logger()
+
+        self.config = read_params()
+
+        self.log_file = log_file
+
+        self.target_col = self.config["target_col"]
+
+        self.knn_neighbours = self.config["knn_imputer"]["n_neighbors"]
+
+        self.knn_weights = self.config["knn_imputer"]["weights"]
+
+        self.n_components = self.config["pca_model"]["n_components"]
+
+        self.chunksize = self.config["chunked_preprocessing"]["chunksize"]
+
+        self.reference_size = self.config["chunked_preprocessing"]["reference_size"]
+
+        self.data_dir = self.config["chunked_preprocessing"]["dir"]
+
+        self.features_file = self.config["chunked_preprocessing"]["features_file"]
+
+        self.labels_file = self.config["chunked_preprocessing"]["labels_file"]
+
+        self.use_missing_indicator = self.config["missing_indicator"]["enabled"]
+
+        self.dtype = np.float32
+
+        self.preprocessor = Preprocessor(log_file, low_memory=True)
+
+    def prepare_chunk(self, chunk):
+        """
+        Method Name :   prepare_chunk
+        Description :   This method replaces the invalid values, encodes the target column and separates the
+                        features and labels of a single chunk
+
+        Output      :   Features as float dataframe and labels as numpy array
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.prepare_chunk.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            chunk = self.preprocessor.replace_invalid_values(chunk)
+
+            chunk = self.preprocessor.encode_target_cols(chunk)
+
+            X, Y = self.preprocessor.separate_label_feature(chunk, self.target_col)
+
+            X = X.astype(self.dtype, copy=False)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return X, Y.to_numpy(dtype=np.int8)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def fit_reference(self, X_ref):
+        """
+        Method Name :   fit_reference
+        Description :   This method prefilters the columns on the reference set, fits the imputer on the remaining
+                        columns and finds the columns with zero standard deviation after imputation. The number of
+                        components is capped by the rows of the reference set, so that every batch of the data,
+                        which has at least as many rows, can be fitted by IncrementalPCA. When the fast
+                        imputer is enabled, it is built from a sample of the imputed reference set, to be used at
+                        prediction time. The scaler and PCA are created unfitted, to be fitted on chunks.
+
+        Output      :   A preprocessing pipeline with fitted imputer
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.fit_reference.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            columns = list(X_ref.columns)
+
+            dropped_cols = self.preprocessor.get_columns_to_prefilter(X_ref)
+
+            X_ref = X_ref.drop(columns=dropped_cols)
+
+            self.log_writer.log(
+                f"Dropped {len(dropped_cols)} prefiltered cols from reference set",
+                **log_dic,
+            )
+
+            imputer = KNNImputer(
+                n_neighbors=self.knn_neighbours,
+                weights=self.knn_weights,
+                missing_values=np.nan,
+            )
+
+            imputed_ref = imputer.fit_transform(X_ref.to_numpy())
+
+            self.log_writer.log(
+                f"Fitted {imputer.__class__.__name__} on reference set of {len(X_ref)} rows",
+                **log_dic,
+            )
+
+            zero_std_cols = self.preprocessor.get_columns_with_zero_deviation(
+                pd.DataFrame(imputed_ref, columns=X_ref.columns, copy=False)
+            )
+
+            n_components = min(
+                self.n_components,
+                len(X_ref.columns) - len(zero_std_cols),
+                len(X_ref),
+            )
+
+            fast_imputer = self.preprocessor.get_fast_imputer(imputed_ref)
+
+            pipeline = Preprocessing_Pipeline(
+                columns=columns,
+                imputer=imputer,
+                scaler=StandardScaler(),
+                pca=IncrementalPCA(n_components=n_components),
+                zero_std_cols=zero_std_cols,
+                dropped_cols=dropped_cols,
+                missing_indicator=Missing_Indicator(columns)
+                if self.use_missing_indicator
+                else None,
+                dtype=self.dtype,
+                fast_imputer=fast_imputer,
+            )
+
+            self.log_writer.log(
+                f"Created preprocessing pipeline with {len(zero_std_cols)} zero standard deviation columns and {n_components} components",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return pipeline
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def spool_chunk(self, pipeline, X, f, bitmap_f):
+        """
+        Method Name :   spool_chunk
+        Description :   This method imputes a chunk, updates the scaler with it and appends it to the local spool file.
+                        The missing value bitmap of the chunk is appended to its own spool file, if enabled.
+
+        Output      :   Number of rows written to the spool file
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.spool_chunk.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            if pipeline.missing_indicator is not None:
+                pipeline.missing_indicator.get_bitmap(X).tofile(bitmap_f)
+
+            imputed = pipeline.select_columns(pipeline.impute(X))
+
+            pipeline.scaler.partial_fit(imputed)
+
+            np.ascontiguousarray(imputed, dtype=self.dtype).tofile(f)
+
+            self.log_writer.log(f"Spooled {len(imputed)} imputed rows", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return len(imputed)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_batches(self, n_rows, min_batch_size):
+        """
+        Method Name :   get_batches
+        Description :   This method splits the row range into batches of chunksize rows. The rows of a last batch
+                        smaller than min_batch_size are carried over into the previous batch, as IncrementalPCA needs
+                        at least n_components rows per batch. A single batch smaller than min_batch_size raises a
+                        ValueError.
+
+        Output      :   A list of (start, end) tuples
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_batches.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            batch_size = max(self.chunksize, min_batch_size)
+
+            starts = list(range(0, n_rows, batch_size))
+
+            if n_rows < min_batch_size:
+                raise ValueError(
+                    f"{n_rows} rows are fewer than the {min_batch_size} rows needed per batch"
+                )
+
+            if len(starts) > 1 and n_rows - starts[-1] < min_batch_size:
+                starts.pop()
+
+            batches = [
+                (start, starts[i + 1] if i + 1 < len(starts) else n_rows)
+                for i, start in enumerate(starts)
+            ]
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return batches
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def fit_transform(self, chunks):
+        """
+        Method Name :   fit_transform
+        Description :   This method fits the preprocessing pipeline over an iterator of chunks, for example from
+                        Data_Getter_Train.get_data_chunks, and writes the transformed features and the labels as
+                        local numpy files. The chunk iterator is read only once, empty chunks are skipped, and a
+                        ValueError is raised when there are no rows at all.
+
+        Output      :   The fitted preprocessing pipeline, and the paths of the features and labels files
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.fit_transform.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            os.makedirs(self.data_dir, exist_ok=True)
+
+            spool_file = os.path.join(self.data_dir, "imputed_spool.dat")
+
+            bitmap_file = os.path.join(self.data_dir, "bitmap_spool.dat")
+
+            features_path = os.path.join(self.data_dir, self.features_file)
+
+            labels_path = os.path.join(self.data_dir, self.labels_file)
+
+            pipeline, buffer, labels, n_rows = None, [], [], 0
+
+            with open(spool_file, "wb") as f, open(bitmap_file, "wb") as bitmap_f:
+                for chunk in chunks:
+                    if len(chunk) == 0:
+                        continue
+
+                    X, Y = self.prepare_chunk(chunk)
+
+                    labels.append(Y)
+
+                    if pipeline is not None:
+                        n_rows += self.spool_chunk(pipeline, X, f, bitmap_f)
+
+                        continue
+
+                    buffer.append(X)
+
+                    if sum(len(x) for x in buffer) >= self.reference_size:
+                        X_ref = pd.concat(buffer)
+
+                        pipeline = self.fit_reference(X_ref.iloc[: self.reference_size])
+
+                        n_rows += self.spool_chunk(pipeline, X_ref, f, bitmap_f)
+
+                        buffer, X_ref = [], None
+
+                if pipeline is None:
+                    if not buffer:
+                        raise ValueError("No training rows found in the chunks")
+
+                    X_ref = pd.concat(buffer)
+
+                    pipeline = self.fit_reference(X_ref)
+
+                    n_rows += self.spool_chunk(pipeline, X_ref, f, bitmap_f)
+
+                    buffer, X_ref = [], None
+
+            self.log_writer.log(
+                f"Spooled {n_rows} imputed rows to {spool_file}", **log_dic
+            )
+
+            n_features = len(pipeline.kept_idx)
+
+            imputed = np.memmap(
+                spool_file, dtype=self.dtype, mode="r", shape=(n_rows, n_features)
+            )
+
+            batches = self.get_batches(n_rows, pipeline.pca.n_components)
+
+            for start, end in batches:
+                pipeline.pca.partial_fit(pipeline.scaler.transform(imputed[start:end]))
+
+            self.log_writer.log(
+                f"Fitted {pipeline.pca.__class__.__name__} over {len(batches)} batches",
+                **log_dic,
+            )
+
+            n_components = pipeline.pca.n_components
+
+            n_indicators, bitmap = 0, None
+
+            if pipeline.missing_indicator is not None:
+                n_indicators = len(pipeline.missing_indicator.feature_names)
+
+                n_bitmap_bytes = (len(pipeline.missing_indicator.columns) + 7) // 8
+
+                bitmap = np.memmap(
+                    bitmap_file,
+                    dtype=np.uint8,
+                    mode="r",
+                    shape=(n_rows, n_bitmap_bytes),
+                )
+
+            features = np.lib.format.open_memmap(
+                features_path,
+                mode="w+",
+                dtype=self.dtype,
+                shape=(n_rows, n_components + n_indicators),
+            )
+
+            for start, end in batches:
+                features[start:end, :n_components] = pipeline.project(
+                    imputed[start:end]
+                )
+
+                if n_indicators:
+                    features[
+                        start:end, n_components:
+                    ] = pipeline.missing_indicator.get_features(
+                        bitmap[start:end], dtype=self.dtype
+                    )
+
+            features.flush()
+
+            del features, imputed, bitmap
+
+            os.remove(spool_file)
+
+            os.remove(bitmap_file)
+
+            np.save(labels_path, np.concatenate(labels))
+
+            self.log_writer.log(
+                f"Saved transformed features to {features_path} and labels to {labels_path}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return pipeline, features_path, labels_path
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
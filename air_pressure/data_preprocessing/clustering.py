@@ -0,0 +1,360 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from joblib import Parallel, delayed
+from kneed import KneeLocator
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.model_selection import train_test_split
+from threadpoolctl import threadpool_limits
+
+from air_pressure.s3_bucket_operations.s3_operations import S3_Operation
+from utils.cpu_budget import CPU_Budget
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+
+class KMeans_Clustering:
+    """
+    Description :   This class shall be used to divide the data into clusters before training. The number of
+                    clusters is found with the elbow method on a sample of the data, and the final model is
+                    fitted once on the full data.
+
+    Version     :   1.0
+    Revisions   :   None
+    """
+
+    def __init__(self, log_file):
+        self.log_writer = App_Logger()
+
+        self.config = read_params()
+
+        self.log_file = log_file
+
+        self.random_state = self.config["base"]["random_state"]
+
+        self.kmeans_init = self.config["kmeans_cluster"]["init"]
+
+        self.max_clusters = self.config["kmeans_cluster"]["max_clusters"]
+
+        self.knee_curve = self.config["kmeans_cluster"]["knee"]["curve"]
+
+        self.knee_direction = self.config["kmeans_cluster"]["knee"]["direction"]
+
+        self.engine = self.config["kmeans_cluster"]["engine"]
+
+        self.sample_size = self.config["kmeans_cluster"]["sample_size"]
+
+        self.batch_size = self.config["kmeans_cluster"]["batch_size"]
+
+        self.cpu_budget = CPU_Budget(log_file)
+
+        self.n_jobs = self.cpu_budget.get_n_jobs(
+            self.config["kmeans_cluster"]["n_jobs"]
+        )
+
+        self.elbow_plot_fig = self.config["elbow_plot_fig"]
+
+        self.input_files_bucket = self.config["s3_bucket"]["input_files_bucket"]
+
+        self.model_bucket = self.config["s3_bucket"]["air_pressure_model_bucket"]
+
+        self.trained_model_dir = self.config["model_dir"]["trained"]
+
+        self.s3 = S3_Operation()
+
+        self.elbow_plot_future = None
+
+    @staticmethod
+    def get_inertia(kmeans, data, n_threads):
+        """
+        Method Name :   get_inertia
+        Description :   This method fits the kmeans model on data with at most n_threads OpenMP and BLAS threads. It
+                        is static, so that it can be sent to the parallel workers without the s3 client and logger
+                        of the class.
+
+        Output      :   The within cluster sum of squares of the fitted model
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            with threadpool_limits(limits=n_threads):
+                return kmeans.fit(data).inertia_
+
+        except Exception as e:
+            raise e
+
+    def get_kmeans_model(self, n_clusters):
+        """
+        Method Name :   get_kmeans_model
+        Description :   This method creates the kmeans model based on the engine in params.yaml. kmeans creates
+                        KMeans, and minibatch creates MiniBatchKMeans
+
+        Output      :   An unfitted kmeans model with n_clusters clusters
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_kmeans_model.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            if self.engine == "minibatch":
+                kmeans = MiniBatchKMeans(
+                    n_clusters=n_clusters,
+                    init=self.kmeans_init,
+                    batch_size=self.batch_size,
+                    random_state=self.random_state,
+                )
+
+            else:
+                kmeans = KMeans(
+                    n_clusters=n_clusters,
+                    init=self.kmeans_init,
+                    random_state=self.random_state,
+                )
+
+            self.log_writer.log(
+                f"Initialized {kmeans.__class__.__name__} with {n_clusters} clusters",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return kmeans
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_elbow_sample(self, data, labels=None):
+        """
+        Method Name :   get_elbow_sample
+        Description :   This method takes a sample of sample_size rows for the elbow method. The sample is
+                        stratified on labels when they are given, so that the rare class is kept.
+
+        Output      :   A sample of the data, or the data itself when it is smaller than sample_size
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_elbow_sample.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            if len(data) <= self.sample_size:
+                self.log_writer.log(
+                    f"Data has {len(data)} rows, using all rows for elbow method",
+                    **log_dic,
+                )
+
+                self.log_writer.start_log("exit", **log_dic)
+
+                return data
+
+            sample, _ = train_test_split(
+                data,
+                train_size=self.sample_size,
+                stratify=labels,
+                random_state=self.random_state,
+            )
+
+            self.log_writer.log(
+                f"Took a sample of {self.sample_size} rows from {len(data)} rows",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return sample
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def save_elbow_plot(self, wcss):
+        """
+        Method Name :   save_elbow_plot
+        Description :   This method saves the elbow plot of wcss values and uploads it to the input files bucket
+
+        Output      :   The elbow plot is uploaded to s3 bucket
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.save_elbow_plot.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            fig = Figure()
+
+            FigureCanvasAgg(fig)
+
+            ax = fig.add_subplot()
+
+            ax.plot(range(1, len(wcss) + 1), wcss)
+
+            ax.set_title("The Elbow Method")
+
+            ax.set_xlabel("Number of clusters")
+
+            ax.set_ylabel("WCSS")
+
+            fig.savefig(self.elbow_plot_fig)
+
+            self.log_writer.log(f"Saved elbow plot as {self.elbow_plot_fig}", **log_dic)
+
+            self.s3.upload_file(
+                self.elbow_plot_fig,
+                self.elbow_plot_fig,
+                self.input_files_bucket,
+                self.log_file,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def elbow_plot(self, data, labels=None):
+        """
+        Method Name :   elbow_plot
+        Description :   This method finds the number of clusters with the knee method. The kmeans models for 1 to
+                        max_clusters clusters, and at most as many clusters as rows, are fitted in parallel on a
+                        sample of the data. The cores are split between the parallel jobs, so that the threads of
+                        every kmeans fit only use the share of their job. The elbow plot is saved in a background
+                        thread.
+
+        Output      :   The number of clusters
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.elbow_plot.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            sample = self.get_elbow_sample(data, labels)
+
+            n_clusters_range = range(1, min(self.max_clusters, len(sample)) + 1)
+
+            models = [self.get_kmeans_model(k) for k in n_clusters_range]
+
+            n_jobs = min(self.n_jobs, len(models))
+
+            n_threads = max(1, self.cpu_budget.get_cores() // n_jobs)
+
+            wcss = Parallel(n_jobs=n_jobs)(
+                delayed(self.get_inertia)(kmeans, sample, n_threads)
+                for kmeans in models
+            )
+
+            self.log_writer.log(
+                f"Fitted {len(models)} kmeans models on {len(sample)} rows with {n_jobs} jobs of {n_threads} threads",
+                **log_dic,
+            )
+
+            executor = ThreadPoolExecutor(max_workers=1)
+
+            self.elbow_plot_future = executor.submit(self.save_elbow_plot, wcss)
+
+            executor.shutdown(wait=False)
+
+            kn = KneeLocator(
+                n_clusters_range,
+                wcss,
+                curve=self.knee_curve,
+                direction=self.knee_direction,
+            )
+
+            n_clusters = kn.knee if kn.knee is not None else 1
+
+            self.log_writer.log(
+                f"The optimum number of clusters is {n_clusters}", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return int(n_clusters)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def create_clusters(self, data, n_clusters):
+        """
+        Method Name :   create_clusters
+        Description :   This method fits the kmeans model once on the full data and saves it to the model bucket.
+                        The elbow plot, which elbow_plot saves in the background, is waited for before returning,
+                        so that a failed upload is raised here instead of being lost.
+
+        Output      :   The fitted kmeans model and the cluster number of every row
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.create_clusters.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            kmeans = self.get_kmeans_model(n_clusters)
+
+            clusters = kmeans.fit_predict(data)
+
+            self.log_writer.log(
+                f"Fitted {kmeans.__class__.__name__} on {len(clusters)} rows, cluster sizes are {np.bincount(clusters).tolist()}",
+                **log_dic,
+            )
+
+            self.s3.save_model(
+                kmeans, self.trained_model_dir, self.model_bucket, self.log_file
+            )
+
+            if self.elbow_plot_future is not None:
+                self.elbow_plot_future.result()
+
+                self.elbow_plot_future = None
+
+                self.log_writer.log("Elbow plot is saved", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return kmeans, clusters
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
@@ -0,0 +1,218 @@
+import numpy as np
+from sklearn.neighbors import BallTree
+
+
+class Fast_Imputer:
+    """
+    Description :   This class shall be used for imputing the missing values of prediction rows against a reduced
+                    reference set, instead of searching the whole training reference set like the KNN imputer. The
+                    reference set is a sample of the imputed training reference rows, so every reference row has
+                    all the values, and one ball tree is built over all its columns up front. A row to impute
+                    queries the tree for n_candidates rows with its missing values filled in, and the rows found are
+                    ranked again by their distance on the observed columns of the row, like the KNN imputer ranks
+                    the whole reference set. The tree is not saved with the imputer, and is built again when the
+                    imputer is loaded.
+
+    Version     :   1.0
+    Revisions   :   None
+    """
+
+    def __init__(
+        self,
+        reference,
+        n_neighbors=3,
+        weights="uniform",
+        reference_size=5000,
+        leaf_size=40,
+        n_candidates=100,
+        batch_size=256,
+        random_state=None,
+    ):
+        reference = np.asarray(reference, dtype=np.float64)
+
+        if len(reference) > reference_size:
+            rng = np.random.default_rng(random_state)
+
+            reference = reference[
+                np.sort(rng.choice(len(reference), reference_size, replace=False))
+            ]
+
+        self.reference = reference
+
+        self.n_neighbors = min(n_neighbors, len(reference))
+
+        self.weights = weights
+
+        self.leaf_size = leaf_size
+
+        self.n_candidates = min(max(n_candidates, self.n_neighbors), len(reference))
+
+        self.batch_size = batch_size
+
+        self.fill_values = reference.mean(axis=0)
+
+        self.tree = BallTree(reference, leaf_size=leaf_size)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+
+        state["tree"] = None
+
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+        self.tree = BallTree(self.reference, leaf_size=self.leaf_size)
+
+    def rank_candidates(self, filled, observed, candidates):
+        """
+        Method Name :   rank_candidates
+        Description :   This method ranks the candidate reference rows of every row by their distance to the row on
+                        its observed columns, and keeps the n_neighbors nearest. A candidate found more than once is
+                        only ranked once.
+
+        Output      :   The distances and the indices of the neighbours, with one row per row
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            candidates = np.sort(candidates, axis=1)
+
+            diff = self.reference[candidates] - filled[:, np.newaxis, :]
+
+            diff *= observed[:, np.newaxis, :]
+
+            dist = np.sqrt(np.einsum("rcf,rcf->rc", diff, diff))
+
+            dist[:, 1:][candidates[:, 1:] == candidates[:, :-1]] = np.inf
+
+            order = np.argsort(dist, axis=1, kind="stable")[:, : self.n_neighbors]
+
+            return (
+                np.take_along_axis(dist, order, axis=1),
+                np.take_along_axis(candidates, order, axis=1),
+            )
+
+        except Exception as e:
+            raise e
+
+    def get_neighbours(self, values, observed):
+        """
+        Method Name :   get_neighbours
+        Description :   This method finds the n_neighbors nearest reference rows of every row on its observed columns.
+                        The first candidates are the nearest reference rows to the row with its missing values filled
+                        with the reference means. The missing values are then filled with the mean of the nearest of
+                        those candidates, and the nearest reference rows to that row are added as candidates, which
+                        finds most of the neighbours the mean filled row misses.
+
+        Output      :   The distances and the indices of the neighbours, with one row per row
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            filled = np.where(observed, values, self.fill_values)
+
+            candidates = self.tree.query(
+                filled, k=self.n_candidates, return_distance=False
+            )
+
+            if self.n_candidates == len(self.reference):
+                return self.rank_candidates(filled, observed, candidates)
+
+            _, neighbours = self.rank_candidates(filled, observed, candidates)
+
+            filled = np.where(observed, values, self.reference[neighbours].mean(axis=1))
+
+            candidates = np.concatenate(
+                [
+                    candidates,
+                    self.tree.query(
+                        filled, k=self.n_candidates, return_distance=False
+                    ),
+                ],
+                axis=1,
+            )
+
+            return self.rank_candidates(filled, observed, candidates)
+
+        except Exception as e:
+            raise e
+
+    def get_neighbour_values(self, dist, neighbours):
+        """
+        Method Name :   get_neighbour_values
+        Description :   This method averages the values of the neighbours, weighted by inverse distance when weights
+                        is distance. Like the KNN imputer, a neighbour at zero distance takes all the weight.
+
+        Output      :   A numpy array of imputed values with one row per imputed row
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            values = self.reference[neighbours]
+
+            if self.weights != "distance":
+                return values.mean(axis=1)
+
+            with np.errstate(divide="ignore"):
+                weights = 1.0 / dist
+
+            at_zero = np.isinf(weights)
+
+            weights[at_zero.any(axis=1)] = at_zero[at_zero.any(axis=1)]
+
+            weights /= weights.sum(axis=1, keepdims=True)
+
+            return np.einsum("rk,rkf->rf", weights, values)
+
+        except Exception as e:
+            raise e
+
+    def transform(self, values):
+        """
+        Method Name :   transform
+        Description :   This method imputes the missing values, batch_size rows at a time. The rows without missing
+                        values are left as they are, and the columns of rows without any observed value are filled
+                        with the reference means.
+
+        Output      :   A numpy array without missing values
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            values = np.array(values, dtype=np.float64)
+
+            observed = ~np.isnan(values)
+
+            rows = np.flatnonzero(~observed.all(axis=1))
+
+            empty = rows[~observed[rows].any(axis=1)]
+
+            values[empty] = self.fill_values
+
+            rows = rows[observed[rows].any(axis=1)]
+
+            for start in range(0, len(rows), self.batch_size):
+                idx = rows[start : start + self.batch_size]
+
+                dist, neighbours = self.get_neighbours(values[idx], observed[idx])
+
+                values[idx] = np.where(
+                    observed[idx],
+                    values[idx],
+                    self.get_neighbour_values(dist, neighbours),
+                )
+
+            return values
+
+        except Exception as e:
+            raise e
@@ -0,0 +1,117 @@
+from threading import local
+
+import numpy as np
+
+
+class Fused_Projection:
+    """
+    Description :   This class shall be used for applying the fitted scaler and PCA as a single affine map at
+                    prediction time. Scaling, centering and projecting are all linear, so they are folded into one
+                    projection matrix and one offset, and the columns removed for zero standard deviation get zero
+                    rows in the matrix. The imputed values are then projected with one matrix multiply, without the
+                    scaled and centered copies of the data. Every thread can keep an output buffer, which is reused
+                    by its next batches of at most as many rows.
+
+    Version     :   1.0
+    Revisions   :   None
+    """
+
+    def __init__(self, scaler, pca, kept_idx, n_columns, dtype=np.float32):
+        self.dtype = dtype
+
+        components = pca.components_.astype(np.float64)
+
+        scale = 1.0 if scaler.scale_ is None else scaler.scale_
+
+        mean = scaler.mean_ / scale if scaler.with_mean else 0.0
+
+        if pca.mean_ is not None:
+            mean = mean + pca.mean_
+
+        weights = (components / scale).T
+
+        offset = -(np.broadcast_to(mean, components.shape[1]) @ components.T)
+
+        if pca.whiten:
+            std = np.sqrt(pca.explained_variance_)
+
+            weights, offset = weights / std, offset / std
+
+        self.weights = np.zeros((n_columns, weights.shape[1]), dtype=dtype)
+
+        self.weights[kept_idx] = weights
+
+        self.offset = offset.astype(dtype)
+
+        self.n_components = weights.shape[1]
+
+        self.buffers = local()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+
+        state.pop("buffers", None)
+
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+        self.buffers = local()
+
+    def get_buffer(self, n_rows):
+        """
+        Method Name :   get_buffer
+        Description :   This method gets the output buffer of the current thread for n_rows rows. The buffer is
+                        allocated again only when it has fewer rows.
+
+        Output      :   A numpy array of n_rows rows of components
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            buffer = getattr(self.buffers, "components", None)
+
+            if buffer is None or len(buffer) < n_rows:
+                buffer = np.empty((n_rows, self.n_components), dtype=self.dtype)
+
+                self.buffers.components = buffer
+
+            return buffer[:n_rows]
+
+        except Exception as e:
+            raise e
+
+    def transform(self, values, reuse_buffer=False):
+        """
+        Method Name :   transform
+        Description :   This method projects the imputed values of all the imputed columns into the principal
+                        components, writing the product and the offset into one output array. With reuse_buffer,
+                        the output array is the buffer of the current thread, which the next call of the thread
+                        overwrites, so it is only meant for callers which are done with the output by then.
+
+        Output      :   A numpy array of principal components
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            values = np.asarray(values, dtype=self.dtype)
+
+            components = (
+                self.get_buffer(len(values))
+                if reuse_buffer
+                else np.empty((len(values), self.n_components), dtype=self.dtype)
+            )
+
+            np.matmul(values, self.weights, out=components)
+
+            components += self.offset
+
+            return components
+
+        except Exception as e:
+            raise e
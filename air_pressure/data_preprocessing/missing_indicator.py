@@ -0,0 +1,80 @@
+import numpy as np
+
+
+class Missing_Indicator:
+    """
+    Description :   This class shall be used for keeping the missing value pattern of the data before imputation.
+                    The pattern is stored as a packed bitmap of one bit per column, and a few aggregated features
+                    are derived from it, which are the missing count per row and a missing flag per sensor group.
+                    Sensor groups are the column prefixes shared by more than one column, like ag_000 to ag_009.
+
+    Version     :   1.0
+    Revisions   :   None
+    """
+
+    popcount = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(
+        axis=1, dtype=np.uint8
+    )
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+
+        prefixes = [col.split("_")[0] for col in self.columns]
+
+        self.groups = [
+            prefix
+            for i, prefix in enumerate(prefixes)
+            if prefixes.index(prefix) == i and prefixes.count(prefix) > 1
+        ]
+
+        self.group_masks = np.packbits(
+            [[prefix == group for prefix in prefixes] for group in self.groups],
+            axis=1,
+        ).reshape(len(self.groups), -1)
+
+        self.feature_names = ["missing_count"] + [
+            f"{group}_missing" for group in self.groups
+        ]
+
+    def get_bitmap(self, data):
+        """
+        Method Name :   get_bitmap
+        Description :   This method packs the missing value pattern of the columns into a bitmap, with 8 columns
+                        per byte
+
+        Output      :   A numpy uint8 array of shape (rows, ceil(columns / 8))
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            return np.packbits(data[self.columns].isna().to_numpy(), axis=1)
+
+        except Exception as e:
+            raise e
+
+    def get_features(self, bitmap, dtype=np.float32):
+        """
+        Method Name :   get_features
+        Description :   This method derives the missing count and the sensor group missing flags from the packed
+                        bitmap, without unpacking it
+
+        Output      :   A numpy array of shape (rows, 1 + number of groups)
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            features = np.empty((len(bitmap), len(self.feature_names)), dtype=dtype)
+
+            features[:, 0] = self.popcount[bitmap].sum(axis=1)
+
+            for i, mask in enumerate(self.group_masks, start=1):
+                features[:, i] = (bitmap & mask).any(axis=1)
+
+            return features
+
+        except Exception as e:
+            raise e
@@ -4,9 +4,17 @@ import pandas as pd
 from imblearn.over_sampling import SMOTE
 from sklearn.decomposition import PCA
 from sklearn.impute import KNNImputer
+from sklearn.neighbors import NearestNeighbors
 from sklearn.preprocessing import StandardScaler
+from sklearn.utils.class_weight import compute_sample_weight
 
+from air_pressure.data_preprocessing.fast_imputer import Fast_Imputer
+from air_pressure.data_preprocessing.missing_indicator import Missing_Indicator
+from air_pressure.data_preprocessing.preprocessing_pipeline import (
+    Preprocessing_Pipeline,
+)
 from air_pressure.s3_bucket_operations.s3_operations import S3_Operation
+from utils.cpu_budget import CPU_Budget
 from utils.logger import App_Logger
 from utils.read_params import get_log_dic, read_params
 
@@ -18,13 +26,21 @@ class Preprocessor:
     Revisions   :   None
     """
 
-    def __init__(self, log_file):
+    def __init__(self, log_file, low_memory=None):
         self.log_writer = App_Logger()
 
         self.config = read_params()
 
         self.log_file = log_file
 
+        self.target_col = self.config["target_col"]
+
+        self.low_memory = (
+            self.config["preprocessing"]["low_memory"]
+            if low_memory is None
+            else low_memory
+        )
+
         self.knn_neighbours = self.config["knn_imputer"]["n_neighbors"]
 
         self.knn_weights = self.config["knn_imputer"]["weights"]
@@ -35,8 +51,56 @@ class Preprocessor:
 
         self.input_files_bucket = self.config["s3_bucket"]["input_files_bucket"]
 
+        self.random_state = self.config["base"]["random_state"]
+
+        self.max_missing_fraction = self.config["column_prefilter"][
+            "max_missing_fraction"
+        ]
+
+        self.min_relative_variance = self.config["column_prefilter"][
+            "min_relative_variance"
+        ]
+
+        self.prefilter_cols = []
+
+        self.use_missing_indicator = self.config["missing_indicator"]["enabled"]
+
+        self.missing_indicator = None
+
+        self.use_fast_imputer = self.config["fast_imputer"]["enabled"]
+
+        self.imbalance_method = self.config["imbalance"]["method"]
+
+        self.sampling_strategy = self.config["imbalance"]["sampling_strategy"]
+
+        self.smote_k_neighbors = self.config["imbalance"]["k_neighbors"]
+
+        self.smote_n_jobs = CPU_Budget(log_file).get_n_jobs(
+            self.config["imbalance"]["n_jobs"]
+        )
+
         self.s3 = S3_Operation()
 
+    def set_intermediate(self, **intermediates):
+        """
+        Method Name :   set_intermediate
+        Description :   This method stores the intermediate data of a stage on the object. In low memory mode
+                        nothing is stored, so that every intermediate can be freed once the next stage consumed it.
+
+        Output      :   The intermediates are set as attributes, unless low memory mode is on
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            if not self.low_memory:
+                for name, value in intermediates.items():
+                    setattr(self, name, value)
+
+        except Exception as e:
+            raise e
+
     def remove_columns(self, data, columns):
         """
         Method Name :   remove_columns
@@ -57,18 +121,22 @@ class Preprocessor:
 
         self.log_writer.start_log("start", **log_dic)
 
-        self.data = data
+        try:
+            if self.low_memory:
+                data.drop(labels=columns, axis=1, inplace=True)
 
-        self.columns = columns
+                useful_data = data
 
-        try:
-            self.useful_data = self.data.drop(labels=self.columns, axis=1)
+            else:
+                useful_data = data.drop(labels=columns, axis=1)
+
+            self.set_intermediate(data=data, columns=columns, useful_data=useful_data)
 
             self.log_writer.log(f"Dropped {columns} from {data}", **log_dic)
 
             self.log_writer.start_log("exit", **log_dic)
 
-            return self.useful_data
+            return useful_data
 
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
@@ -94,15 +162,23 @@ class Preprocessor:
         self.log_writer.start_log("start", **log_dic)
 
         try:
-            self.X = data.drop(labels=label_column_name, axis=1)
+            if self.low_memory:
+                Y = data.pop(label_column_name)
 
-            self.Y = data[label_column_name]
+                X = data
+
+            else:
+                X = data.drop(labels=label_column_name, axis=1)
+
+                Y = data[label_column_name]
+
+            self.set_intermediate(X=X, Y=Y)
 
             self.log_writer.log(f"Separated {label_column_name} from {data}", **log_dic)
 
             self.log_writer.start_log("exit", **log_dic)
 
-            return self.X, self.Y
+            return X, Y
 
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
@@ -167,12 +243,14 @@ class Preprocessor:
         self.cols = data.columns
 
         try:
-            self.null_counts = data.isna().sum()
+            null_counts = data.isna().sum()
+
+            self.set_intermediate(null_counts=null_counts)
 
-            self.log_writer.log(f"Null values count is : {self.null_counts}", **log_dic)
+            self.log_writer.log(f"Null values count is : {null_counts}", **log_dic)
 
-            for i in range(len(self.null_counts)):
-                if self.null_counts[i] > 0:
+            for i in range(len(null_counts)):
+                if null_counts.iloc[i] > 0:
 
                     self.null_present = True
 
@@ -186,20 +264,21 @@ class Preprocessor:
                     **log_dic,
                 )
 
-                self.dataframe_with_null = pd.DataFrame()
+                dataframe_with_null = pd.DataFrame()
 
-                self.dataframe_with_null["columns"] = data.columns
+                dataframe_with_null["columns"] = data.columns
 
-                self.dataframe_with_null["missing values count"] = np.asarray(
-                    data.isna().sum()
-                )
+                dataframe_with_null["missing values count"] = np.asarray(null_counts)
+
+                self.set_intermediate(dataframe_with_null=dataframe_with_null)
 
                 self.log_writer.log("Created dataframe with null values", **log_dic)
 
                 self.s3.upload_df_as_csv(
-                    self.dataframe_with_null,
+                    dataframe_with_null,
                     self.null_values_file,
                     self.null_values_file,
+                    self.input_files_bucket,
                     self.log_file,
                 )
             else:
@@ -247,6 +326,226 @@ class Preprocessor:
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
 
+    def get_columns_to_prefilter(self, data):
+        """
+        Method Name :   get_columns_to_prefilter
+        Description :   This method finds the columns which should be dropped before imputation, using the null
+                        count profile of the data. Columns with a missing fraction above max_missing_fraction and
+                        columns whose observed values have a relative variance of at most min_relative_variance
+                        are returned. The relative variance is the variance divided by the squared mean, so that
+                        the threshold does not depend on the units of the raw sensor values.
+
+        Output      :   List of the columns to drop before imputation
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_columns_to_prefilter.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            missing_fraction = data.isna().mean()
+
+            relative_variance = data.var(skipna=True) / data.mean(skipna=True) ** 2
+
+            high_missing_cols = [
+                col
+                for col in data.columns
+                if missing_fraction[col] > self.max_missing_fraction
+            ]
+
+            low_variance_cols = [
+                col
+                for col in data.columns
+                if col not in high_missing_cols
+                and not relative_variance[col] > self.min_relative_variance
+            ]
+
+            self.log_writer.log(
+                f"Got {len(high_missing_cols)} cols with missing fraction above {self.max_missing_fraction} and {len(low_variance_cols)} cols with relative variance at most {self.min_relative_variance}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return high_missing_cols + low_variance_cols
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def prefilter_columns(self, data):
+        """
+        Method Name :   prefilter_columns
+        Description :   This method drops the mostly missing and the near constant columns before imputation, so
+                        that the imputer works on fewer columns. The dropped columns are kept in prefilter_cols.
+
+        Output      :   A pandas DataFrame without the prefiltered columns
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.prefilter_columns.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            self.prefilter_cols = self.get_columns_to_prefilter(data)
+
+            data = self.remove_columns(data, self.prefilter_cols)
+
+            self.log_writer.log(
+                f"Prefiltered {self.prefilter_cols} cols before imputation", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return data
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_fast_imputer(self, imputed_data):
+        """
+        Method Name :   get_fast_imputer
+        Description :   This method builds the fast imputer used at prediction time from a sample of the imputed
+                        training data, when the fast imputer is enabled in params.yaml
+
+        Output      :   A Fast_Imputer, or None when the fast imputer is disabled
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_fast_imputer.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            if not self.use_fast_imputer:
+                self.log_writer.start_log("exit", **log_dic)
+
+                return None
+
+            fast_imputer = Fast_Imputer(
+                np.asarray(imputed_data),
+                n_neighbors=self.knn_neighbours,
+                weights=self.knn_weights,
+                reference_size=self.config["fast_imputer"]["reference_size"],
+                leaf_size=self.config["fast_imputer"]["leaf_size"],
+                n_candidates=self.config["fast_imputer"]["n_candidates"],
+                batch_size=self.config["fast_imputer"]["batch_size"],
+                random_state=self.random_state,
+            )
+
+            self.log_writer.log(
+                f"Built fast imputer on {len(fast_imputer.reference)} reference rows",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return fast_imputer
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_missing_bitmap(self, data):
+        """
+        Method Name :   get_missing_bitmap
+        Description :   This method keeps the missing value pattern of the data as a packed bitmap, before the
+                        columns are prefiltered and the missing values are imputed
+
+        Output      :   A numpy uint8 array with one bit per column
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_missing_bitmap.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            self.missing_indicator = Missing_Indicator(data.columns)
+
+            bitmap = self.missing_indicator.get_bitmap(data)
+
+            self.log_writer.log(
+                f"Packed missing values of {len(data.columns)} cols into {bitmap.shape[1]} bytes per row",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return bitmap
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def add_missing_features(self, principal_x, bitmap):
+        """
+        Method Name :   add_missing_features
+        Description :   This method appends the missing count and the sensor group missing flags, derived from the
+                        bitmap, to the principal components
+
+        Output      :   A dataframe with the principal components and the missing indicator features
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.add_missing_features.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            features = pd.DataFrame(
+                self.missing_indicator.get_features(bitmap),
+                columns=self.missing_indicator.feature_names,
+                index=principal_x.index,
+            )
+
+            principal_x = pd.concat([principal_x, features], axis=1)
+
+            self.log_writer.log(
+                f"Added {len(features.columns)} missing indicator features", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return principal_x
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
     def impute_missing_values(self, data):
         """
         Method Name :   impute_missing_values
@@ -267,8 +566,6 @@ class Preprocessor:
 
         self.log_writer.start_log("start", **log_dic)
 
-        self.data = data
-
         try:
             imputer = KNNImputer(
                 n_neighbors=self.knn_neighbours,
@@ -278,9 +575,17 @@ class Preprocessor:
 
             self.log_writer.log(f"Initialized {imputer.__class__.__name__}", **log_dic)
 
-            self.new_array = imputer.fit_transform(self.data)
+            new_array = imputer.fit_transform(data)
+
+            new_data = pd.DataFrame(
+                data=new_array, columns=data.columns, copy=False
+            )
+
+            self.set_intermediate(data=data, new_array=new_array, new_data=new_data)
 
-            self.new_data = pd.DataFrame(data=self.new_array, columns=self.data.columns)
+            self.imputer = imputer
+
+            del new_array
 
             self.log_writer.log("Created new dataframe with imputed values", **log_dic)
 
@@ -288,7 +593,7 @@ class Preprocessor:
 
             self.log_writer.start_log("exit", **log_dic)
 
-            return self.new_data
+            return new_data
 
         except Exception as e:
             raise e
@@ -314,7 +619,7 @@ class Preprocessor:
         try:
             self.log_writer.start_log("start", **log_dic)
 
-            pca = PCA(n_components=self.n_components)
+            pca = PCA(n_components=self.n_components, copy=not self.low_memory)
 
             pca_model_name = pca.__class__.__name__
 
@@ -330,7 +635,13 @@ class Preprocessor:
                 **log_dic,
             )
 
-            principal_x = pd.DataFrame(new_data, index=self.data.index)
+            principal_x = pd.DataFrame(
+                new_data, index=getattr(X_scaled_data, "index", None), copy=False
+            )
+
+            self.pca = pca
+
+            del new_data
 
             self.log_writer.log(
                 "Created a dataframe for the transformed data", **log_dic
@@ -364,29 +675,38 @@ class Preprocessor:
         self.log_writer.start_log("start", **log_dic)
 
         try:
-            self.data = data
-
-            self.scaler = StandardScaler()
+            self.scaler = StandardScaler(copy=not self.low_memory)
 
             self.log_writer.log(
                 f"Initialized {self.scaler.__class__.__name__}", **log_dic
             )
 
-            self.scaled_data = self.scaler.fit_transform(self.data)
+            values = data.to_numpy(dtype=np.float64, copy=False)
+
+            scaled_data = self.scaler.fit_transform(values)
 
             self.log_writer.log(
                 f"Transformed data using {self.scaler.__class__.__name__}", **log_dic
             )
 
-            self.scaled_num_df = pd.DataFrame(
-                data=self.scaled_data, columns=self.data.columns, index=self.data.index
+            scaled_num_df = pd.DataFrame(
+                data=scaled_data,
+                columns=data.columns,
+                index=data.index,
+                copy=False,
             )
 
+            self.set_intermediate(
+                data=data, scaled_data=scaled_data, scaled_num_df=scaled_num_df
+            )
+
+            del values, scaled_data
+
             self.log_writer.log("Converted transformed data to dataframe", **log_dic)
 
             self.log_writer.start_log("exit", **log_dic)
 
-            return self.scaled_num_df
+            return scaled_num_df
 
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
@@ -404,7 +724,7 @@ class Preprocessor:
         """
         log_dic = get_log_dic(
             self.__class__.__name__,
-            self.get_columns_with_zero_std_deviation.__name__,
+            self.get_columns_with_zero_deviation.__name__,
             __file__,
             self.log_file,
         )
@@ -412,9 +732,9 @@ class Preprocessor:
         self.log_writer.start_log("start", **log_dic)
 
         try:
-            data_n = data.describe()
+            data_std = data.std()
 
-            cols_to_drop = [x for x in data.columns if data_n[x]["std"] == 0]
+            cols_to_drop = [x for x in data.columns if data_std[x] == 0]
 
             self.log_writer.log("Got cols with zero standard deviation", **log_dic)
 
@@ -425,13 +745,235 @@ class Preprocessor:
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
 
+    def preprocess_data(self, data):
+        """
+        Method Name :   preprocess_data
+        Description :   This method cleans and transforms the training data in memory. The invalid values are
+                        replaced, the target is encoded and separated, the mostly missing and near constant columns
+                        are prefiltered, the missing values are imputed, the fast imputer is built from the imputed
+                        data when enabled, the zero standard deviation columns are removed, and the data is scaled and transformed with PCA. When the missing indicator is
+                        enabled, the missing value bitmap is kept before imputation and its features are appended
+                        after the principal components.
+
+        Output      :   The fitted preprocessing pipeline, the transformed features and the labels
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.preprocess_data.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            data = self.replace_invalid_values(data)
+
+            data = self.encode_target_cols(data)
+
+            X, Y = self.separate_label_feature(data, self.target_col)
+
+            X = X.astype(np.float64, copy=False)
+
+            columns = list(X.columns)
+
+            bitmap = self.get_missing_bitmap(X) if self.use_missing_indicator else None
+
+            X = self.prefilter_columns(X)
+
+            X = self.impute_missing_values(X)
+
+            fast_imputer = self.get_fast_imputer(X)
+
+            zero_std_cols = self.get_columns_with_zero_deviation(X)
+
+            X = self.remove_columns(X, zero_std_cols)
+
+            X = self.scale_numerical_columns(X)
+
+            X = self.apply_pca_transform(X)
+
+            if bitmap is not None:
+                X = self.add_missing_features(X, bitmap)
+
+            pipeline = Preprocessing_Pipeline(
+                columns=columns,
+                imputer=self.imputer,
+                scaler=self.scaler,
+                pca=self.pca,
+                zero_std_cols=zero_std_cols,
+                dropped_cols=self.prefilter_cols,
+                missing_indicator=self.missing_indicator,
+                dtype=np.float64,
+                fast_imputer=fast_imputer,
+            )
+
+            self.log_writer.log(
+                f"Preprocessed {len(X)} rows into {X.shape[1]} features", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return pipeline, X, Y
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_smote_sampler(self, n_minority):
+        """
+        Method Name :   get_smote_sampler
+        Description :   This method creates a SMOTE sampler with a parallel neighbor search, using the sampling
+                        strategy from params.yaml. The number of neighbors is capped by the minority class count.
+
+        Output      :   A SMOTE sampler, or None if there are too few minority samples to oversample
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_smote_sampler.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            k_neighbors = min(self.smote_k_neighbors, n_minority - 1)
+
+            if k_neighbors < 1:
+                self.log_writer.log(
+                    f"Only {n_minority} minority samples found, skipping oversampling",
+                    **log_dic,
+                )
+
+                self.log_writer.start_log("exit", **log_dic)
+
+                return None
+
+            nn = NearestNeighbors(n_neighbors=k_neighbors + 1, n_jobs=self.smote_n_jobs)
+
+            sampler = SMOTE(
+                sampling_strategy=self.sampling_strategy,
+                random_state=self.random_state,
+                k_neighbors=nn,
+            )
+
+            self.log_writer.log(
+                f"Initialized {sampler.__class__.__name__} with k_neighbors as {k_neighbors} and sampling_strategy as {self.sampling_strategy}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return sampler
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_sample_weight(self, Y):
+        """
+        Method Name :   get_sample_weight
+        Description :   This method computes balanced per-sample weights from the class distribution of the labels.
+                        It is used by the class_weight balancing method instead of creating synthetic rows.
+
+        Output      :   A numpy array of sample weights
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_sample_weight.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            sample_weight = compute_sample_weight(class_weight="balanced", y=Y)
+
+            self.log_writer.log("Computed balanced sample weights", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return sample_weight
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
     def handleImbalance(self, X, Y):
+        """
+        Method Name :   handleImbalance
+        Description :   This method handles the class imbalance based on the imbalance method in params.yaml.
+                        smote oversamples the minority class up to the sampling_strategy ratio, class_weight
+                        returns the data as it is, and the weights are taken from get_sample_weight at fit time.
+
+        Output      :   Features and labels after handling the imbalance
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.1
+        Revisions   :   Added sampling ratio, parallel neighbor search and class_weight method
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.handleImbalance.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
         try:
-            sample = SMOTE()
+            if self.imbalance_method == "class_weight":
+                self.log_writer.log(
+                    "Imbalance method is class_weight, no synthetic samples are created",
+                    **log_dic,
+                )
+
+                self.log_writer.start_log("exit", **log_dic)
+
+                return X, Y
+
+            class_counts = pd.Series(Y).value_counts()
+
+            if len(class_counts) < 2 or (
+                isinstance(self.sampling_strategy, float)
+                and class_counts.min() / class_counts.max() >= self.sampling_strategy
+            ):
+                self.log_writer.log(
+                    f"Class counts {class_counts.to_dict()} already satisfy sampling_strategy, skipping oversampling",
+                    **log_dic,
+                )
+
+                self.log_writer.start_log("exit", **log_dic)
+
+                return X, Y
+
+            sample = self.get_smote_sampler(int(class_counts.min()))
+
+            if sample is None:
+                self.log_writer.start_log("exit", **log_dic)
+
+                return X, Y
 
             X_bal, y_bal = sample.fit_resample(X, Y)
 
+            self.log_writer.log(
+                f"Resampled data from {len(Y)} to {len(y_bal)} rows", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
             return X_bal, y_bal
 
         except Exception as e:
-            raise e
+            self.log_writer.exception_log(e, **log_dic)
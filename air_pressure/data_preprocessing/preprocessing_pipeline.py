@@ -0,0 +1,225 @@
+import numpy as np
+
+from air_pressure.data_preprocessing.fused_projection import Fused_Projection
+
+
+class Preprocessing_Pipeline:
+    """
+    Description :   This class shall be used for holding the fitted preprocessing steps, so that the same
+                    imputation, column removal, scaling and PCA can be applied to new data. It only holds
+                    the fitted objects, so that it can be saved to s3 bucket like any other model. When a
+                    missing indicator is set, its features are appended after the principal components.
+
+    Version     :   1.0
+    Revisions   :   None
+    """
+
+    def __init__(
+        self,
+        columns,
+        imputer,
+        scaler,
+        pca,
+        zero_std_cols,
+        dropped_cols=(),
+        missing_indicator=None,
+        dtype=np.float32,
+        fast_imputer=None,
+    ):
+        self.columns = list(columns)
+
+        self.dropped_cols = list(dropped_cols)
+
+        self.impute_columns = [
+            col for col in self.columns if col not in self.dropped_cols
+        ]
+
+        self.imputer = imputer
+
+        self.fast_imputer = fast_imputer
+
+        self.use_fast_imputer = False
+
+        self.scaler = scaler
+
+        self.pca = pca
+
+        self.zero_std_cols = list(zero_std_cols)
+
+        self.missing_indicator = missing_indicator
+
+        self.dtype = dtype
+
+        self.kept_idx = np.array(
+            [
+                i
+                for i, col in enumerate(self.impute_columns)
+                if col not in self.zero_std_cols
+            ],
+            dtype=np.intp,
+        )
+
+        self.projection = None
+
+    def set_fast_imputation(self, enabled):
+        """
+        Method Name :   set_fast_imputation
+        Description :   This method sets whether the missing values are imputed with the fast imputer, which is only
+                        possible when the pipeline was built with one
+
+        Output      :   The imputer used by impute is set
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            self.use_fast_imputer = (
+                enabled and getattr(self, "fast_imputer", None) is not None
+            )
+
+        except Exception as e:
+            raise e
+
+    def fuse(self):
+        """
+        Method Name :   fuse
+        Description :   This method folds the column removal, the fitted scaler and the fitted PCA into a fused
+                        projection, which is used by transform from then on
+
+        Output      :   The fused projection is set
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            self.projection = Fused_Projection(
+                self.scaler,
+                self.pca,
+                self.kept_idx,
+                len(self.impute_columns),
+                dtype=self.dtype,
+            )
+
+        except Exception as e:
+            raise e
+
+    def impute(self, data):
+        """
+        Method Name :   impute
+        Description :   This method imputes the missing values of the feature columns with the fast imputer when
+                        fast imputation is set, otherwise with the fitted imputer. The columns dropped before
+                        imputation are left out.
+
+        Output      :   A numpy array with the imputed values of the feature columns
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            values = np.asarray(data[self.impute_columns], dtype=self.dtype)
+
+            imputer = (
+                self.fast_imputer
+                if getattr(self, "use_fast_imputer", False)
+                else self.imputer
+            )
+
+            return imputer.transform(values).astype(self.dtype, copy=False)
+
+        except Exception as e:
+            raise e
+
+    def select_columns(self, imputed):
+        """
+        Method Name :   select_columns
+        Description :   This method removes the columns with zero standard deviation from the imputed values
+
+        Output      :   A numpy array without the zero standard deviation columns
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            if len(self.kept_idx) == imputed.shape[1]:
+                return imputed
+
+            return imputed[:, self.kept_idx]
+
+        except Exception as e:
+            raise e
+
+    def project(self, values):
+        """
+        Method Name :   project
+        Description :   This method scales the values with the fitted scaler and applies the fitted PCA
+
+        Output      :   A numpy array of principal components
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            scaled = self.scaler.transform(values)
+
+            return self.pca.transform(scaled).astype(self.dtype, copy=False)
+
+        except Exception as e:
+            raise e
+
+    def add_missing_features(self, components, bitmap):
+        """
+        Method Name :   add_missing_features
+        Description :   This method appends the missing indicator features of the bitmap to the principal components
+
+        Output      :   A numpy array of principal components followed by the missing indicator features
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            features = self.missing_indicator.get_features(bitmap, dtype=self.dtype)
+
+            return np.hstack([components, features])
+
+        except Exception as e:
+            raise e
+
+    def transform(self, data, reuse_buffer=False):
+        """
+        Method Name :   transform
+        Description :   This method applies all the fitted preprocessing steps to the feature columns of data. When
+                        the pipeline is fused, the imputed values are projected with the fused projection, into the
+                        output buffer of the thread with reuse_buffer.
+
+        Output      :   A numpy array of principal components, with the missing indicator features if set
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            imputed = self.impute(data)
+
+            if getattr(self, "projection", None) is not None:
+                components = self.projection.transform(
+                    imputed, reuse_buffer=reuse_buffer
+                )
+
+            else:
+                components = self.project(self.select_columns(imputed))
+
+            if self.missing_indicator is None:
+                return components
+
+            return self.add_missing_features(
+                components, self.missing_indicator.get_bitmap(data)
+            )
+
+        except Exception as e:
+            raise e
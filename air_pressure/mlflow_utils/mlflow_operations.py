@@ -35,6 +35,10 @@ class MLFlow_Operation:
 
         self.model_save_format = self.config["save_format"]
 
+        self.compact_enabled = self.config["compact_model"]["enabled"]
+
+        self.compact_file_format = self.config["compact_model"]["file_format"]
+
     def get_experiment_from_mlflow(self, exp_name):
         """
         Method Name :   get_experiment_from_mlflow
@@ -279,6 +283,47 @@ class MLFlow_Operation:
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
 
+    def get_latest_model_version(self, model_name):
+        """
+        Method Name :   get_latest_model_version
+        Description :   This method gets the latest version of a registered model, which is not in any stage yet
+
+        Output      :   The latest version of the registered model
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_latest_model_version.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            remote_server_uri = os.environ["MLFLOW_TRACKING_URI"]
+
+            client = self.get_mlflow_client(server_uri=remote_server_uri)
+
+            model_version = client.get_latest_versions(model_name, stages=["None"])[
+                0
+            ].version
+
+            self.log_writer.log(
+                f"Got {model_version} as the latest version of {model_name}", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return model_version
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
     def log_model(self, model, model_name):
         """
         Method Name :   log_model
@@ -312,10 +357,10 @@ class MLFlow_Operation:
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
 
-    def log_metric(self, model_name, metric):
+    def log_metric(self, model_name, metric, metric_name="best_score"):
         """
         Method Name :   log_metric
-        Description :   This method logs the model metric to mlflow server
+        Description :   This method logs the model metric to mlflow server, named after the model and metric_name
 
         Output      :   A model metric is logged to mlflow server
         On Failure  :   Write an exception log and then raise an exception
@@ -331,7 +376,7 @@ class MLFlow_Operation:
         self.log_writer.start_log("start", **log_dic)
 
         try:
-            model_score_name = f"{model_name}-best_score"
+            model_score_name = f"{model_name}-{metric_name}"
 
             mlflow.log_metric(model_score_name, value=metric)
 
@@ -410,9 +455,65 @@ class MLFlow_Operation:
             for param in model_params_list:
                 self.log_param(idx, model, base_model_name, param=param)
 
-            self.log_model(model, base_model_name)
+            model_name = (
+                base_model_name if idx is None else base_model_name + str(idx)
+            )
+
+            self.log_model(model, model_name)
+
+            self.log_metric(model_name, metric=float(model_score))
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def copy_compact_model(self, from_model_file, from_bucket, to_model_file, to_bucket):
+        """
+        Method Name :   copy_compact_model
+        Description :   This method copies the compact export of a model along with the model, when compact export
+                        is enabled and the model has one
+
+        Output      :   The compact model is copied from one bucket to another
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.copy_compact_model.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
 
-            self.log_metric(base_model_name, metric=float(model_score))
+        try:
+            if self.compact_enabled is True:
+                from_compact_file = (
+                    from_model_file[: -len(self.model_save_format)]
+                    + self.compact_file_format
+                )
+
+                to_compact_file = (
+                    to_model_file[: -len(self.model_save_format)]
+                    + self.compact_file_format
+                )
+
+                f_obj = self.s3.get_file_object(
+                    from_compact_file, from_bucket, self.log_file
+                )
+
+                if not isinstance(f_obj, list):
+                    self.s3.copy_data(
+                        from_compact_file,
+                        from_bucket,
+                        to_compact_file,
+                        to_bucket,
+                        self.log_file,
+                    )
 
             self.log_writer.start_log("exit", **log_dic)
 
@@ -486,6 +587,10 @@ class MLFlow_Operation:
                     self.log_file,
                 )
 
+                self.copy_compact_model(
+                    trained_model_file, from_bucket, prod_model_file, to_bucket
+                )
+
             elif stage == "Staging":
                 self.log_writer.log(f"{stage} is selected for transition", **log_dic)
 
@@ -505,6 +610,10 @@ class MLFlow_Operation:
                     self.log_file,
                 )
 
+                self.copy_compact_model(
+                    trained_model_file, from_bucket, stag_model_file, to_bucket
+                )
+
             else:
                 self.log_writer.log(
                     "Please select stage for model transition", **log_dic
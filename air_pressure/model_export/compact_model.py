@@ -0,0 +1,579 @@
+from io import BytesIO
+
+import numpy as np
+from sklearn.ensemble import AdaBoostClassifier, RandomForestClassifier
+from sklearn.utils.extmath import softmax
+
+
+class Compact_Model:
+    """
+    Description :   This class shall be used for a compact export of RandomForestClassifier and AdaBoostClassifier
+                    models. The nodes of all trees are stored in contiguous arrays with float32 thresholds and the
+                    narrowest integer types for features and children, and only the values of the leaves are kept.
+                    Sibling leaves with the same prediction can be pruned into their parent. The export is saved as
+                    a npz file, which is read back without unpickling, and gives the same predictions as the model.
+
+    Version     :   1.0
+    Revisions   :   None
+    """
+
+    supported_models = (RandomForestClassifier, AdaBoostClassifier)
+
+    def __init__(
+        self,
+        model_name,
+        classes,
+        n_features,
+        node_offsets,
+        leaf_offsets,
+        feature,
+        threshold,
+        left,
+        right,
+        leaf_value=None,
+        leaf_class=None,
+        estimator_weights=None,
+    ):
+        self.model_name = str(model_name)
+
+        self.classes_ = np.asarray(classes)
+
+        self.n_classes_ = len(self.classes_)
+
+        self.n_features_in_ = int(n_features)
+
+        self.node_offsets = np.asarray(node_offsets, dtype=np.int64)
+
+        self.leaf_offsets = np.asarray(leaf_offsets, dtype=np.int64)
+
+        self.feature = feature
+
+        self.threshold = threshold
+
+        self.left = left
+
+        self.right = right
+
+        self.leaf_value = leaf_value
+
+        self.leaf_class = leaf_class
+
+        self.estimator_weights = estimator_weights
+
+        self.n_trees = len(self.node_offsets) - 1
+
+    @staticmethod
+    def get_threshold(threshold):
+        """
+        Method Name :   get_threshold
+        Description :   This method converts the float64 thresholds of a tree to float32. Features are compared as
+                        float32 values, so rounding every threshold down to the largest float32 not above it keeps
+                        every comparison, and so every prediction, the same.
+
+        Output      :   The float32 thresholds
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            threshold32 = threshold.astype(np.float32)
+
+            above = threshold32.astype(np.float64) > threshold
+
+            threshold32[above] = np.nextafter(
+                threshold32[above], np.float32(-np.inf), dtype=np.float32
+            )
+
+            return threshold32
+
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    def get_leaf_values(estimator, classify):
+        """
+        Method Name :   get_leaf_values
+        Description :   This method gets the prediction of every node of a tree like the tree itself makes it. With
+                        classify, it is the index of the predicted class, otherwise it is the class probabilities,
+                        which the tree keeps as the weighted class fractions of every node.
+
+        Output      :   An array of class indices or class probabilities, one row per node
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            value = estimator.tree_.value[:, 0, : estimator.n_classes_]
+
+            if classify:
+                return np.argmax(value, axis=1)
+
+            return value.copy()
+
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    def flatten_tree(estimator, leaf_values, prune=True):
+        """
+        Method Name :   flatten_tree
+        Description :   This method flattens a tree into its internal nodes and leaves. Children are the index of an
+                        internal node, or the bitwise not of the index of a leaf, so that leaves are negative. With
+                        prune, an internal node whose children are both leaves with the same value becomes a leaf.
+
+        Output      :   The feature, threshold, left and right arrays of the internal nodes, and the leaf values
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            tree = estimator.tree_
+
+            children_left = tree.children_left.copy()
+
+            children_right = tree.children_right.copy()
+
+            is_leaf = children_left == -1
+
+            if prune:
+                for node in range(tree.node_count - 1, -1, -1):
+                    if is_leaf[node]:
+                        continue
+
+                    l, r = children_left[node], children_right[node]
+
+                    if (
+                        is_leaf[l]
+                        and is_leaf[r]
+                        and np.array_equal(leaf_values[l], leaf_values[r])
+                    ):
+                        is_leaf[node] = True
+
+                        leaf_values[node] = leaf_values[l]
+
+            internal, leaves, stack = [], [], [0]
+
+            node_idx = {}
+
+            while stack:
+                node = stack.pop()
+
+                if is_leaf[node]:
+                    node_idx[node] = ~len(leaves)
+
+                    leaves.append(node)
+
+                    continue
+
+                node_idx[node] = len(internal)
+
+                internal.append(node)
+
+                stack.extend((children_right[node], children_left[node]))
+
+            internal = np.array(internal, dtype=np.intp)
+
+            left = np.array([node_idx[n] for n in children_left[internal]], dtype=np.int64)
+
+            right = np.array([node_idx[n] for n in children_right[internal]], dtype=np.int64)
+
+            return (
+                tree.feature[internal],
+                tree.threshold[internal],
+                left,
+                right,
+                leaf_values[np.array(leaves, dtype=np.intp)],
+            )
+
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    def get_index_dtype(max_value, signed=False):
+        """
+        Method Name :   get_index_dtype
+        Description :   This method gets the narrowest integer type that holds indices up to max_value, and down to
+                        the bitwise not of max_value when signed
+
+        Output      :   A numpy integer type
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            for dtype in (
+                (np.int8, np.int16, np.int32, np.int64)
+                if signed
+                else (np.uint8, np.uint16, np.uint32, np.uint64)
+            ):
+                if max_value <= np.iinfo(dtype).max:
+                    return dtype
+
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    def from_model(model, prune=True, value_dtype=np.float64):
+        """
+        Method Name :   from_model
+        Description :   This method creates the compact export of a fitted RandomForestClassifier or
+                        AdaBoostClassifier. The leaf probabilities of a random forest are kept as value_dtype, and
+                        float64 gives the same probabilities as the model. An AdaBoostClassifier only keeps the
+                        predicted class of every leaf.
+
+        Output      :   A Compact_Model
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            if not isinstance(model, Compact_Model.supported_models):
+                raise TypeError(
+                    f"{model.__class__.__name__} is not supported for compact export"
+                )
+
+            classify = isinstance(model, AdaBoostClassifier)
+
+            trees = [
+                Compact_Model.flatten_tree(
+                    estimator,
+                    Compact_Model.get_leaf_values(estimator, classify),
+                    prune=prune,
+                )
+                for estimator in model.estimators_
+            ]
+
+            feature, threshold, left, right, leaf_values = (
+                np.concatenate(arrays) for arrays in zip(*trees)
+            )
+
+            node_offsets = np.cumsum([0] + [len(tree[0]) for tree in trees])
+
+            leaf_offsets = np.cumsum([0] + [len(tree[4]) for tree in trees])
+
+            max_child = max([1] + [max(len(tree[0]), len(tree[4])) for tree in trees])
+
+            child_dtype = Compact_Model.get_index_dtype(max_child, signed=True)
+
+            return Compact_Model(
+                model_name=model.__class__.__name__,
+                classes=model.classes_,
+                n_features=model.n_features_in_,
+                node_offsets=node_offsets,
+                leaf_offsets=leaf_offsets,
+                feature=feature.astype(
+                    Compact_Model.get_index_dtype(model.n_features_in_)
+                ),
+                threshold=Compact_Model.get_threshold(threshold),
+                left=left.astype(child_dtype),
+                right=right.astype(child_dtype),
+                leaf_value=None if classify else leaf_values.astype(value_dtype),
+                leaf_class=(
+                    leaf_values.astype(Compact_Model.get_index_dtype(model.n_classes_))
+                    if classify
+                    else None
+                ),
+                estimator_weights=(
+                    model.estimator_weights_.copy() if classify else None
+                ),
+            )
+
+        except Exception as e:
+            raise e
+
+    def to_bytes(self):
+        """
+        Method Name :   to_bytes
+        Description :   This method writes the arrays of the compact model into an uncompressed npz file in memory
+
+        Output      :   The bytes of the npz file
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            arrays = {
+                "model_name": np.array(self.model_name),
+                "classes": self.classes_,
+                "n_features": np.array(self.n_features_in_),
+                "node_offsets": self.node_offsets,
+                "leaf_offsets": self.leaf_offsets,
+                "feature": self.feature,
+                "threshold": self.threshold,
+                "left": self.left,
+                "right": self.right,
+            }
+
+            for name in ("leaf_value", "leaf_class", "estimator_weights"):
+                if getattr(self, name) is not None:
+                    arrays[name] = getattr(self, name)
+
+            buffer = BytesIO()
+
+            np.savez(buffer, **arrays)
+
+            return buffer.getvalue()
+
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    def from_bytes(data):
+        """
+        Method Name :   from_bytes
+        Description :   This method reads a compact model from the bytes of its npz file, without unpickling
+
+        Output      :   A Compact_Model
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            with np.load(BytesIO(data), allow_pickle=False) as npz:
+                arrays = {name: npz[name] for name in npz.files}
+
+            arrays["model_name"] = arrays["model_name"].item()
+
+            arrays["n_features"] = arrays["n_features"].item()
+
+            return Compact_Model(**arrays)
+
+        except Exception as e:
+            raise e
+
+    def set_read_only(self):
+        """
+        Method Name :   set_read_only
+        Description :   This method makes every array of the model read only, so that no write can copy the pages of
+                        a model shared between forked worker processes
+
+        Output      :   The arrays of the model are read only
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            for value in vars(self).values():
+                if isinstance(value, np.ndarray):
+                    value.flags.writeable = False
+
+        except Exception as e:
+            raise e
+
+    def apply_tree(self, X, tree):
+        """
+        Method Name :   apply_tree
+        Description :   This method finds the leaf of a tree for every row of X. The rows still inside the tree are
+                        moved one level down at a time.
+
+        Output      :   The leaf index of every row, within the leaves of the tree
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            start, end = self.node_offsets[tree], self.node_offsets[tree + 1]
+
+            node = np.zeros(len(X), dtype=np.intp)
+
+            if start == end:
+                return node
+
+            feature = self.feature[start:end]
+
+            threshold = self.threshold[start:end]
+
+            left, right = self.left[start:end], self.right[start:end]
+
+            rows = np.arange(len(X))
+
+            while len(rows):
+                current = node[rows]
+
+                node[rows] = np.where(
+                    X[rows, feature[current]] <= threshold[current],
+                    left[current],
+                    right[current],
+                )
+
+                rows = rows[node[rows] >= 0]
+
+            return ~node
+
+        except Exception as e:
+            raise e
+
+    def apply(self, X):
+        """
+        Method Name :   apply
+        Description :   This method finds the leaf of every tree for every row of X, one tree at a time
+
+        Output      :   An array of leaf indices with one row per tree and one column per row of X
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            leaves = np.empty((self.n_trees, len(X)), dtype=np.intp)
+
+            for tree in range(self.n_trees):
+                leaves[tree] = self.leaf_offsets[tree] + self.apply_tree(X, tree)
+
+            return leaves
+
+        except Exception as e:
+            raise e
+
+    def check_X(self, X):
+        """
+        Method Name :   check_X
+        Description :   This method converts X to a float32 array, which is what the trees of the model compare
+
+        Output      :   A float32 numpy array
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            X = np.asarray(X, dtype=np.float32)
+
+            if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+                raise ValueError(
+                    f"X has shape {X.shape}, but {self.model_name} expects {self.n_features_in_} features"
+                )
+
+            return X
+
+        except Exception as e:
+            raise e
+
+    def decision_function(self, X):
+        """
+        Method Name :   decision_function
+        Description :   This method computes the SAMME decision function of an AdaBoostClassifier export, adding
+                        the estimators in the same order as the model does
+
+        Output      :   The decision function, one value per row for two classes
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            if self.leaf_class is None:
+                raise AttributeError(f"{self.model_name} has no decision_function")
+
+            X = self.check_X(X)
+
+            if self.n_classes_ == 1:
+                return np.zeros((len(X), 1), dtype=np.float64)
+
+            leaves = self.apply(X)
+
+            pred = np.zeros((len(X), self.n_classes_), dtype=np.float64)
+
+            class_idx = np.arange(self.n_classes_)
+
+            for tree, w in zip(range(self.n_trees), self.estimator_weights):
+                leaf_class = self.leaf_class[leaves[tree]]
+
+                pred += np.where(
+                    leaf_class[:, np.newaxis] == class_idx,
+                    w,
+                    -1 / (self.n_classes_ - 1) * w,
+                )
+
+            pred /= self.estimator_weights.sum()
+
+            if self.n_classes_ == 2:
+                pred[:, 0] *= -1
+
+                return pred.sum(axis=1)
+
+            return pred
+
+        except Exception as e:
+            raise e
+
+    def predict_proba(self, X):
+        """
+        Method Name :   predict_proba
+        Description :   This method predicts the class probabilities of X. A random forest export averages the leaf
+                        probabilities of its trees, adding the trees in the same order as the model, and an
+                        AdaBoostClassifier export applies softmax to the decision function.
+
+        Output      :   The class probabilities, one column per class
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            if self.leaf_class is not None:
+                decision = self.decision_function(X)
+
+                if self.n_classes_ == 1:
+                    return np.ones((len(decision), 1), dtype=np.float64)
+
+                if self.n_classes_ == 2:
+                    decision = np.vstack([-decision, decision]).T / 2
+
+                else:
+                    decision /= self.n_classes_ - 1
+
+                return softmax(decision, copy=False)
+
+            leaves = self.apply(self.check_X(X))
+
+            proba = np.zeros((self.n_classes_, leaves.shape[1]), dtype=np.float64)
+
+            for k in range(self.n_classes_):
+                leaf_value = np.ascontiguousarray(self.leaf_value[:, k])
+
+                for tree in range(self.n_trees):
+                    proba[k] += leaf_value[leaves[tree]]
+
+            proba = np.ascontiguousarray(proba.T)
+
+            proba /= self.n_trees
+
+            return proba
+
+        except Exception as e:
+            raise e
+
+    def predict(self, X):
+        """
+        Method Name :   predict
+        Description :   This method predicts the class of every row of X
+
+        Output      :   The predicted classes
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            if self.leaf_class is not None:
+                decision = self.decision_function(X)
+
+                if self.n_classes_ == 2:
+                    return self.classes_.take(decision > 0, axis=0)
+
+                return self.classes_.take(np.argmax(decision, axis=1), axis=0)
+
+            return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+        except Exception as e:
+            raise e
@@ -0,0 +1,296 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from air_pressure.s3_bucket_operations.s3_operations import S3_Operation
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+
+class CV_Cache:
+    """
+    Description :   This class shall be used to keep the cross validation scores of the hyperparameter search
+                    across training runs. Scores are keyed by the hash of the training data, the cluster number,
+                    the model class, the fixed params of the model and the searched params, and kept in one json
+                    file per cluster, either locally or also in the mlflow bucket.
+
+    Version     :   1.0
+    Revisions   :   None
+    """
+
+    def __init__(self, log_file, cluster=None):
+        self.log_writer = App_Logger()
+
+        self.config = read_params()
+
+        self.log_file = log_file
+
+        self.cluster = cluster
+
+        self.cv = self.config["model_utils"]["cv"]
+
+        self.cache_dir = self.config["cv_cache"]["dir"]
+
+        self.store = self.config["cv_cache"]["store"]
+
+        self.mlflow_bucket = self.config["s3_bucket"]["air_pressure-mlflow_bucket"]
+
+        self.cache_file = f"{cluster}-" + self.config["cv_cache"]["file"]
+
+        self.cache_path = os.path.join(self.cache_dir, self.cache_file)
+
+        self.s3 = S3_Operation()
+
+        self.scores = None
+
+        self.data_hash = None
+
+    def set_data_hash(self, X, y, sample_weight=None):
+        """
+        Method Name :   set_data_hash
+        Description :   This method computes a fingerprint of the training data, labels, sample weights and the
+                        number of cv folds, which decide the cross validation scores together with the params.
+                        The fingerprint is used in the keys of the following candidates.
+
+        Output      :   A hex digest of the training data
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.set_data_hash.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            data_hash = hashlib.blake2b(f"cv={self.cv}".encode(), digest_size=20)
+
+            for data in (X, y, sample_weight):
+                if data is None:
+                    continue
+
+                data = np.ascontiguousarray(data)
+
+                data_hash.update(f"{data.shape}{data.dtype}".encode())
+
+                data_hash.update(memoryview(data).cast("B"))
+
+            self.data_hash = data_hash.hexdigest()
+
+            self.log_writer.log(f"Got {self.data_hash} as training data hash", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return self.data_hash
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    ignored_params = ("n_jobs", "verbose")
+
+    def get_key(self, model, params):
+        """
+        Method Name :   get_key
+        Description :   This method creates the cache key of a candidate from the data hash, cluster number, model
+                        class name, the params of the model which are not searched, like its random_state, and the
+                        searched params. n_jobs and verbose do not change the scores and are left out.
+
+        Output      :   The cache key as a string
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_key.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        try:
+            fixed_params = {
+                name: value
+                for name, value in model.get_params(deep=False).items()
+                if name not in params and name not in self.ignored_params
+            }
+
+            return json.dumps(
+                [
+                    self.data_hash,
+                    self.cluster,
+                    model.__class__.__name__,
+                    fixed_params,
+                    params,
+                ],
+                sort_keys=True,
+                default=str,
+            )
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def load(self):
+        """
+        Method Name :   load
+        Description :   This method loads the cached scores from the local cache file. With s3 store, the cache file
+                        is read from the mlflow bucket when it is not present locally. The objects found with the
+                        cache file name as prefix are checked for the exact name, as a single match is returned as an
+                        object and not as a list.
+
+        Output      :   The cached scores are loaded
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.load.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            self.scores = {}
+
+            if os.path.exists(self.cache_path):
+                with open(self.cache_path) as f:
+                    self.scores = json.load(f)
+
+            elif self.store == "s3":
+                f_objs = self.s3.get_file_object(
+                    self.cache_path, self.mlflow_bucket, self.log_file
+                )
+
+                f_objs = f_objs if isinstance(f_objs, list) else [f_objs]
+
+                cache_objs = [obj for obj in f_objs if obj.key == self.cache_path]
+
+                if cache_objs:
+                    self.scores = json.loads(
+                        self.s3.read_object(cache_objs[0], self.log_file)
+                    )
+
+            self.log_writer.log(
+                f"Loaded {len(self.scores)} cached cv scores", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get(self, key):
+        """
+        Method Name :   get
+        Description :   This method gets the cached cv score of a candidate
+
+        Output      :   The cached cv score, or None if the candidate was not evaluated before
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        try:
+            if self.scores is None:
+                self.load()
+
+            return self.scores.get(key)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def put(self, scores):
+        """
+        Method Name :   put
+        Description :   This method adds the cv scores of evaluated candidates to the cache, and writes the cache file
+                        right away, so that a crashed run keeps the scores it already computed
+
+        Output      :   The cache file is updated
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.put.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            if self.scores is None:
+                self.load()
+
+            self.scores.update({key: float(score) for key, score in scores.items()})
+
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+            tmp_path = self.cache_path + ".tmp"
+
+            with open(tmp_path, "w") as f:
+                json.dump(self.scores, f)
+
+            os.replace(tmp_path, self.cache_path)
+
+            self.log_writer.log(f"Cached {len(scores)} cv scores", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def save(self):
+        """
+        Method Name :   save
+        Description :   This method uploads the local cache file to the mlflow bucket, when the store is s3
+
+        Output      :   The cache file is uploaded to s3 bucket
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.save.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            if self.store == "s3" and os.path.exists(self.cache_path):
+                self.s3.upload_file(
+                    self.cache_path,
+                    self.cache_path,
+                    self.mlflow_bucket,
+                    self.log_file,
+                    remove=False,
+                )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
@@ -0,0 +1,874 @@
+import json
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.ensemble import AdaBoostClassifier, RandomForestClassifier
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.metrics import accuracy_score, roc_auc_score
+from sklearn.model_selection import (
+    GridSearchCV,
+    HalvingGridSearchCV,
+    ParameterGrid,
+    StratifiedKFold,
+)
+
+from air_pressure.model_finder.cv_cache import CV_Cache
+from utils.cpu_budget import CPU_Budget
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+
+class Model_Finder:
+    """
+    Description :   This class shall be used to find the model with best accuracy and AUC score.
+
+    Version     :   1.0
+    Revisions   :   None
+    """
+
+    def __init__(self, log_file):
+        self.log_file = log_file
+
+        self.config = read_params()
+
+        self.log_writer = App_Logger()
+
+        self.random_state = self.config["base"]["random_state"]
+
+        self.cv = self.config["model_utils"]["cv"]
+
+        self.verbose = self.config["model_utils"]["verbose"]
+
+        self.cpu_budget = CPU_Budget(log_file)
+
+        self.n_jobs = self.cpu_budget.get_search_jobs(
+            self.config["model_utils"]["n_jobs"]
+        )
+
+        self.estimator_n_jobs = self.cpu_budget.get_estimator_jobs(
+            self.config["model_utils"]["n_jobs"]
+        )
+
+        self.search_mode = self.config["model_utils"]["search"]
+
+        self.halving_factor = self.config["model_utils"]["halving"]["factor"]
+
+        self.halving_resource = self.config["model_utils"]["halving"]["resource"]
+
+        self.halving_min_resources = self.config["model_utils"]["halving"][
+            "min_resources"
+        ]
+
+        self.use_subsample = self.config["model_utils"]["subsample"]["enabled"]
+
+        self.subsample_fraction = self.config["model_utils"]["subsample"]["fraction"]
+
+        self.use_cv_cache = self.config["cv_cache"]["enabled"]
+
+        self.search_scores = {}
+
+        self.search_score = None
+
+        self.rf_model = RandomForestClassifier(
+            random_state=self.random_state, n_jobs=self.estimator_n_jobs
+        )
+
+        self.ada_model = AdaBoostClassifier()
+
+    def get_model_params(self, model):
+        """
+        Method Name :   get_model_params
+        Description :   This method gets the params grid of the model from params.yaml, using the model class name
+
+        Output      :   A dict of param names and list of values
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_model_params.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            model_name = model.__class__.__name__
+
+            model_param_grid = self.config[model_name]
+
+            self.log_writer.log(f"Got {model_name} params from params.yaml", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return model_param_grid
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_n_candidates(self, model_param_grid):
+        """
+        Method Name :   get_n_candidates
+        Description :   This method gets the number of candidates which are fitted on every cv fold at once by the
+                        search mode. The prefix mode, and the halving mode with n_estimators resource, fit one
+                        candidate per combination of the other params, and the other modes fit every candidate of
+                        the params grid.
+
+        Output      :   The number of candidates
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_n_candidates.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        try:
+            param_grid = dict(model_param_grid)
+
+            if self.search_mode == "prefix" or (
+                self.search_mode == "halving"
+                and self.halving_resource == "n_estimators"
+            ):
+                param_grid.pop("n_estimators")
+
+            return len(ParameterGrid(param_grid))
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_max_candidates(self):
+        """
+        Method Name :   get_max_candidates
+        Description :   This method gets the largest number of candidates of the searched models
+
+        Output      :   The number of candidates
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_max_candidates.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        try:
+            return max(
+                self.get_n_candidates(self.config[model.__class__.__name__])
+                for model in (self.ada_model, self.rf_model)
+            )
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def set_search_jobs(self, model, model_param_grid):
+        """
+        Method Name :   set_search_jobs
+        Description :   This method splits the cores between the search jobs and the estimator threads of the model,
+                        from the number of candidates of its params grid, so that a search with fewer fits than cores
+                        gives the rest of the cores to the estimator threads
+
+        Output      :   The search jobs and the estimator threads of the model are set
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.set_search_jobs.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            n_jobs = self.config["model_utils"]["n_jobs"]
+
+            n_candidates = self.get_n_candidates(model_param_grid)
+
+            self.n_jobs = self.cpu_budget.get_search_jobs(n_jobs, n_candidates)
+
+            self.estimator_n_jobs = self.cpu_budget.get_estimator_jobs(
+                n_jobs, n_candidates
+            )
+
+            if "n_jobs" in model.get_params():
+                model.set_params(n_jobs=self.estimator_n_jobs)
+
+            self.log_writer.log(
+                f"Set {self.n_jobs} search jobs and {self.estimator_n_jobs} estimator threads for {n_candidates} candidates of {model.__class__.__name__}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_search_cv(self, model, model_param_grid, refit=True):
+        """
+        Method Name :   get_search_cv
+        Description :   This method creates the search over the params grid based on the search mode in params.yaml.
+                        grid evaluates every candidate with GridSearchCV. halving evaluates every candidate on a small
+                        budget with HalvingGridSearchCV, and only promotes the best candidates to larger budgets.
+                        The budget is either the number of samples, or the number of trees with n_estimators resource.
+                        Without refit, the best params are not refitted on the searched data.
+
+        Output      :   An unfitted search cv object
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_search_cv.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            if self.search_mode != "halving":
+                search_cv = GridSearchCV(
+                    model,
+                    model_param_grid,
+                    cv=self.cv,
+                    refit=refit,
+                    verbose=self.verbose,
+                    n_jobs=self.n_jobs,
+                )
+
+            elif self.halving_resource == "n_estimators":
+                param_grid = dict(model_param_grid)
+
+                n_estimators = param_grid.pop("n_estimators")
+
+                search_cv = HalvingGridSearchCV(
+                    model,
+                    param_grid,
+                    factor=self.halving_factor,
+                    resource="n_estimators",
+                    min_resources=min(n_estimators),
+                    max_resources=max(n_estimators),
+                    random_state=self.random_state,
+                    cv=self.cv,
+                    refit=refit,
+                    verbose=self.verbose,
+                    n_jobs=self.n_jobs,
+                )
+
+            else:
+                search_cv = HalvingGridSearchCV(
+                    model,
+                    model_param_grid,
+                    factor=self.halving_factor,
+                    resource="n_samples",
+                    min_resources=self.halving_min_resources,
+                    random_state=self.random_state,
+                    cv=self.cv,
+                    refit=refit,
+                    verbose=self.verbose,
+                    n_jobs=self.n_jobs,
+                )
+
+            self.log_writer.log(
+                f"Initialized {search_cv.__class__.__name__} for {model.__class__.__name__}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return search_cv
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    @staticmethod
+    def score_candidate(model, X, y, train, test, sample_weight=None):
+        """
+        Method Name :   score_candidate
+        Description :   This method fits the model on the train fold and scores it on the test fold
+
+        Output      :   The accuracy score on the test fold
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            fold_weight = None if sample_weight is None else sample_weight[train]
+
+            model.fit(X[train], y[train], sample_weight=fold_weight)
+
+            return accuracy_score(y[test], model.predict(X[test]))
+
+        except Exception as e:
+            raise e
+
+    def get_cached_search_model(
+        self,
+        model,
+        model_param_grid,
+        x_train,
+        y_train,
+        cv_cache,
+        sample_weight=None,
+        refit=True,
+    ):
+        """
+        Method Name :   get_cached_search_model
+        Description :   This method searches the params grid like GridSearchCV, but takes the cv scores of
+                        candidates evaluated in earlier runs from the cv cache. Only the new candidates are
+                        evaluated, and each of them is cached as soon as all of its folds are scored.
+
+        Output      :   The model with best params fitted on the training data, or None without refit, the best
+                        params and the best cv score
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_cached_search_model.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            X, y = np.asarray(x_train), np.asarray(y_train)
+
+            model_name = model.__class__.__name__
+
+            candidates = [dict(params) for params in ParameterGrid(model_param_grid)]
+
+            keys = [cv_cache.get_key(model, params) for params in candidates]
+
+            missing = [i for i, key in enumerate(keys) if cv_cache.get(key) is None]
+
+            self.log_writer.log(
+                f"Found {len(keys) - len(missing)} of {len(keys)} candidates in cv cache",
+                **log_dic,
+            )
+
+            folds = list(StratifiedKFold(n_splits=self.cv).split(X, y))
+
+            fold_scores = Parallel(
+                n_jobs=self.n_jobs, verbose=self.verbose, return_as="generator"
+            )(
+                delayed(self.score_candidate)(
+                    clone(model).set_params(**candidates[i]),
+                    X,
+                    y,
+                    train,
+                    test,
+                    sample_weight,
+                )
+                for i in missing
+                for train, test in folds
+            )
+
+            for i in missing:
+                scores = [next(fold_scores) for _ in folds]
+
+                cv_cache.put({keys[i]: np.mean(scores)})
+
+            best_params, best_score = None, None
+
+            for params, key in zip(candidates, keys):
+                score = cv_cache.get(key)
+
+                if best_score is None or score > best_score:
+                    best_params, best_score = params, score
+
+            best_model = None
+
+            if refit:
+                best_model = clone(model).set_params(**best_params)
+
+                best_model.fit(X, y, sample_weight=sample_weight)
+
+            self.log_writer.log(
+                f"Got best params {best_params} for {model_name} with cv score {best_score}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return best_model, best_params, best_score
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    @staticmethod
+    def score_prefixes(model, X, y, train, test, n_estimators_list, sample_weight=None):
+        """
+        Method Name :   score_prefixes
+        Description :   This method fits the model with the largest n_estimators on the train fold, and scores every
+                        smaller n_estimators on the test fold from the prefixes of the fitted ensemble. The first k
+                        trees of a RandomForestClassifier, and the first k stages of an AdaBoostClassifier, are the
+                        same as the ones of a model fitted with n_estimators as k and the same random state.
+
+        Output      :   A list of accuracy scores, one per n_estimators in n_estimators_list
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            fold_weight = None if sample_weight is None else sample_weight[train]
+
+            model.fit(X[train], y[train], sample_weight=fold_weight)
+
+            x_test, y_test = X[test], y[test]
+
+            if hasattr(model, "staged_predict"):
+                stages = list(model.staged_predict(x_test))
+
+                return [
+                    accuracy_score(y_test, stages[min(n, len(stages)) - 1])
+                    for n in n_estimators_list
+                ]
+
+            x_test = np.asarray(x_test, dtype=np.float32)
+
+            proba, scores = 0.0, []
+
+            for n, tree in enumerate(model.estimators_, start=1):
+                proba = proba + tree.predict_proba(x_test)
+
+                if n in n_estimators_list:
+                    y_pred = model.classes_.take(np.argmax(proba, axis=1))
+
+                    scores.append(accuracy_score(y_test, y_pred))
+
+            return scores
+
+        except Exception as e:
+            raise e
+
+    def get_prefix_search_model(
+        self,
+        model,
+        model_param_grid,
+        x_train,
+        y_train,
+        sample_weight=None,
+        cv_cache=None,
+        refit=True,
+    ):
+        """
+        Method Name :   get_prefix_search_model
+        Description :   This method searches the params grid like GridSearchCV, but fits only the largest
+                        n_estimators for every other combination of params. The smaller n_estimators are scored
+                        from the prefixes of that ensemble, and the best candidate is picked in the same order as
+                        GridSearchCV, then refitted on the training data. With a cv cache, only the combinations
+                        which have uncached candidates are fitted.
+
+        Output      :   The model with best params fitted on the training data, or None without refit, the best
+                        params and the best cv score
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_prefix_search_model.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            X, y = np.asarray(x_train), np.asarray(y_train)
+
+            model_name = model.__class__.__name__
+
+            param_grid = dict(model_param_grid)
+
+            n_estimators_list = sorted(param_grid.pop("n_estimators"))
+
+            combinations = [dict(params) for params in ParameterGrid(param_grid)]
+
+            keys = [
+                [
+                    json.dumps(dict(params, n_estimators=n), sort_keys=True)
+                    if cv_cache is None
+                    else cv_cache.get_key(model, dict(params, n_estimators=n))
+                    for n in n_estimators_list
+                ]
+                for params in combinations
+            ]
+
+            mean_scores, missing = {}, []
+
+            for i, combination_keys in enumerate(keys):
+                cached = [
+                    None if cv_cache is None else cv_cache.get(key)
+                    for key in combination_keys
+                ]
+
+                if None in cached:
+                    missing.append(i)
+
+                else:
+                    mean_scores.update(zip(combination_keys, cached))
+
+            folds = list(StratifiedKFold(n_splits=self.cv).split(X, y))
+
+            fold_scores = Parallel(
+                n_jobs=self.n_jobs, verbose=self.verbose, return_as="generator"
+            )(
+                delayed(self.score_prefixes)(
+                    clone(model).set_params(
+                        **combinations[i], n_estimators=n_estimators_list[-1]
+                    ),
+                    X,
+                    y,
+                    train,
+                    test,
+                    n_estimators_list,
+                    sample_weight,
+                )
+                for i in missing
+                for train, test in folds
+            )
+
+            for i in missing:
+                scores = np.mean([next(fold_scores) for _ in folds], axis=0)
+
+                combination_scores = dict(zip(keys[i], scores))
+
+                mean_scores.update(combination_scores)
+
+                if cv_cache is not None:
+                    cv_cache.put(combination_scores)
+
+            self.log_writer.log(
+                f"Fitted {len(missing) * len(folds)} ensembles for {len(combinations) * len(folds) * len(n_estimators_list)} candidate fits",
+                **log_dic,
+            )
+
+            best_params, best_score = None, None
+
+            for params in ParameterGrid(model_param_grid):
+                params = dict(params)
+
+                n = n_estimators_list.index(params.pop("n_estimators"))
+
+                score = mean_scores[keys[combinations.index(params)][n]]
+
+                if best_score is None or score > best_score:
+                    best_params = dict(params, n_estimators=n_estimators_list[n])
+
+                    best_score = score
+
+            best_model = None
+
+            if refit:
+                best_model = clone(model).set_params(**best_params)
+
+                best_model.fit(X, y, sample_weight=sample_weight)
+
+            self.log_writer.log(
+                f"Got best params {best_params} for {model_name} with cv score {best_score}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return best_model, best_params, best_score
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_search_sample(self, x_train, y_train, sample_weight=None):
+        """
+        Method Name :   get_search_sample
+        Description :   This method takes a stratified sample of subsample fraction of the training data for the
+                        hyperparameter search, seeded with the random state. Every class keeps at least as many rows
+                        as there are cv folds, so that the rare positive class is in every fold.
+
+        Output      :   The sampled features, labels and sample weights
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_search_sample.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            y = np.asarray(y_train)
+
+            rng = np.random.RandomState(self.random_state)
+
+            idx = []
+
+            for label in np.unique(y):
+                label_idx = np.flatnonzero(y == label)
+
+                n_rows = max(
+                    int(round(self.subsample_fraction * len(label_idx))),
+                    min(len(label_idx), self.cv),
+                )
+
+                idx.append(rng.choice(label_idx, n_rows, replace=False))
+
+            idx = np.sort(np.concatenate(idx))
+
+            self.log_writer.log(
+                f"Took a stratified sample of {len(idx)} rows from {len(y)} rows for search",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return (
+                np.asarray(x_train)[idx],
+                y[idx],
+                None if sample_weight is None else np.asarray(sample_weight)[idx],
+            )
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_best_params_for_model(
+        self, model, x_train, y_train, sample_weight=None, cv_cache=None
+    ):
+        """
+        Method Name :   get_best_params_for_model
+        Description :   This method searches the params grid of the model, and fits a new model with the best params
+                        on the training data. The cores are split between the search jobs and the estimator threads
+                        for the params grid first. The prefix search mode uses get_prefix_search_model, the grid mode
+                        with a cv cache uses get_cached_search_model, and the other modes use the search cv from
+                        get_search_cv, without the cv cache. With subsample, the search runs on a stratified sample
+                        of the training data, and only the best params are fitted once on the full training data.
+
+        Output      :   The model with best params, fitted on the training data
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_best_params_for_model.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            model_name = model.__class__.__name__
+
+            model_param_grid = self.get_model_params(model)
+
+            self.set_search_jobs(model, model_param_grid)
+
+            if self.use_subsample:
+                x_search, y_search, search_weight = self.get_search_sample(
+                    x_train, y_train, sample_weight
+                )
+
+            else:
+                x_search, y_search, search_weight = x_train, y_train, sample_weight
+
+            if self.search_mode == "halving":
+                cv_cache = None
+
+            if cv_cache is not None:
+                cv_cache.set_data_hash(x_search, y_search, search_weight)
+
+            refit = not self.use_subsample
+
+            if self.search_mode == "prefix":
+                best_model, best_params, best_score = self.get_prefix_search_model(
+                    model,
+                    model_param_grid,
+                    x_search,
+                    y_search,
+                    search_weight,
+                    cv_cache,
+                    refit=refit,
+                )
+
+            elif self.search_mode == "grid" and cv_cache is not None:
+                best_model, best_params, best_score = self.get_cached_search_model(
+                    model,
+                    model_param_grid,
+                    x_search,
+                    y_search,
+                    cv_cache,
+                    search_weight,
+                    refit=refit,
+                )
+
+            else:
+                model_grid = self.get_search_cv(model, model_param_grid, refit=refit)
+
+                model_grid.fit(x_search, y_search, sample_weight=search_weight)
+
+                best_model, best_params, best_score = (
+                    model_grid.best_estimator_ if refit else None,
+                    model_grid.best_params_,
+                    model_grid.best_score_,
+                )
+
+            self.log_writer.log(
+                f"Found the best params for {model_name} as {best_params} with cv score {best_score}",
+                **log_dic,
+            )
+
+            if best_model is None:
+                best_model = clone(model).set_params(**best_params)
+
+                best_model.fit(x_train, y_train, sample_weight=sample_weight)
+
+                self.log_writer.log(
+                    f"Refitted {model_name} with best params on {len(y_train)} rows",
+                    **log_dic,
+                )
+
+            self.search_scores[model_name] = best_score
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return best_model
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_model_score(self, model, test_x, test_y):
+        """
+        Method Name :   get_model_score
+        Description :   This method gets the model score on the test data. AUC is used when both classes are
+                        present in the test labels, otherwise the accuracy is used.
+
+        Output      :   The model score
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_model_score.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            model_name = model.__class__.__name__
+
+            if len(set(test_y)) == 1:
+                model_score = accuracy_score(test_y, model.predict(test_x))
+
+                self.log_writer.log(
+                    f"Accuracy for {model_name} is {model_score}", **log_dic
+                )
+
+            else:
+                model_score = roc_auc_score(test_y, model.predict_proba(test_x)[:, 1])
+
+                self.log_writer.log(f"AUC for {model_name} is {model_score}", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return model_score
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_best_model(
+        self, x_train, y_train, x_test, y_test, sample_weight=None, cluster=None
+    ):
+        """
+        Method Name :   get_best_model
+        Description :   This method finds the best params for RandomForestClassifier and AdaBoostClassifier, and
+                        selects the model with the best score on the test data. When the cv cache is enabled, the
+                        cv scores of earlier runs on the same data of the cluster are reused, except by the halving
+                        search, whose candidates are scored on budgets which are not cached. The search cv score of
+                        the selected model is kept as search_score.
+
+        Output      :   The best model and its score
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_best_model.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            best_model, best_model_score, cv_cache = None, None, None
+
+            if self.use_cv_cache and self.search_mode == "halving":
+                self.log_writer.log(
+                    "The cv cache is enabled but not used by the halving search, searching without it",
+                    **log_dic,
+                )
+
+            elif self.use_cv_cache:
+                cv_cache = CV_Cache(self.log_file, cluster)
+
+            for model in (self.ada_model, self.rf_model):
+                tuned_model = self.get_best_params_for_model(
+                    model, x_train, y_train, sample_weight, cv_cache
+                )
+
+                tuned_model_score = self.get_model_score(tuned_model, x_test, y_test)
+
+                if best_model_score is None or tuned_model_score > best_model_score:
+                    best_model, best_model_score = tuned_model, tuned_model_score
+
+            if cv_cache is not None:
+                cv_cache.save()
+
+            self.search_score = self.search_scores[best_model.__class__.__name__]
+
+            self.log_writer.log(
+                f"Got {best_model.__class__.__name__} as the best model with score {best_model_score}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return best_model, best_model_score
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
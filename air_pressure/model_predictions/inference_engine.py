@@ -0,0 +1,190 @@
+import numpy as np
+
+from air_pressure.model_export.compact_model import Compact_Model
+
+
+class Flat_Tree_Engine(Compact_Model):
+    """
+    Description :   This class shall be used for batch prediction with RandomForestClassifier and AdaBoostClassifier
+                    models. The trees of the model are compiled into one set of flat node arrays, and every row of a
+                    batch walks all the trees at once, one level at a time, instead of one tree after the other.
+                    The leaf values are combined in the same order as the model does, so the predictions are the
+                    same as the predictions of the model.
+
+    Version     :   1.0
+    Revisions   :   None
+    """
+
+    def __init__(self, model, batch_size=4096, levels_per_round=8):
+        compact = (
+            model if isinstance(model, Compact_Model) else Compact_Model.from_model(model)
+        )
+
+        super().__init__(
+            model_name=compact.model_name,
+            classes=compact.classes_,
+            n_features=compact.n_features_in_,
+            node_offsets=compact.node_offsets,
+            leaf_offsets=compact.leaf_offsets,
+            feature=compact.feature,
+            threshold=compact.threshold,
+            left=compact.left,
+            right=compact.right,
+            leaf_value=compact.leaf_value,
+            leaf_class=compact.leaf_class,
+            estimator_weights=compact.estimator_weights,
+        )
+
+        self.batch_size = batch_size
+
+        self.levels_per_round = levels_per_round
+
+        self.compile()
+
+    def compile(self):
+        """
+        Method Name :   compile
+        Description :   This method turns the per tree node arrays into global ones. The leaves are added after the
+                        internal nodes as nodes which lead to themselves, with an infinite threshold, so that a row
+                        which reached a leaf stays there while the other rows move down. The children of every node
+                        are kept next to each other, right then left. Every tree gets the global index of its root,
+                        which is a leaf for a tree with a single node.
+
+        Output      :   The global node arrays and the depth of the deepest tree are set
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            self.n_nodes = len(self.threshold)
+
+            n_leaves = int(self.leaf_offsets[-1])
+
+            node_tree = np.repeat(np.arange(self.n_trees), np.diff(self.node_offsets))
+
+            node_offsets = self.node_offsets[node_tree]
+
+            leaf_offsets = self.leaf_offsets[node_tree] + self.n_nodes
+
+            self.children = np.empty(2 * (self.n_nodes + n_leaves), dtype=np.intp)
+
+            for i, child in ((0, self.right), (1, self.left)):
+                child = child.astype(np.intp)
+
+                self.children[i : 2 * self.n_nodes : 2] = np.where(
+                    child >= 0, child + node_offsets, ~child + leaf_offsets
+                )
+
+            self.children[2 * self.n_nodes :: 2] = self.n_nodes + np.arange(n_leaves)
+
+            self.children[2 * self.n_nodes + 1 :: 2] = self.n_nodes + np.arange(n_leaves)
+
+            self.flat_feature = np.concatenate(
+                [self.feature.astype(np.intp), np.zeros(n_leaves, dtype=np.intp)]
+            )
+
+            self.flat_threshold = np.concatenate(
+                [self.threshold, np.full(n_leaves, np.inf, dtype=np.float32)]
+            )
+
+            has_nodes = self.node_offsets[:-1] < self.node_offsets[1:]
+
+            self.roots = np.where(
+                has_nodes,
+                self.node_offsets[:-1],
+                self.n_nodes + self.leaf_offsets[:-1],
+            ).astype(np.intp)
+
+            self.max_depth, nodes = 0, self.roots[self.roots < self.n_nodes]
+
+            while len(nodes):
+                self.max_depth += 1
+
+                nodes = np.concatenate(
+                    [self.children[2 * nodes], self.children[2 * nodes + 1]]
+                )
+
+                nodes = nodes[nodes < self.n_nodes]
+
+        except Exception as e:
+            raise e
+
+    def apply_batch(self, X):
+        """
+        Method Name :   apply_batch
+        Description :   This method finds the leaf of every tree for every row of a batch. All the (row, tree) pairs
+                        move one level down together. After every levels_per_round levels, the pairs which reached a
+                        leaf are set aside, so that the deep trees do not keep the whole batch moving.
+
+        Output      :   An array of leaf indices with one row per tree and one column per row of the batch
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            n_rows = len(X)
+
+            values = X.ravel()
+
+            node = np.tile(self.roots, n_rows)
+
+            row_start = np.repeat(np.arange(n_rows) * self.n_features_in_, self.n_trees)
+
+            pair = np.arange(n_rows * self.n_trees)
+
+            leaves = np.empty(n_rows * self.n_trees, dtype=np.intp)
+
+            depth_left = self.max_depth
+
+            while len(node):
+                for _ in range(min(self.levels_per_round, depth_left)):
+                    go_left = (
+                        values[row_start + self.flat_feature[node]]
+                        <= self.flat_threshold[node]
+                    )
+
+                    node = self.children[2 * node + go_left]
+
+                depth_left -= self.levels_per_round
+
+                at_leaf = node >= self.n_nodes
+
+                leaves[pair[at_leaf]] = node[at_leaf] - self.n_nodes
+
+                inside = ~at_leaf
+
+                node, row_start, pair = node[inside], row_start[inside], pair[inside]
+
+            return leaves.reshape(n_rows, self.n_trees).T
+
+        except Exception as e:
+            raise e
+
+    def apply(self, X):
+        """
+        Method Name :   apply
+        Description :   This method finds the leaf of every tree for every row of X, in batches of batch_size rows
+                        to bound the memory of the traversal
+
+        Output      :   An array of leaf indices with one row per tree and one column per row of X
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            X = np.ascontiguousarray(X, dtype=np.float32)
+
+            leaves = np.empty((self.n_trees, len(X)), dtype=np.intp)
+
+            for start in range(0, len(X), self.batch_size):
+                end = start + self.batch_size
+
+                leaves[:, start:end] = self.apply_batch(X[start:end])
+
+            return leaves
+
+        except Exception as e:
+            raise e
@@ -0,0 +1,249 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+from threading import Lock
+
+import numpy as np
+
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic
+
+
+class Model_Registry:
+    """
+    Description :   This class shall be used for holding the cluster models, which are loaded with load_func on
+                    first use instead of at startup. When several threads ask for a model which is being loaded, the
+                    model is loaded once and all of them get it. The loaded models are kept while their total size
+                    is below max_bytes, and the least recently used models are dropped first, to be loaded again
+                    when they are used.
+
+    Version     :   1.0
+    Revisions   :   None
+    """
+
+    def __init__(self, load_func, clusters, log_file, max_bytes=None):
+        self.log_writer = App_Logger()
+
+        self.log_file = log_file
+
+        self.load_func = load_func
+
+        self.clusters = sorted(clusters)
+
+        self.max_bytes = max_bytes
+
+        self.models = OrderedDict()
+
+        self.loading = {}
+
+        self.n_bytes = 0
+
+        self.lock = Lock()
+
+    @classmethod
+    def get_model_size(cls, model, seen=None):
+        """
+        Method Name :   get_model_size
+        Description :   This method estimates the memory used by a model from its arrays, without copying them. The
+                        node and value arrays of the fitted trees are counted, and the estimators of ensembles are
+                        walked recursively. Other attributes, which are small next to the trees, are not counted.
+
+        Output      :   The size of the model in bytes
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            seen = set() if seen is None else seen
+
+            if id(model) in seen:
+                return 0
+
+            seen.add(id(model))
+
+            if isinstance(model, np.ndarray):
+                if model.dtype != object:
+                    return model.nbytes
+
+                return sum(cls.get_model_size(value, seen) for value in model.flat)
+
+            if isinstance(model, (list, tuple)):
+                return sum(cls.get_model_size(value, seen) for value in model)
+
+            if hasattr(model, "node_count") and hasattr(model, "value"):
+                return model.__getstate__()["nodes"].nbytes + model.value.nbytes
+
+            if not hasattr(model, "__dict__"):
+                return 0
+
+            return sum(
+                cls.get_model_size(value, seen) for value in vars(model).values()
+            )
+
+        except Exception as e:
+            raise e
+
+    def load(self, cluster, future):
+        """
+        Method Name :   load
+        Description :   This method loads the model of a cluster, keeps it, and evicts the least recently used models
+                        above max_bytes. The model or the exception is set to the future of the load.
+
+        Output      :   The model of the cluster
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.load.__name__, __file__, self.log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            try:
+                model = self.load_func(cluster)
+
+                size = self.get_model_size(model)
+
+            except Exception as e:
+                with self.lock:
+                    del self.loading[cluster]
+
+                future.set_exception(e)
+
+                raise e
+
+            with self.lock:
+                del self.loading[cluster]
+
+                self.models[cluster] = (model, size)
+
+                self.n_bytes += size
+
+                evicted = []
+
+                while (
+                    self.max_bytes is not None
+                    and self.n_bytes > self.max_bytes
+                    and len(self.models) > 1
+                ):
+                    old_cluster, (_, old_size) = self.models.popitem(last=False)
+
+                    self.n_bytes -= old_size
+
+                    evicted.append(old_cluster)
+
+            future.set_result(model)
+
+            self.log_writer.log(
+                f"Loaded model of cluster {cluster} with {size} bytes, evicted models of clusters {evicted}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return model
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get(self, cluster):
+        """
+        Method Name :   get
+        Description :   This method gets the model of a cluster. A kept model is returned at once, a model being
+                        loaded by another thread is waited for, and otherwise the model is loaded by this thread.
+
+        Output      :   The model of the cluster
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            with self.lock:
+                if cluster in self.models:
+                    self.models.move_to_end(cluster)
+
+                    return self.models[cluster][0]
+
+                if cluster not in self.clusters:
+                    raise KeyError(f"No model for cluster {cluster}")
+
+                future = self.loading.get(cluster)
+
+                is_loader = future is None
+
+                if is_loader:
+                    future = self.loading[cluster] = Future()
+
+            if is_loader:
+                return self.load(cluster, future)
+
+            return future.result()
+
+        except Exception as e:
+            raise e
+
+    def prewarm(self, clusters, keep_all=False):
+        """
+        Method Name :   prewarm
+        Description :   This method loads the models of the clusters before they are used. With keep_all, the
+                        max_bytes limit is removed first, so that none of the models is evicted, like when the models
+                        are loaded once to be shared with forked workers which would otherwise each load their own
+                        copy of the evicted models.
+
+        Output      :   The models of the clusters are loaded
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            if keep_all:
+                with self.lock:
+                    self.max_bytes = None
+
+            for cluster in clusters:
+                self.get(cluster)
+
+        except Exception as e:
+            raise e
+
+    def get_loaded_clusters(self):
+        """
+        Method Name :   get_loaded_clusters
+        Description :   This method gets the clusters whose models are loaded now, from the least to the most
+                        recently used
+
+        Output      :   A list of clusters
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            with self.lock:
+                return list(self.models)
+
+        except Exception as e:
+            raise e
+
+    def values(self):
+        """
+        Method Name :   values
+        Description :   This method gets the models which are loaded now
+
+        Output      :   A list of models
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            with self.lock:
+                return [model for model, _ in self.models.values()]
+
+        except Exception as e:
+            raise e
@@ -0,0 +1,620 @@
+import os
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from air_pressure.data_ingestion.data_loader_prediction import Data_Getter_Pred
+from air_pressure.data_preprocessing.preprocessing import Preprocessor
+from air_pressure.model_export.compact_model import Compact_Model
+from air_pressure.model_predictions.inference_engine import Flat_Tree_Engine
+from air_pressure.model_predictions.model_registry import Model_Registry
+from air_pressure.s3_bucket_operations.s3_operations import S3_Operation
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+
+class Prediction:
+    """
+    Description :   This class shall be used for predicting the class of the prediction data with the production
+                    models. The data is transformed with the production preprocessing pipeline, divided with the
+                    production kmeans model, and every cluster is predicted with the model of the cluster.
+
+    Version     :   1.0
+    Revisions   :   None
+    """
+
+    def __init__(self, log_file):
+        self.log_writer = App_Logger()
+
+        self.config = read_params()
+
+        self.log_file = log_file
+
+        self.target_col = self.config["target_col"]
+
+        self.model_bucket = self.config["s3_bucket"]["air_pressure_model_bucket"]
+
+        self.input_files_bucket = self.config["s3_bucket"]["input_files_bucket"]
+
+        self.prod_model_dir = self.config["model_dir"]["prod"]
+
+        self.file_format = self.config["save_format"]
+
+        self.pred_output_file = self.config["pred_output_file"]
+
+        self.compact_enabled = self.config["compact_model"]["enabled"]
+
+        self.engine = self.config["inference"]["engine"]
+
+        self.engine_batch_size = self.config["inference"]["batch_size"]
+
+        self.engine_max_depth = self.config["inference"]["max_depth"]
+
+        self.fuse_projection = self.config["inference"]["fuse_projection"]
+
+        self.fast_imputation = self.config["fast_imputer"]["enabled"]
+
+        self.lazy_loading = self.config["model_registry"]["lazy"]
+
+        self.registry_max_bytes = self.config["model_registry"]["max_memory_mb"] * 2**20
+
+        self.prewarm_clusters = self.config["model_registry"]["prewarm"]
+
+        self.streaming_enabled = self.config["streaming_prediction"]["enabled"]
+
+        self.stream_part_size = self.config["streaming_prediction"]["part_size"]
+
+        self.stream_max_pending_parts = self.config["streaming_prediction"][
+            "max_pending_parts"
+        ]
+
+        self.s3 = S3_Operation()
+
+        self.data_getter_pred = Data_Getter_Pred(log_file)
+
+        self.preprocessor = Preprocessor(log_file)
+
+        self.pipeline = None
+
+        self.kmeans = None
+
+        self.models = {}
+
+        self.model_names = {}
+
+        self.version = None
+
+    def get_cluster_model_names(self):
+        """
+        Method Name :   get_cluster_model_names
+        Description :   This method finds the model of every cluster in the production models dir, which are saved
+                        with the cluster number after the model name, like RandomForestClassifier2
+
+        Output      :   A dict of cluster number and model name
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_cluster_model_names.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            model_files = self.s3.get_files_from_folder(
+                self.prod_model_dir, self.model_bucket, self.log_file
+            )
+
+            model_names = {}
+
+            for model_file in model_files:
+                model_name, ext = os.path.splitext(os.path.basename(model_file))
+
+                match = re.fullmatch(r"(\D+)(\d+)", model_name)
+
+                if ext == self.file_format and match is not None:
+                    model_names[int(match.group(2))] = model_name
+
+            self.log_writer.log(f"Got {model_names} as cluster models", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return model_names
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_inference_model(self, model):
+        """
+        Method Name :   get_inference_model
+        Description :   This method gets the model used for prediction based on the inference engine in params.yaml.
+                        With flat, tree ensembles are compiled into a Flat_Tree_Engine, unless their trees are deeper
+                        than max_depth, where walking the trees one level at a time stops paying off. With sklearn,
+                        or for other models, the model itself is used.
+
+        Output      :   A model with predict and predict_proba methods
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_inference_model.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            if self.engine == "flat" and isinstance(
+                model, Compact_Model.supported_models + (Compact_Model,)
+            ):
+                engine = Flat_Tree_Engine(model, batch_size=self.engine_batch_size)
+
+                if engine.max_depth <= self.engine_max_depth:
+                    self.log_writer.log(
+                        f"Compiled {engine.model_name} with {engine.n_trees} trees into flat tree engine",
+                        **log_dic,
+                    )
+
+                    self.log_writer.start_log("exit", **log_dic)
+
+                    return engine
+
+                self.log_writer.log(
+                    f"{engine.model_name} has trees of depth {engine.max_depth}, using the model itself",
+                    **log_dic,
+                )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return model
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def load_cluster_model(self, cluster):
+        """
+        Method Name :   load_cluster_model
+        Description :   This method loads the model of a cluster from the production models dir, as the model used
+                        for prediction
+
+        Output      :   The model of the cluster
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.load_cluster_model.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            model = self.s3.load_model(
+                self.model_names[cluster],
+                self.model_bucket,
+                self.log_file,
+                model_dir=self.prod_model_dir,
+                compact=self.compact_enabled,
+            )
+
+            model = self.get_inference_model(model)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return model
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def load_models(self):
+        """
+        Method Name :   load_models
+        Description :   This method loads the preprocessing pipeline and the kmeans model from the production models
+                        dir, and creates the registry of the cluster models. With lazy loading, only the prewarm
+                        clusters are loaded now and the others on first use, otherwise all the cluster models are
+                        loaded. The pipeline imputes with its fast imputer when it is enabled, and with
+                        fuse_projection, the scaler and PCA of the pipeline are fused into a single projection.
+
+        Output      :   The production models are loaded
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.load_models.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            self.pipeline = self.s3.load_model(
+                "Preprocessing_Pipeline",
+                self.model_bucket,
+                self.log_file,
+                model_dir=self.prod_model_dir,
+            )
+
+            self.pipeline.set_fast_imputation(self.fast_imputation)
+
+            if self.fuse_projection:
+                self.pipeline.fuse()
+
+            self.kmeans = self.s3.load_model(
+                "KMeans", self.model_bucket, self.log_file, model_dir=self.prod_model_dir
+            )
+
+            self.model_names = self.get_cluster_model_names()
+
+            self.models = Model_Registry(
+                self.load_cluster_model,
+                self.model_names,
+                self.log_file,
+                max_bytes=self.registry_max_bytes,
+            )
+
+            prewarm_clusters = (
+                self.prewarm_clusters if self.lazy_loading else sorted(self.model_names)
+            )
+
+            self.models.prewarm(
+                [cluster for cluster in prewarm_clusters if cluster in self.model_names]
+            )
+
+            self.log_writer.log(
+                f"Created model registry for clusters {sorted(self.model_names)}, loaded clusters {prewarm_clusters}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_cluster_slices(self, clusters):
+        """
+        Method Name :   get_cluster_slices
+        Description :   This method groups the rows by cluster. A stable argsort of the clusters gives the row order
+                        in which the rows of every cluster are next to each other, and the bounds of every cluster in
+                        that order are found with searchsorted.
+
+        Output      :   The row order, and a list of cluster, start and end of every cluster in the row order
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_cluster_slices.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        try:
+            order = np.argsort(clusters, kind="stable")
+
+            sorted_clusters = clusters[order]
+
+            starts = np.flatnonzero(np.diff(sorted_clusters, prepend=-1))
+
+            ends = np.append(starts[1:], len(order))
+
+            slices = [
+                (int(sorted_clusters[start]), start, end)
+                for start, end in zip(starts, ends)
+            ]
+
+            return order, slices
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def predict(self, data):
+        """
+        Method Name :   predict
+        Description :   This method predicts the class of every row of data. The rows are transformed with the
+                        preprocessing pipeline, into the output buffer of the thread when the pipeline is fused, as
+                        the transformed rows are not used after this method, and assigned to clusters with one
+                        kmeans call. The rows are then put in
+                        cluster order, every cluster model predicts its contiguous slice once, and the predictions
+                        are put back in the order of the rows.
+
+        Output      :   A numpy array of predicted classes
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.predict.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            if self.pipeline is None:
+                self.load_models()
+
+            X = self.pipeline.transform(data, reuse_buffer=True)
+
+            clusters = self.kmeans.predict(X)
+
+            order, slices = self.get_cluster_slices(clusters)
+
+            X_sorted = X[order]
+
+            sorted_preds = np.empty(len(X), dtype=np.int64)
+
+            for cluster, start, end in slices:
+                sorted_preds[start:end] = self.models.get(cluster).predict(
+                    X_sorted[start:end]
+                )
+
+            preds = np.empty(len(X), dtype=np.int64)
+
+            preds[order] = sorted_preds
+
+            self.log_writer.log(
+                f"Predicted {len(preds)} rows in {len(slices)} clusters", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return preds
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_labels(self, preds):
+        """
+        Method Name :   get_labels
+        Description :   This method converts the encoded predictions back to the class labels
+
+        Output      :   A numpy array of pos and neg labels
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_labels.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        try:
+            return np.where(np.asarray(preds) == 1, "pos", "neg")
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def predict_chunk(self, chunk, header):
+        """
+        Method Name :   predict_chunk
+        Description :   This method predicts a chunk of the prediction data and writes the predictions as csv
+
+        Output      :   The csv bytes of the predictions, with the header when header is True
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.predict_chunk.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            chunk = self.preprocessor.replace_invalid_values(chunk)
+
+            preds = self.predict(chunk)
+
+            result = pd.DataFrame({self.target_col: self.get_labels(preds)})
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return result.to_csv(index=None, header=header).encode()
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def predict_from_model_streaming(self):
+        """
+        Method Name :   predict_from_model_streaming
+        Description :   This method predicts the prediction data chunk by chunk, and uploads the predictions csv
+                        file to the input files bucket as a multipart upload. The next chunk is read by a reader
+                        thread and the finished parts are uploaded by an upload thread while the current chunk is
+                        predicted. Only one chunk is read ahead and at most max_pending_parts parts wait for upload,
+                        so the memory used does not grow with the size of the prediction data. When a step fails,
+                        the multipart upload is aborted.
+
+        Output      :   The number of predicted rows
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.predict_from_model_streaming.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            chunks = iter(self.data_getter_pred.get_data_chunks())
+
+            upload_id = self.s3.create_multipart_upload(
+                self.pred_output_file, self.input_files_bucket, self.log_file
+            )
+
+            parts, pending, buffer, n_rows = [], deque(), [], 0
+
+            upload_part = lambda data, part_number: self.s3.upload_part(
+                data,
+                self.pred_output_file,
+                self.input_files_bucket,
+                upload_id,
+                part_number,
+                self.log_file,
+            )
+
+            try:
+                with ThreadPoolExecutor(1) as reader, ThreadPoolExecutor(1) as uploader:
+                    next_chunk = reader.submit(next, chunks, None)
+
+                    while True:
+                        chunk = next_chunk.result()
+
+                        if chunk is None:
+                            break
+
+                        next_chunk = reader.submit(next, chunks, None)
+
+                        buffer.append(self.predict_chunk(chunk, header=n_rows == 0))
+
+                        n_rows += len(chunk)
+
+                        if sum(map(len, buffer)) >= self.stream_part_size:
+                            pending.append(
+                                uploader.submit(
+                                    upload_part,
+                                    b"".join(buffer),
+                                    len(parts) + len(pending) + 1,
+                                )
+                            )
+
+                            buffer = []
+
+                        if len(pending) > self.stream_max_pending_parts:
+                            parts.append(pending.popleft().result())
+
+                    if n_rows == 0:
+                        buffer.append(f"{self.target_col}\n".encode())
+
+                    if buffer:
+                        pending.append(
+                            uploader.submit(
+                                upload_part,
+                                b"".join(buffer),
+                                len(parts) + len(pending) + 1,
+                            )
+                        )
+
+                    parts.extend(future.result() for future in pending)
+
+                self.s3.complete_multipart_upload(
+                    self.pred_output_file,
+                    self.input_files_bucket,
+                    upload_id,
+                    parts,
+                    self.log_file,
+                )
+
+            except Exception as e:
+                self.s3.abort_multipart_upload(
+                    self.pred_output_file,
+                    self.input_files_bucket,
+                    upload_id,
+                    self.log_file,
+                )
+
+                raise e
+
+            self.log_writer.log(
+                f"Streamed predictions of {n_rows} rows in {len(parts)} parts", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return n_rows
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def predict_from_model(self):
+        """
+        Method Name :   predict_from_model
+        Description :   This method predicts the prediction data from the input files bucket, and uploads the
+                        predictions as csv file to the input files bucket. When streaming prediction is enabled,
+                        the data is predicted chunk by chunk with predict_from_model_streaming.
+
+        Output      :   A dataframe of predictions, or the number of predicted rows when streaming
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.predict_from_model.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            if self.streaming_enabled:
+                n_rows = self.predict_from_model_streaming()
+
+                self.log_writer.start_log("exit", **log_dic)
+
+                return n_rows
+
+            data = self.data_getter_pred.get_data()
+
+            data = self.preprocessor.replace_invalid_values(data)
+
+            preds = self.predict(data)
+
+            result = pd.DataFrame(
+                {self.target_col: self.get_labels(preds)}, index=data.index
+            )
+
+            self.s3.upload_df_as_csv(
+                result,
+                self.pred_output_file,
+                self.pred_output_file,
+                self.input_files_bucket,
+                self.log_file,
+            )
+
+            self.log_writer.log("Prediction is completed", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return result
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
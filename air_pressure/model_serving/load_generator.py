@@ -0,0 +1,311 @@
+import glob
+import json
+import os
+import time
+import urllib.request
+from itertools import count
+from threading import Lock, Thread
+
+import numpy as np
+import pandas as pd
+
+from air_pressure.model_predictions.prediction_from_model import Prediction
+from air_pressure.model_serving.local_model_store import Local_Model_Store
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+
+class Load_Generator:
+    """
+    Description :   This class shall be used for measuring the throughput and latency of the prediction path. Rows
+                    of the local prediction data files are replayed in requests of request_size rows by concurrency
+                    threads for duration seconds, either against the prediction service over http, or against the
+                    production models loaded in this process, from the model bucket or from a local model dir. The
+                    requests of the first warmup seconds are not counted, and failed requests are counted as errors
+                    without their latency. The results are written as json.
+
+    Version     :   1.0
+    Revisions   :   None
+    """
+
+    invalid_values = ["na", "'na'"]
+
+    def __init__(self, log_file):
+        self.log_writer = App_Logger()
+
+        self.config = read_params()
+
+        self.log_file = log_file
+
+        self.target_col = self.config["target_col"]
+
+        self.mode = self.config["benchmark"]["mode"]
+
+        self.data_dir = self.config["benchmark"]["data_dir"]
+
+        self.concurrency = self.config["benchmark"]["concurrency"]
+
+        self.request_size = self.config["benchmark"]["request_size"]
+
+        self.duration = self.config["benchmark"]["duration"]
+
+        self.warmup = self.config["benchmark"]["warmup"]
+
+        self.output_file = self.config["benchmark"]["output_file"]
+
+        self.model_dir = self.config["benchmark"]["model_dir"]
+
+        self.url = self.config["benchmark"]["url"].format(port=self.config["app"]["port"])
+
+        self.prediction = None
+
+        self.requests = []
+
+        self.request_ids = count()
+
+        self.lock = Lock()
+
+        self.latencies = []
+
+        self.n_rows = 0
+
+        self.n_errors = 0
+
+    def load_requests(self):
+        """
+        Method Name :   load_requests
+        Description :   This method reads the prediction data files from data_dir and divides their rows into
+                        requests of request_size rows. For http, the requests are encoded as csv beforehand, so that
+                        encoding is not measured.
+
+        Output      :   The requests are ready to be replayed
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.load_requests.__name__, __file__, self.log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            files = sorted(glob.glob(os.path.join(self.data_dir, "*.csv")))
+
+            if not files:
+                raise FileNotFoundError(f"No csv files found in {self.data_dir}")
+
+            data = pd.concat(
+                [pd.read_csv(f, na_values=self.invalid_values) for f in files],
+                ignore_index=True,
+            )
+
+            data = data.drop(columns=[self.target_col], errors="ignore")
+
+            self.requests = [
+                data.iloc[start : start + self.request_size]
+                for start in range(0, len(data), self.request_size)
+            ]
+
+            if self.mode == "http":
+                self.requests = [
+                    (req.to_csv(index=False).encode(), len(req)) for req in self.requests
+                ]
+
+            self.log_writer.log(
+                f"Loaded {len(data)} rows from {len(files)} files as {len(self.requests)} requests",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def send_request(self, request):
+        """
+        Method Name :   send_request
+        Description :   This method sends one request, to the prediction service for http, or to the production
+                        models loaded in this process for local
+
+        Output      :   The number of predicted rows
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            if self.mode == "http":
+                body, n_rows = request
+
+                req = urllib.request.Request(
+                    self.url, body, {"Content-Type": "text/csv"}
+                )
+
+                with urllib.request.urlopen(req) as response:
+                    response.read()
+
+                return n_rows
+
+            return len(self.prediction.predict(request))
+
+        except Exception as e:
+            raise e
+
+    def run_worker(self, start, end):
+        """
+        Method Name :   run_worker
+        Description :   This method replays the requests one after the other until end. The latency of every
+                        successful request sent after start is recorded, and failed requests are only counted, so
+                        that fast failures do not lower the latencies or raise the throughput.
+
+        Output      :   The latencies, rows and errors are recorded
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        while time.perf_counter() < end:
+            request = self.requests[next(self.request_ids) % len(self.requests)]
+
+            sent = time.perf_counter()
+
+            try:
+                n_rows, failed = self.send_request(request), False
+
+            except Exception:
+                n_rows, failed = 0, True
+
+            done = time.perf_counter()
+
+            if sent < start or done > end:
+                continue
+
+            with self.lock:
+                if failed:
+                    self.n_errors += 1
+
+                else:
+                    self.latencies.append(done - sent)
+
+                    self.n_rows += n_rows
+
+    def get_results(self):
+        """
+        Method Name :   get_results
+        Description :   This method computes the throughput and the latency percentiles of the successful requests,
+                        and reports the failed requests as errors
+
+        Output      :   A dict of benchmark results
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_results.__name__, __file__, self.log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            latencies = np.array(self.latencies) * 1000
+
+            latency_ms = dict.fromkeys(["mean", "p50", "p95", "p99", "max"])
+
+            if len(latencies):
+                p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+
+                latency_ms = {
+                    "mean": float(latencies.mean()),
+                    "p50": float(p50),
+                    "p95": float(p95),
+                    "p99": float(p99),
+                    "max": float(latencies.max()),
+                }
+
+            results = {
+                "mode": self.mode,
+                "concurrency": self.concurrency,
+                "request_size": self.request_size,
+                "duration_s": self.duration,
+                "requests": len(latencies),
+                "rows": self.n_rows,
+                "errors": self.n_errors,
+                "requests_per_s": len(latencies) / self.duration,
+                "rows_per_s": self.n_rows / self.duration,
+                "latency_ms": latency_ms,
+            }
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return results
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def run(self):
+        """
+        Method Name :   run
+        Description :   This method runs the benchmark and writes the results to output_file. For local, the
+                        production models are loaded before the benchmark starts, from model_dir when it is set,
+                        otherwise from the model bucket.
+
+        Output      :   A dict of benchmark results
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.run.__name__, __file__, self.log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            self.load_requests()
+
+            if self.mode == "local":
+                self.prediction = Prediction(self.log_file)
+
+                if self.model_dir is not None:
+                    self.prediction.s3 = Local_Model_Store(self.model_dir)
+
+                    self.log_writer.log(
+                        f"Loading models from local dir {self.model_dir}", **log_dic
+                    )
+
+                self.prediction.load_models()
+
+            start = time.perf_counter() + self.warmup
+
+            end = start + self.duration
+
+            workers = [
+                Thread(target=self.run_worker, args=(start, end))
+                for _ in range(self.concurrency)
+            ]
+
+            for worker in workers:
+                worker.start()
+
+            for worker in workers:
+                worker.join()
+
+            results = self.get_results()
+
+            with open(self.output_file, "w") as f:
+                json.dump(results, f, indent=4)
+
+            self.log_writer.log(
+                f"Benchmark results are written to {self.output_file}", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return results
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
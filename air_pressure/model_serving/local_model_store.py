@@ -0,0 +1,114 @@
+import os
+import pickle
+
+from air_pressure.model_export.compact_model import Compact_Model
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+
+class Local_Model_Store:
+    """
+    Description :   This class shall be used for loading the models from a local dir instead of the model bucket, so
+                    that the models can be benchmarked without access to s3. The local dir is laid out like the
+                    model bucket, with the production models in a production dir. It has the methods of
+                    S3_Operation used to load the models, and the bucket is ignored.
+
+    Version     :   1.0
+    Revisions   :   None
+    """
+
+    def __init__(self, root_dir):
+        self.log_writer = App_Logger()
+
+        self.config = read_params()
+
+        self.root_dir = root_dir
+
+        self.file_format = self.config["save_format"]
+
+        self.compact_file_format = self.config["compact_model"]["file_format"]
+
+    def get_files_from_folder(self, folder_name, bucket, log_file):
+        """
+        Method Name :   get_files_from_folder
+        Description :   This method gets the files of a folder of the local dir, named like the keys of the bucket
+
+        Output      :   A list of files is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_files_from_folder.__name__,
+            __file__,
+            log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            list_of_files = [
+                folder_name + "/" + fname
+                for fname in sorted(
+                    os.listdir(os.path.join(self.root_dir, folder_name))
+                )
+            ]
+
+            self.log_writer.log(
+                f"Got list of files from local dir {self.root_dir}", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return list_of_files
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def load_model(self, model_name, bucket, log_file, model_dir=None, compact=False):
+        """
+        Method Name :   load_model
+        Description :   This method loads the model from the local dir. With compact, the compact export of the model
+                        is read without unpickling when it is present, otherwise the pickled model is loaded.
+
+        Output      :   The loaded model
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.load_model.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            model_file = os.path.join(
+                self.root_dir, model_dir or "", model_name + self.file_format
+            )
+
+            compact_file = (
+                model_file[: -len(self.file_format)] + self.compact_file_format
+            )
+
+            if compact is True and os.path.exists(compact_file):
+                with open(compact_file, "rb") as f:
+                    model = Compact_Model.from_bytes(f.read())
+
+            else:
+                with open(model_file, "rb") as f:
+                    model = pickle.load(f)
+
+            self.log_writer.log(
+                f"Loaded {model_name} from local dir {self.root_dir}", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return model
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
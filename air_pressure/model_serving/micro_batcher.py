@@ -0,0 +1,195 @@
+import time
+from concurrent.futures import Future
+from queue import Empty, Queue
+from threading import Thread
+
+import numpy as np
+import pandas as pd
+
+
+class Micro_Batcher:
+    """
+    Description :   This class shall be used to coalesce concurrent prediction requests into micro batches. Every
+                    request is queued with a future, and a single worker thread takes the queued requests until
+                    max_batch_size rows are collected or max_wait seconds have passed since the first of them,
+                    predicts them with one call, and sets the result of every request from its rows.
+
+    Version     :   1.0
+    Revisions   :   None
+    """
+
+    def __init__(self, predict_func, max_batch_size=256, max_wait=0.005):
+        self.predict_func = predict_func
+
+        self.max_batch_size = max_batch_size
+
+        self.max_wait = max_wait
+
+        self.requests = Queue()
+
+        self.worker = None
+
+    def start(self):
+        """
+        Method Name :   start
+        Description :   This method starts the worker thread which predicts the micro batches
+
+        Output      :   The worker thread is started
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            self.worker = Thread(target=self.run, daemon=True)
+
+            self.worker.start()
+
+        except Exception as e:
+            raise e
+
+    def stop(self):
+        """
+        Method Name :   stop
+        Description :   This method stops the worker thread after the queued requests are predicted
+
+        Output      :   The worker thread is stopped
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            self.requests.put(None)
+
+            if self.worker is not None:
+                self.worker.join()
+
+        except Exception as e:
+            raise e
+
+    def submit(self, data):
+        """
+        Method Name :   submit
+        Description :   This method queues the rows of a request for the next micro batch
+
+        Output      :   A future, whose result is the predictions of the rows
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            future = Future()
+
+            self.requests.put((data, future))
+
+            return future
+
+        except Exception as e:
+            raise e
+
+    def get_batch(self):
+        """
+        Method Name :   get_batch
+        Description :   This method waits for a request, then takes more queued requests until max_batch_size rows
+                        are collected or max_wait seconds have passed
+
+        Output      :   A list of (data, future) requests, and whether the batcher was stopped
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            request = self.requests.get()
+
+            if request is None:
+                return [], True
+
+            batch, n_rows = [request], len(request[0])
+
+            deadline = time.monotonic() + self.max_wait
+
+            while n_rows < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+
+                try:
+                    request = (
+                        self.requests.get(timeout=timeout)
+                        if timeout > 0
+                        else self.requests.get_nowait()
+                    )
+
+                except Empty:
+                    break
+
+                if request is None:
+                    return batch, True
+
+                batch.append(request)
+
+                n_rows += len(request[0])
+
+            return batch, False
+
+        except Exception as e:
+            raise e
+
+    def predict_batch(self, batch):
+        """
+        Method Name :   predict_batch
+        Description :   This method predicts the rows of all the requests of a micro batch with a single call, and
+                        sets the predictions of every request to its future. When the prediction fails, the
+                        exception is set to every future.
+
+        Output      :   The futures of the micro batch are done
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            futures = [future for _, future in batch]
+
+            try:
+                data = pd.concat([data for data, _ in batch], ignore_index=True)
+
+                preds = self.predict_func(data)
+
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+
+                return
+
+            bounds = np.cumsum([0] + [len(data) for data, _ in batch])
+
+            for future, start, end in zip(futures, bounds[:-1], bounds[1:]):
+                future.set_result(preds[start:end])
+
+        except Exception as e:
+            raise e
+
+    def run(self):
+        """
+        Method Name :   run
+        Description :   This method predicts micro batches until the batcher is stopped
+
+        Output      :   The queued requests are predicted
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            stopped = False
+
+            while not stopped:
+                batch, stopped = self.get_batch()
+
+                if batch:
+                    self.predict_batch(batch)
+
+        except Exception as e:
+            raise e
@@ -0,0 +1,244 @@
+import hashlib
+import time
+from collections import deque
+from threading import Event, Thread
+
+from air_pressure.s3_bucket_operations.s3_operations import S3_Operation
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+
+class Model_Watcher:
+    """
+    Description :   This class shall be used for reloading the production models while serving. A background thread
+                    polls the etags of the production models dir, and when they changed and stayed the same for one
+                    more poll, so that a transition still copying models is not picked up halfway, reload_func is
+                    called with the new version. Every reload is recorded with its load time.
+
+    Version     :   1.0
+    Revisions   :   None
+    """
+
+    def __init__(self, reload_func, log_file):
+        self.log_writer = App_Logger()
+
+        self.config = read_params()
+
+        self.log_file = log_file
+
+        self.reload_func = reload_func
+
+        self.model_bucket = self.config["s3_bucket"]["air_pressure_model_bucket"]
+
+        self.prod_model_dir = self.config["model_dir"]["prod"]
+
+        self.poll_interval = self.config["model_reload"]["poll_interval"]
+
+        self.events = deque(maxlen=self.config["model_reload"]["max_events"])
+
+        self.s3 = S3_Operation()
+
+        self.version = None
+
+        self.pending_version = None
+
+        self.stopped = Event()
+
+        self.worker = None
+
+    def get_version(self):
+        """
+        Method Name :   get_version
+        Description :   This method gets the version of the production models, which is a hash of the names and
+                        etags of the files in the production models dir
+
+        Output      :   A version string
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_version.__name__, __file__, self.log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            etags = self.s3.get_file_etags(
+                self.prod_model_dir, self.model_bucket, self.log_file
+            )
+
+            version = hashlib.sha1(str(sorted(etags.items())).encode()).hexdigest()[:12]
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return version
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def reload(self, version):
+        """
+        Method Name :   reload
+        Description :   This method reloads the production models with reload_func and records the reload. When
+                        the reload fails, the current models are kept and the reload is tried again on the next poll.
+
+        Output      :   The reload event is recorded
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.reload.__name__, __file__, self.log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            start = time.perf_counter()
+
+            try:
+                self.reload_func(version)
+
+                status, old_version, self.version = "loaded", self.version, version
+
+            except Exception as e:
+                status, old_version = f"failed with {e}", self.version
+
+            load_time = round(time.perf_counter() - start, 3)
+
+            self.events.append(
+                {
+                    "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "from_version": old_version,
+                    "to_version": version,
+                    "status": status,
+                    "load_time": load_time,
+                }
+            )
+
+            self.log_writer.log(
+                f"Reload from version {old_version} to {version} {status} in {load_time}s",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def check(self):
+        """
+        Method Name :   check
+        Description :   This method checks the version of the production models, and reloads them once a new
+                        version is seen on two polls in a row
+
+        Output      :   The models are reloaded when they changed
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.check.__name__, __file__, self.log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            version = self.get_version()
+
+            if version == self.version:
+                self.pending_version = None
+
+            elif version == self.pending_version:
+                self.reload(version)
+
+            else:
+                self.pending_version = version
+
+                self.log_writer.log(
+                    f"Production models changed to version {version}, waiting for them to settle",
+                    **log_dic,
+                )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def run(self):
+        """
+        Method Name :   run
+        Description :   This method checks the production models every poll_interval seconds until the watcher is
+                        stopped. A failed check is logged and the watcher keeps polling.
+
+        Output      :   The production models are watched
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            while not self.stopped.wait(self.poll_interval):
+                try:
+                    self.check()
+
+                except Exception as e:
+                    self.log_writer.log(
+                        f"Checking production models failed with {e}",
+                        **get_log_dic(
+                            self.__class__.__name__,
+                            self.run.__name__,
+                            __file__,
+                            self.log_file,
+                        ),
+                    )
+
+        except Exception as e:
+            raise e
+
+    def start(self, version):
+        """
+        Method Name :   start
+        Description :   This method starts watching the production models, with version as the loaded version
+
+        Output      :   The watcher thread is started
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            self.version = version
+
+            self.stopped.clear()
+
+            self.worker = Thread(target=self.run, daemon=True)
+
+            self.worker.start()
+
+        except Exception as e:
+            raise e
+
+    def stop(self):
+        """
+        Method Name :   stop
+        Description :   This method stops watching the production models
+
+        Output      :   The watcher thread is stopped
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            self.stopped.set()
+
+            if self.worker is not None:
+                self.worker.join()
+
+        except Exception as e:
+            raise e
@@ -0,0 +1,163 @@
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+import pandas as pd
+
+
+class Prediction_Cache:
+    """
+    Description :   This class shall be used for keeping the predictions of recently seen rows, so that repeated
+                    rows are answered without imputation, transformation and prediction. Rows are keyed by a 64 bit
+                    hash of their raw feature values, and the cache holds the predictions of one model version, which
+                    is only changed by set_version when new models are swapped in. Lookups and updates of requests
+                    still running with the models of another version miss and are ignored, so that they do not
+                    bring back the old version. At most max_size rows are kept, and the least recently used rows are
+                    evicted first.
+
+    Version     :   1.0
+    Revisions   :   None
+    """
+
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+
+        self.entries = OrderedDict()
+
+        self.version = None
+
+        self.hits = 0
+
+        self.misses = 0
+
+        self.lock = Lock()
+
+    def get_keys(self, data):
+        """
+        Method Name :   get_keys
+        Description :   This method hashes the raw feature values of every row. The values are read as floats first,
+                        so that the same reading sent as json or csv gets the same key.
+
+        Output      :   A numpy array of uint64 keys, one per row
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            return pd.util.hash_pandas_object(
+                data.astype(np.float64), index=False
+            ).to_numpy()
+
+        except Exception as e:
+            raise e
+
+    def set_version(self, version):
+        """
+        Method Name :   set_version
+        Description :   This method empties the cache when the model version changed. It is called when models are
+                        loaded or swapped in, and not for requests, which may still run with the previous models.
+
+        Output      :   The cache holds the predictions of the version
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            with self.lock:
+                if version != self.version:
+                    self.entries.clear()
+
+                    self.version = version
+
+        except Exception as e:
+            raise e
+
+    def get(self, keys, version):
+        """
+        Method Name :   get
+        Description :   This method looks up the predictions of the rows for the model version. Rows of another
+                        version than the one the cache holds are not found.
+
+        Output      :   A numpy array of predictions, and a mask of the rows which were not found
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            preds = np.zeros(len(keys), dtype=np.int64)
+
+            missing = np.ones(len(keys), dtype=bool)
+
+            with self.lock:
+                for i, key in enumerate(keys.tolist() if version == self.version else []):
+                    pred = self.entries.get(key)
+
+                    if pred is not None:
+                        self.entries.move_to_end(key)
+
+                        preds[i], missing[i] = pred, False
+
+                n_missing = int(missing.sum())
+
+                self.hits += len(keys) - n_missing
+
+                self.misses += n_missing
+
+            return preds, missing
+
+        except Exception as e:
+            raise e
+
+    def put(self, keys, preds, version):
+        """
+        Method Name :   put
+        Description :   This method stores the predictions of the rows, unless they were predicted for another model
+                        version than the one the cache holds, and evicts the least recently used rows above max_size
+
+        Output      :   The predictions are cached
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            with self.lock:
+                if version != self.version:
+                    return
+
+                for key, pred in zip(keys.tolist(), np.asarray(preds).tolist()):
+                    self.entries[key] = pred
+
+                    self.entries.move_to_end(key)
+
+                while len(self.entries) > self.max_size:
+                    self.entries.popitem(last=False)
+
+        except Exception as e:
+            raise e
+
+    def get_stats(self):
+        """
+        Method Name :   get_stats
+        Description :   This method gets the size and the hit and miss counters of the cache
+
+        Output      :   A dict of cache stats
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            with self.lock:
+                return {
+                    "version": self.version,
+                    "size": len(self.entries),
+                    "hits": self.hits,
+                    "misses": self.misses,
+                }
+
+        except Exception as e:
+            raise e
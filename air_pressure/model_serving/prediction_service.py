@@ -0,0 +1,764 @@
+import gc
+import json
+import os
+import signal
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from threading import Lock, Thread
+
+import numpy as np
+import pandas as pd
+
+from air_pressure.model_export.compact_model import Compact_Model
+from air_pressure.model_predictions.prediction_from_model import Prediction
+from air_pressure.model_serving.micro_batcher import Micro_Batcher
+from air_pressure.model_serving.model_watcher import Model_Watcher
+from air_pressure.model_serving.prediction_cache import Prediction_Cache
+from air_pressure.s3_bucket_operations.s3_operations import S3_Operation
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+
+class Prediction_Service:
+    """
+    Description :   This class shall be used for serving predictions over http. The fitted preprocessing pipeline
+                    and the kmeans model are loaded once at startup, the cluster models through the model registry
+                    of the prediction, and the rows of concurrent requests
+                    are predicted together in micro batches. When model reload is enabled, new production models
+                    are loaded in the background and swapped in, while the batches already running finish with the
+                    models they started with. With more than one worker, the models are loaded once in a parent
+                    process which then forks the workers, so that the workers share the memory of the models and
+                    accept requests on the same socket. The parent then watches for new models, loads them once,
+                    and replaces the workers with new ones which share the new models. When the result cache is enabled, rows seen before with
+                    the same models are answered from the cache.
+
+    Version     :   1.0
+    Revisions   :   None
+    """
+
+    invalid_values = ["na", "'na'"]
+
+    def __init__(self, log_file):
+        self.log_writer = App_Logger()
+
+        self.config = read_params()
+
+        self.log_file = log_file
+
+        self.host = self.config["app"]["host"]
+
+        self.port = self.config["app"]["port"]
+
+        self.max_batch_size = self.config["app"]["max_batch_size"]
+
+        self.max_wait = self.config["app"]["max_wait_ms"] / 1000
+
+        self.request_timeout = self.config["app"]["request_timeout"]
+
+        self.n_workers = self.config["app"]["workers"]
+
+        self.reload_enabled = self.config["model_reload"]["enabled"]
+
+        self.cache_enabled = self.config["result_cache"]["enabled"]
+
+        self.cache = Prediction_Cache(self.config["result_cache"]["max_size"])
+
+        self.prediction = Prediction(log_file)
+
+        self.watcher = Model_Watcher(self.reload_models, log_file)
+
+        self.batcher = Micro_Batcher(
+            self.predict_rows,
+            max_batch_size=self.max_batch_size,
+            max_wait=self.max_wait,
+        )
+
+        self.server = None
+
+        self.worker_pids = {}
+
+        self.fork_lock = Lock()
+
+        self.n_active = 0
+
+        self.active_lock = Lock()
+
+        self.stopping = False
+
+    def load_models(self):
+        """
+        Method Name :   load_models
+        Description :   This method loads the production models. The version is read before loading, so that models
+                        promoted meanwhile are reloaded by the watcher.
+
+        Output      :   The version of the loaded models
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.load_models.__name__, __file__, self.log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            version = self.watcher.get_version()
+
+            self.prediction.load_models()
+
+            self.prediction.version = version
+
+            self.cache.set_version(version)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return version
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def start(self, version):
+        """
+        Method Name :   start
+        Description :   This method starts the micro batcher, and the model watcher when model reload is enabled
+
+        Output      :   The service is ready to predict
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.start.__name__, __file__, self.log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            self.batcher.start()
+
+            if self.reload_enabled:
+                self.watcher.start(version)
+
+            self.log_writer.log(
+                f"Started micro batcher with max batch size {self.max_batch_size} and max wait {self.max_wait}s",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def reload_models(self, version):
+        """
+        Method Name :   reload_models
+        Description :   This method loads the production models into a new Prediction object and swaps it in with a
+                        single assignment, so that every batch is predicted with one complete set of models. The
+                        clusters whose models are loaded in the current registry are loaded in the new one before the
+                        swap, so that with lazy loading their first requests after the reload do not load models. In
+                        the parent of forked workers, the workers are then replaced by workers sharing the new models.
+
+        Output      :   The new production models are used for the next batches
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.reload_models.__name__, __file__, self.log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            prediction = Prediction(self.log_file)
+
+            prediction.load_models()
+
+            hot_clusters = [
+                cluster
+                for cluster in self.prediction.models.get_loaded_clusters()
+                if cluster in prediction.model_names
+            ]
+
+            prediction.models.prewarm(hot_clusters)
+
+            prediction.version = version
+
+            self.prediction = prediction
+
+            self.cache.set_version(version)
+
+            self.log_writer.log(f"Swapped in models of version {version}", **log_dic)
+
+            if self.worker_pids:
+                self.restart_workers(version)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def predict_rows(self, data):
+        """
+        Method Name :   predict_rows
+        Description :   This method predicts a micro batch with the current production models
+
+        Output      :   A numpy array of predicted classes
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            prediction = self.prediction
+
+            return prediction.predict(data)
+
+        except Exception as e:
+            raise e
+
+    def parse_rows(self, body, content_type):
+        """
+        Method Name :   parse_rows
+        Description :   This method reads the rows of a request. A json body is a list of rows, or an object with
+                        the list of rows under rows, where every row maps the feature names to values. Any other body
+                        is read as csv with a header. na values are read as missing values. The feature values are
+                        checked before the rows are batched, so that a malformed row fails its own request with a
+                        ValueError instead of failing in the pipeline or the models.
+
+        Output      :   A float dataframe with the feature columns of the preprocessing pipeline
+        On Failure  :   Raise a ValueError for invalid rows
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        if content_type.startswith("application/json"):
+            rows = json.loads(body)
+
+            if isinstance(rows, dict):
+                rows = rows.get("rows", [rows])
+
+            data = pd.DataFrame(rows)
+
+        else:
+            data = pd.read_csv(StringIO(body.decode()), na_values=self.invalid_values)
+
+        data = data.replace(self.invalid_values, np.nan)
+
+        missing_cols = [
+            col for col in self.prediction.pipeline.columns if col not in data.columns
+        ]
+
+        if missing_cols:
+            raise ValueError(f"Missing feature columns {missing_cols}")
+
+        if len(data) == 0:
+            raise ValueError("No rows to predict")
+
+        features = data[self.prediction.pipeline.columns]
+
+        try:
+            values = features.apply(pd.to_numeric, errors="coerce").astype(np.float64)
+
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid feature values, {e}")
+
+        invalid_cols = features.columns[
+            (values.isna() & features.notna()).any()
+        ].tolist()
+
+        if invalid_cols:
+            raise ValueError(f"Non numeric values in feature columns {invalid_cols}")
+
+        if np.isinf(values.to_numpy()).any():
+            raise ValueError("Infinite values in feature columns")
+
+        return values
+
+    def predict(self, body, content_type):
+        """
+        Method Name :   predict
+        Description :   This method predicts the rows of a request in the next micro batch. When the result cache
+                        is enabled, only the rows which are not cached for the current models are predicted, and
+                        their predictions are cached.
+
+        Output      :   A list of pos and neg labels, one per row
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        with self.active_lock:
+            self.n_active += 1
+
+        try:
+            prediction = self.prediction
+
+            data = self.parse_rows(body, content_type)
+
+            if not self.cache_enabled:
+                preds = self.batcher.submit(data).result(timeout=self.request_timeout)
+
+                return prediction.get_labels(preds).tolist()
+
+            keys = self.cache.get_keys(data)
+
+            preds, missing = self.cache.get(keys, prediction.version)
+
+            if missing.any():
+                preds[missing] = self.batcher.submit(data[missing]).result(
+                    timeout=self.request_timeout
+                )
+
+                self.cache.put(keys[missing], preds[missing], prediction.version)
+
+            return prediction.get_labels(preds).tolist()
+
+        except Exception as e:
+            raise e
+
+        finally:
+            with self.active_lock:
+                self.n_active -= 1
+
+    def share_models(self):
+        """
+        Method Name :   share_models
+        Description :   This method prepares the models to be shared with forked workers. All the cluster models
+                        are loaded first, without the memory limit of the model registry, so that the workers do not
+                        each load their own copy on first use. The arrays of the compact models are made read only,
+                        and the objects allocated so far are moved out of the garbage collector, whose reference
+                        scans would otherwise write to their pages in every worker and copy them. Objects frozen for
+                        earlier workers are unfrozen first, so that the replaced models can be collected.
+
+        Output      :   The loaded models can be shared copy on write
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.share_models.__name__, __file__, self.log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            max_bytes = self.prediction.models.max_bytes
+
+            self.prediction.models.prewarm(
+                sorted(self.prediction.model_names), keep_all=True
+            )
+
+            n_bytes = self.prediction.models.n_bytes
+
+            self.log_writer.log(
+                f"Loaded {len(self.prediction.model_names)} cluster models with {n_bytes} bytes to share, the limit of {max_bytes} bytes is not applied to shared models",
+                **log_dic,
+            )
+
+            for model in self.prediction.models.values():
+                if isinstance(model, Compact_Model):
+                    model.set_read_only()
+
+            gc.unfreeze()
+
+            gc.collect()
+
+            gc.freeze()
+
+            self.log_writer.log(
+                f"Froze {gc.get_freeze_count()} objects before forking workers",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def run_worker(self, version):
+        """
+        Method Name :   run_worker
+        Description :   This method runs in a forked worker. The s3 clients are created again, as the connection
+                        pools of the parent are not safe to use after fork, and the micro batcher is started. The
+                        worker serves requests until SIGTERM, and then lets the requests in flight finish.
+
+        Output      :   Requests are served until the worker is stopped
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.run_worker.__name__, __file__, self.log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            signal.signal(signal.SIGTERM, self.stop_worker)
+
+            signal.signal(signal.SIGINT, self.stop_worker)
+
+            self.worker_pids = {}
+
+            self.prediction.s3 = S3_Operation()
+
+            self.batcher.start()
+
+            self.server.serve_forever()
+
+            deadline = time.monotonic() + self.request_timeout
+
+            while self.n_active and time.monotonic() < deadline:
+                time.sleep(0.05)
+
+            self.batcher.stop()
+
+            self.log_writer.log(
+                f"Worker with pid {os.getpid()} of version {version} stopped", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def fork_worker(self, version):
+        """
+        Method Name :   fork_worker
+        Description :   This method forks a worker process, which serves requests on the socket of the parent with
+                        the models of the version until it is stopped
+
+        Output      :   The process id of the worker
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.fork_worker.__name__, __file__, self.log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            with self.fork_lock:
+                pid = os.fork()
+
+                if pid == 0:
+                    try:
+                        self.run_worker(version)
+
+                    finally:
+                        os._exit(0)
+
+                self.worker_pids[pid] = version
+
+            self.log_writer.log(
+                f"Forked worker with pid {pid} for version {version}", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return pid
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def restart_workers(self, version):
+        """
+        Method Name :   restart_workers
+        Description :   This method replaces the workers after the parent loaded new models. The new models are
+                        shared and new workers are forked before the old workers are stopped, so that requests are
+                        served all along, and the old workers finish the requests they accepted.
+
+        Output      :   The workers serve the models of the version
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.restart_workers.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            self.share_models()
+
+            with self.fork_lock:
+                old_pids = [
+                    pid
+                    for pid, worker_version in self.worker_pids.items()
+                    if worker_version != version
+                ]
+
+            for _ in range(self.n_workers):
+                self.fork_worker(version)
+
+            for pid in old_pids:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+
+                except ProcessLookupError:
+                    pass
+
+            self.log_writer.log(
+                f"Replaced workers {old_pids} with workers of version {version}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def stop_worker(self, signum, frame):
+        """
+        Method Name :   stop_worker
+        Description :   This method stops the server of a worker, when the worker receives a signal. The server
+                        is shut down from another thread, as shutdown waits for serve_forever of this thread.
+
+        Output      :   The worker stops accepting requests
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            self.stopping = True
+
+            Thread(target=self.server.shutdown, daemon=True).start()
+
+        except Exception as e:
+            raise e
+
+    def stop_workers(self, signum, frame):
+        """
+        Method Name :   stop_workers
+        Description :   This method stops the worker processes, when the parent process receives a signal
+
+        Output      :   The workers are stopped
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            self.stopping = True
+
+            for pid in list(self.worker_pids):
+                try:
+                    os.kill(pid, signal.SIGTERM)
+
+                except ProcessLookupError:
+                    pass
+
+        except Exception as e:
+            raise e
+
+    def serve_workers(self, version):
+        """
+        Method Name :   serve_workers
+        Description :   This method forks the workers, starts the model watcher when model reload is enabled, and
+                        waits for the workers. A worker of the current version which exits while the service is
+                        running is replaced by a new one, and on SIGTERM or SIGINT all the workers are stopped.
+
+        Output      :   Requests are served by the workers until the parent is stopped
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.serve_workers.__name__, __file__, self.log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            self.share_models()
+
+            for _ in range(self.n_workers):
+                self.fork_worker(version)
+
+            signal.signal(signal.SIGTERM, self.stop_workers)
+
+            signal.signal(signal.SIGINT, self.stop_workers)
+
+            if self.reload_enabled:
+                self.watcher.start(version)
+
+            while self.worker_pids:
+                pid, status = os.wait()
+
+                with self.fork_lock:
+                    worker_version = self.worker_pids.pop(pid, None)
+
+                self.log_writer.log(
+                    f"Worker with pid {pid} exited with status {status}", **log_dic
+                )
+
+                if not self.stopping and worker_version == self.prediction.version:
+                    self.fork_worker(worker_version)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def serve(self):
+        """
+        Method Name :   serve
+        Description :   This method starts the service and serves requests on the app host and port, every request
+                        in its own thread. With more than one worker, the socket is opened before forking the workers
+                        which serve the requests.
+
+        Output      :   Requests are served until the server is stopped
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.serve.__name__, __file__, self.log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            version = self.load_models()
+
+            self.server = ThreadingHTTPServer((self.host, self.port), Prediction_Handler)
+
+            self.server.daemon_threads = True
+
+            self.server.service = self
+
+            self.log_writer.log(
+                f"Serving on {self.host}:{self.port} with {self.n_workers} workers",
+                **log_dic,
+            )
+
+            if self.n_workers > 1:
+                self.serve_workers(version)
+
+            else:
+                self.start(version)
+
+                self.server.serve_forever()
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+        finally:
+            self.watcher.stop()
+
+            self.batcher.stop()
+
+            if self.server is not None:
+                self.server.server_close()
+
+
+class Prediction_Handler(BaseHTTPRequestHandler):
+    """
+    Description :   This class shall be used for handling the http requests of the prediction service. POST
+                    /predict predicts the rows of the body, GET / reports that the service is up with the version
+                    of its models and the result cache stats, and GET /reloads lists the recent model reloads.
+
+    Version     :   1.0
+    Revisions   :   None
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def send_json(self, status, content):
+        """
+        Method Name :   send_json
+        Description :   This method sends the content as json response with the status
+
+        Output      :   The response is sent
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            body = json.dumps(content).encode()
+
+            self.send_response(status)
+
+            self.send_header("Content-Type", "application/json")
+
+            self.send_header("Content-Length", str(len(body)))
+
+            self.end_headers()
+
+            self.wfile.write(body)
+
+        except Exception as e:
+            raise e
+
+    def do_GET(self):
+        service = self.server.service
+
+        if self.path == "/":
+            self.send_json(
+                200,
+                {
+                    "status": "ok",
+                    "model_version": service.prediction.version,
+                    "cache": service.cache.get_stats(),
+                },
+            )
+
+        elif self.path == "/reloads":
+            self.send_json(200, {"reloads": list(service.watcher.events)})
+
+        else:
+            self.send_json(404, {"error": f"{self.path} not found"})
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self.send_json(404, {"error": f"{self.path} not found"})
+
+            return
+
+        service = self.server.service
+
+        try:
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+            preds = service.predict(body, self.headers.get("Content-Type", ""))
+
+            self.send_json(200, {"predictions": preds})
+
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+
+        except Exception as e:
+            self.send_json(500, {"error": str(e)})
+
+            service.log_writer.log(
+                f"Prediction request failed with {e}",
+                **get_log_dic(
+                    self.__class__.__name__,
+                    self.do_POST.__name__,
+                    __file__,
+                    service.log_file,
+                ),
+            )
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,327 @@
+import mlflow
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import train_test_split
+
+from air_pressure.data_preprocessing.preprocessing import Preprocessor
+from air_pressure.mlflow_utils.mlflow_operations import MLFlow_Operation
+from air_pressure.model_finder.tuner import Model_Finder
+from air_pressure.s3_bucket_operations.s3_operations import S3_Operation
+from utils.cpu_budget import CPU_Budget
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+
+class Incremental_Train_Model:
+    """
+    Description :   This class shall be used to retrain the production RandomForestClassifier models on new data
+                    without fitting them from scratch. New trees are added to the forest of every cluster with warm
+                    start, the oldest trees are dropped beyond max_estimators, and the result is saved and
+                    registered in mlflow as a new version.
+
+    Version     :   1.0
+    Revisions   :   None
+    """
+
+    def __init__(self, log_file):
+        self.log_writer = App_Logger()
+
+        self.config = read_params()
+
+        self.log_file = log_file
+
+        self.random_state = self.config["base"]["random_state"]
+
+        self.test_size = self.config["base"]["test_size"]
+
+        self.n_new_estimators = self.config["incremental_training"]["n_new_estimators"]
+
+        self.max_estimators = self.config["incremental_training"]["max_estimators"]
+
+        self.run_name = self.config["incremental_training"]["run_name"]
+
+        self.exp_name = self.config["mlflow_config"]["experiment_name"]
+
+        self.model_bucket = self.config["s3_bucket"]["air_pressure_model_bucket"]
+
+        self.trained_model_dir = self.config["model_dir"]["trained"]
+
+        self.prod_model_dir = self.config["model_dir"]["prod"]
+
+        self.file_format = self.config["save_format"]
+
+        self.n_jobs = CPU_Budget(log_file).get_n_jobs()
+
+        self.s3 = S3_Operation()
+
+        self.mlflow_op = MLFlow_Operation(log_file)
+
+        self.model_finder = Model_Finder(log_file)
+
+    def load_prod_model(self, cluster):
+        """
+        Method Name :   load_prod_model
+        Description :   This method loads the production RandomForestClassifier of the cluster from the model bucket
+
+        Output      :   The production model, or None if the cluster has no production RandomForestClassifier
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.load_prod_model.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            model_name = RandomForestClassifier.__name__ + str(cluster)
+
+            model_file = self.prod_model_dir + "/" + model_name + self.file_format
+
+            f_obj = self.s3.get_file_object(model_file, self.model_bucket, self.log_file)
+
+            if isinstance(f_obj, list):
+                self.log_writer.log(
+                    f"No production {model_name} found in {self.model_bucket} bucket",
+                    **log_dic,
+                )
+
+                self.log_writer.start_log("exit", **log_dic)
+
+                return None
+
+            model = self.s3.load_model(
+                model_name,
+                self.model_bucket,
+                self.log_file,
+                model_dir=self.prod_model_dir,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return model
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def add_trees(self, model, X, y, sample_weight=None):
+        """
+        Method Name :   add_trees
+        Description :   This method fits n_new_estimators new trees on the data with warm start, keeping the trees
+                        already in the forest. When the forest grows beyond max_estimators, the oldest trees are
+                        dropped. Warm start seeds the new trees from their position in the forest, which stays at
+                        max_estimators once the forest is full, so the random state is derived from the number of
+                        increments stored on the model, and every increment grows different trees.
+
+        Output      :   The model with the new trees
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.add_trees.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            n_old = len(model.estimators_)
+
+            model.n_increments_ = getattr(model, "n_increments_", 0) + 1
+
+            random_state = int(
+                np.random.SeedSequence(
+                    [self.random_state, model.n_increments_]
+                ).generate_state(1)[0]
+            )
+
+            model.set_params(
+                warm_start=True,
+                n_estimators=n_old + self.n_new_estimators,
+                n_jobs=self.n_jobs,
+                random_state=random_state,
+            )
+
+            model.fit(X, y, sample_weight=sample_weight)
+
+            self.log_writer.log(
+                f"Added {self.n_new_estimators} trees to {n_old} trees in increment {model.n_increments_}",
+                **log_dic,
+            )
+
+            if self.max_estimators and len(model.estimators_) > self.max_estimators:
+                model.estimators_ = model.estimators_[-self.max_estimators :]
+
+                model.n_estimators = len(model.estimators_)
+
+                self.log_writer.log(
+                    f"Dropped the oldest trees, keeping {model.n_estimators} trees",
+                    **log_dic,
+                )
+
+            model.set_params(warm_start=False)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return model
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def retrain_cluster(self, model, X, y):
+        """
+        Method Name :   retrain_cluster
+        Description :   This method splits the new data of a cluster into train and test data, adds trees to the
+                        production model on the train data and scores it on the test data. The model is left as it
+                        is when the new data does not have every class or feature of the model.
+
+        Output      :   The retrained model and its score, or None if the model could not be retrained
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.retrain_cluster.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            classes, counts = np.unique(y, return_counts=True)
+
+            if not np.array_equal(classes, model.classes_) or counts.min() < 2:
+                self.log_writer.log(
+                    f"New data has classes {classes.tolist()} with counts {counts.tolist()}, model has classes {model.classes_.tolist()}, skipping retraining",
+                    **log_dic,
+                )
+
+                self.log_writer.start_log("exit", **log_dic)
+
+                return None
+
+            if X.shape[1] != model.n_features_in_:
+                self.log_writer.log(
+                    f"New data has {X.shape[1]} features, model has {model.n_features_in_} features, skipping retraining",
+                    **log_dic,
+                )
+
+                self.log_writer.start_log("exit", **log_dic)
+
+                return None
+
+            x_train, x_test, y_train, y_test = train_test_split(
+                X,
+                y,
+                test_size=self.test_size,
+                random_state=self.random_state,
+                stratify=y,
+            )
+
+            preprocessor = Preprocessor(self.log_file, low_memory=True)
+
+            x_train, y_train = preprocessor.handleImbalance(x_train, y_train)
+
+            sample_weight = (
+                preprocessor.get_sample_weight(y_train)
+                if preprocessor.imbalance_method == "class_weight"
+                else None
+            )
+
+            model = self.add_trees(model, x_train, y_train, sample_weight)
+
+            model_score = self.model_finder.get_model_score(model, x_test, y_test)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return model, model_score
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def retrain_models(self, X, y, clusters):
+        """
+        Method Name :   retrain_models
+        Description :   This method retrains the production RandomForestClassifier of every cluster in the new data.
+                        X should hold the new and recent data, already transformed by the production preprocessing
+                        pipeline, and clusters the cluster numbers from the production kmeans model. Every
+                        retrained model is saved to the trained models dir and registered in mlflow as a new
+                        version.
+
+        Output      :   A dict of cluster number and (model, score)
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.retrain_models.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            X, y, clusters = np.asarray(X), np.asarray(y), np.asarray(clusters)
+
+            self.mlflow_op.set_mlflow_tracking_uri()
+
+            self.mlflow_op.set_mlflow_experiment(self.exp_name)
+
+            results = {}
+
+            with mlflow.start_run(run_name=self.run_name):
+                for cluster in np.unique(clusters):
+                    cluster = int(cluster)
+
+                    model = self.load_prod_model(cluster)
+
+                    if model is None:
+                        continue
+
+                    idx = np.flatnonzero(clusters == cluster)
+
+                    result = self.retrain_cluster(model, X[idx], y[idx])
+
+                    if result is None:
+                        continue
+
+                    model, model_score = result
+
+                    self.log_writer.log(
+                        f"Retrained {model.__class__.__name__} for cluster {cluster} with score {model_score}",
+                        **log_dic,
+                    )
+
+                    self.s3.save_model(
+                        model,
+                        self.trained_model_dir,
+                        self.model_bucket,
+                        self.log_file,
+                        idx=cluster,
+                    )
+
+                    self.mlflow_op.log_all_for_model(model, model_score, idx=cluster)
+
+                    results[cluster] = (model, model_score)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return results
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
@@ -0,0 +1,270 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import mlflow
+import numpy as np
+from sklearn.model_selection import train_test_split
+
+from air_pressure.data_preprocessing.preprocessing import Preprocessor
+from air_pressure.mlflow_utils.mlflow_operations import MLFlow_Operation
+from air_pressure.model_finder.tuner import Model_Finder
+from air_pressure.s3_bucket_operations.s3_operations import S3_Operation
+from utils.cpu_budget import CPU_Budget
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+
+class Train_Model:
+    """
+    Description :   This class shall be used to train one model per KMeans cluster. The clusters are trained
+                    concurrently in a process pool, and the features are shared with the workers as a read only
+                    memory mapped file instead of being pickled to every worker. Every worker is limited to its
+                    share of the cpu budget.
+
+    Version     :   1.0
+    Revisions   :   None
+    """
+
+    def __init__(self, log_file):
+        self.log_writer = App_Logger()
+
+        self.config = read_params()
+
+        self.log_file = log_file
+
+        self.random_state = self.config["base"]["random_state"]
+
+        self.test_size = self.config["base"]["test_size"]
+
+        self.n_workers = self.config["training"]["n_workers"]
+
+        self.train_data_dir = self.config["training"]["data_dir"]
+
+        self.features_file = self.config["training"]["features_file"]
+
+        self.labels_file = self.config["training"]["labels_file"]
+
+        self.model_bucket = self.config["s3_bucket"]["air_pressure_model_bucket"]
+
+        self.trained_model_dir = self.config["model_dir"]["trained"]
+
+        self.exp_name = self.config["mlflow_config"]["experiment_name"]
+
+        self.run_name = self.config["mlflow_config"]["run_name"]
+
+        self.s3 = S3_Operation()
+
+        self.mlflow_op = MLFlow_Operation(log_file)
+
+        self.cpu_budget = CPU_Budget(log_file)
+
+    @staticmethod
+    def train_cluster(features_path, labels_path, cluster, idx, log_file):
+        """
+        Method Name :   train_cluster
+        Description :   This method trains the best model for a single cluster inside a worker process. The features
+                        are read from the memory mapped file, and only the rows of the cluster are copied.
+
+        Output      :   The cluster number, the best model, its score, and its cv score on the search sample when
+                        the search runs on a subsample
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            config = read_params()
+
+            X = np.load(features_path, mmap_mode="r")
+
+            y = np.load(labels_path, mmap_mode="r")
+
+            X_cluster, y_cluster = X[idx], y[idx]
+
+            stratify = y_cluster if np.bincount(y_cluster).min() > 1 else None
+
+            x_train, x_test, y_train, y_test = train_test_split(
+                X_cluster,
+                y_cluster,
+                test_size=config["base"]["test_size"],
+                random_state=config["base"]["random_state"],
+                stratify=stratify,
+            )
+
+            del X_cluster, y_cluster
+
+            preprocessor = Preprocessor(log_file, low_memory=True)
+
+            x_train, y_train = preprocessor.handleImbalance(x_train, y_train)
+
+            sample_weight = (
+                preprocessor.get_sample_weight(y_train)
+                if preprocessor.imbalance_method == "class_weight"
+                else None
+            )
+
+            model_finder = Model_Finder(log_file)
+
+            model, model_score = model_finder.get_best_model(
+                x_train, y_train, x_test, y_test, sample_weight, cluster
+            )
+
+            search_score = (
+                model_finder.search_score if model_finder.use_subsample else None
+            )
+
+            return cluster, model, model_score, search_score
+
+        except Exception as e:
+            raise e
+
+    def share_data(self, X, y):
+        """
+        Method Name :   share_data
+        Description :   This method makes the features and labels available as local numpy files, which the
+                        workers memory map. Arrays already memory mapped from a numpy file are used as they are.
+
+        Output      :   The paths of the features and labels files
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.share_data.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            os.makedirs(self.train_data_dir, exist_ok=True)
+
+            paths = []
+
+            for data, fname in ((X, self.features_file), (y, self.labels_file)):
+                if isinstance(data, np.memmap) and data.filename is not None:
+                    paths.append(data.filename)
+
+                    continue
+
+                path = os.path.join(self.train_data_dir, fname)
+
+                np.save(path, np.asarray(data))
+
+                paths.append(path)
+
+            self.log_writer.log(f"Shared training data as {paths}", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return paths
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def train_models(self, X, y, clusters, shared_models=None):
+        """
+        Method Name :   train_models
+        Description :   This method trains the best model for every cluster in a process pool. Every model is saved
+                        to the model bucket with the cluster number, and logged to mlflow. The shared models, like
+                        the preprocessing pipeline and the kmeans model, are logged to mlflow in the same run.
+
+        Output      :   A dict of cluster number and (model, score)
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.train_models.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            features_path, labels_path = self.share_data(X, y)
+
+            clusters = np.asarray(clusters)
+
+            cluster_idx = {
+                int(cluster): np.flatnonzero(clusters == cluster)
+                for cluster in np.unique(clusters)
+            }
+
+            n_candidates = Model_Finder(self.log_file).get_max_candidates()
+
+            n_workers, worker_cores, worker_threads = self.cpu_budget.get_worker_shares(
+                len(cluster_idx), self.n_workers, n_candidates
+            )
+
+            self.log_writer.log(
+                f"Training {len(cluster_idx)} clusters with {n_workers} workers of {worker_cores} cores",
+                **log_dic,
+            )
+
+            self.mlflow_op.set_mlflow_tracking_uri()
+
+            self.mlflow_op.set_mlflow_experiment(self.exp_name)
+
+            results = {}
+
+            with mlflow.start_run(run_name=self.run_name):
+                for model in shared_models or []:
+                    self.mlflow_op.log_model(model, model.__class__.__name__)
+
+                with ProcessPoolExecutor(
+                    max_workers=n_workers,
+                    initializer=CPU_Budget.limit_worker,
+                    initargs=(worker_cores, worker_threads),
+                ) as executor:
+                    futures = [
+                        executor.submit(
+                            self.train_cluster,
+                            features_path,
+                            labels_path,
+                            cluster,
+                            idx,
+                            self.log_file,
+                        )
+                        for cluster, idx in cluster_idx.items()
+                    ]
+
+                    for future in as_completed(futures):
+                        cluster, model, model_score, search_score = future.result()
+
+                        self.log_writer.log(
+                            f"Trained {model.__class__.__name__} for cluster {cluster} with score {model_score}",
+                            **log_dic,
+                        )
+
+                        self.s3.save_model(
+                            model,
+                            self.trained_model_dir,
+                            self.model_bucket,
+                            self.log_file,
+                            idx=cluster,
+                        )
+
+                        self.mlflow_op.log_all_for_model(model, model_score, idx=cluster)
+
+                        if search_score is not None:
+                            self.mlflow_op.log_metric(
+                                model.__class__.__name__ + str(cluster),
+                                float(search_score),
+                                metric_name="sample_cv_score",
+                            )
+
+                        results[cluster] = (model, model_score)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return results
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
@@ -0,0 +1,217 @@
+import os
+
+import numpy as np
+
+from air_pressure.data_ingestion.data_loader_train import Data_Getter_Train
+from air_pressure.data_preprocessing.chunked_preprocessing import Chunked_Preprocessor
+from air_pressure.data_preprocessing.clustering import KMeans_Clustering
+from air_pressure.data_preprocessing.preprocessing import Preprocessor
+from air_pressure.mlflow_utils.mlflow_operations import MLFlow_Operation
+from air_pressure.model_training.train_model import Train_Model
+from air_pressure.s3_bucket_operations.s3_operations import S3_Operation
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+
+class Training_Pipeline:
+    """
+    Description :   This class shall be used for running the whole training flow. The training data is
+                    preprocessed chunk by chunk, or in memory when chunked is off, the fitted preprocessing pipeline
+                    is saved next to the kmeans model and the cluster models in the trained models dir, and all of
+                    them are logged to mlflow and transitioned to the configured stage together, so that the
+                    prediction side always loads a pipeline, kmeans model and cluster models of the same training
+                    run.
+
+    Version     :   1.0
+    Revisions   :   None
+    """
+
+    def __init__(self, log_file):
+        self.log_writer = App_Logger()
+
+        self.config = read_params()
+
+        self.log_file = log_file
+
+        self.model_bucket = self.config["s3_bucket"]["air_pressure_model_bucket"]
+
+        self.trained_model_dir = self.config["model_dir"]["trained"]
+
+        self.stage = self.config["training"]["stage"]
+
+        self.stage_model_dir = {
+            "Production": self.config["model_dir"]["prod"],
+            "Staging": self.config["model_dir"]["stag"],
+        }.get(self.stage)
+
+        self.chunked = self.config["training"]["chunked"]
+
+        self.data_getter_train = Data_Getter_Train(log_file)
+
+        self.chunked_preprocessor = Chunked_Preprocessor(log_file)
+
+        self.kmeans_op = KMeans_Clustering(log_file)
+
+        self.train_model = Train_Model(log_file)
+
+        self.mlflow_op = MLFlow_Operation(log_file)
+
+        self.s3 = S3_Operation()
+
+    def remove_stale_models(self, model_names):
+        """
+        Method Name :   remove_stale_models
+        Description :   This method deletes the files of the stage dir which are not models of this training run,
+                        like the model of a cluster which was trained with another model class in an earlier run.
+                        It runs after the new models are copied, so that the stage dir never misses a model.
+
+        Output      :   The stage dir only has the models of this training run
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.remove_stale_models.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            model_files = self.s3.get_files_from_folder(
+                self.stage_model_dir, self.model_bucket, self.log_file
+            )
+
+            stale_files = [
+                model_file
+                for model_file in model_files
+                if os.path.splitext(os.path.basename(model_file))[0] not in model_names
+            ]
+
+            for model_file in stale_files:
+                self.s3.delete_file(model_file, self.model_bucket, self.log_file)
+
+            self.log_writer.log(
+                f"Removed {len(stale_files)} stale model files from {self.stage_model_dir}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def transition_models(self, model_names):
+        """
+        Method Name :   transition_models
+        Description :   This method transitions the latest version of every model to the configured stage in
+                        mlflow, copies the model files to the stage dir in the model bucket, and removes the models
+                        of earlier runs from the stage dir
+
+        Output      :   The models are transitioned to the configured stage
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.transition_models.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            for model_name in model_names:
+                model_version = self.mlflow_op.get_latest_model_version(model_name)
+
+                self.mlflow_op.transition_mlflow_model(
+                    model_version,
+                    self.stage,
+                    model_name,
+                    self.model_bucket,
+                    self.model_bucket,
+                )
+
+            if self.stage_model_dir is not None:
+                self.remove_stale_models(model_names)
+
+            self.log_writer.log(
+                f"Transitioned {model_names} to {self.stage}", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def train(self):
+        """
+        Method Name :   train
+        Description :   This method preprocesses the training data, saves the fitted preprocessing pipeline, fits
+                        the kmeans model, trains one model per cluster, and transitions all the models to the
+                        configured stage
+
+        Output      :   A dict of cluster number and (model, score)
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.train.__name__, __file__, self.log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            if self.chunked:
+                chunks = self.data_getter_train.get_data_chunks()
+
+                (
+                    pipeline,
+                    features_path,
+                    labels_path,
+                ) = self.chunked_preprocessor.fit_transform(chunks)
+
+                X = np.load(features_path, mmap_mode="r")
+
+                y = np.load(labels_path)
+
+            else:
+                data = self.data_getter_train.get_data()
+
+                pipeline, X, y = Preprocessor(self.log_file).preprocess_data(data)
+
+                X, y = X.to_numpy(), y.to_numpy(dtype=np.int8)
+
+            self.s3.save_model(
+                pipeline, self.trained_model_dir, self.model_bucket, self.log_file
+            )
+
+            n_clusters = self.kmeans_op.elbow_plot(X, y)
+
+            kmeans, clusters = self.kmeans_op.create_clusters(X, n_clusters)
+
+            results = self.train_model.train_models(
+                X, y, clusters, shared_models=[pipeline, kmeans]
+            )
+
+            model_names = [pipeline.__class__.__name__, kmeans.__class__.__name__] + [
+                model.__class__.__name__ + str(cluster)
+                for cluster, (model, _) in sorted(results.items())
+            ]
+
+            self.transition_models(model_names)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return results
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
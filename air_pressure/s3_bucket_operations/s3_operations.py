@@ -11,6 +11,7 @@ import boto3
 import pandas as pd
 from botocore.exceptions import ClientError
 
+from air_pressure.model_export.compact_model import Compact_Model
 from utils.logger import App_Logger
 from utils.read_params import get_log_dic, read_params
 
@@ -32,6 +33,14 @@ class S3_Operation:
 
         self.file_format = self.config["save_format"]
 
+        self.compact_enabled = self.config["compact_model"]["enabled"]
+
+        self.compact_file_format = self.config["compact_model"]["file_format"]
+
+        self.compact_prune = self.config["compact_model"]["prune"]
+
+        self.compact_value_dtype = self.config["compact_model"]["value_dtype"]
+
         self.s3_client = boto3.client("s3")
 
         self.s3_resource = boto3.resource("s3")
@@ -207,6 +216,43 @@ class S3_Operation:
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
 
+    def read_csv_chunks(self, fname, bucket, log_file, chunksize):
+        """
+        Method Name :   read_csv_chunks
+        Description :   This method reads the csv data from s3 bucket as a stream of chunks, without loading the
+                        whole file in memory
+
+        Output      :   An iterator of pandas dataframes with chunksize rows each
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.read_csv_chunks.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            csv_obj = self.get_file_object(fname, bucket, log_file)
+
+            body = csv_obj.get()["Body"]
+
+            chunks = pd.read_csv(body, chunksize=chunksize)
+
+            self.log_writer.log(
+                f"Opened {fname} csv file from {bucket} bucket in chunks of {chunksize} rows",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return chunks
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
     def read_csv_from_folder(self, folder_name, bucket, log_file):
         """
         Method Name :   read_csv_from_folder
@@ -566,10 +612,48 @@ class S3_Operation:
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
 
-    def load_model(self, model_name, bucket, log_file, model_dir=None):
+    def get_file_etags(self, folder_name, bucket, log_file):
+        """
+        Method Name :   get_file_etags
+        Description :   This method gets the etag of every file of a folder in s3 bucket, which changes whenever the
+                        file is written again
+
+        Output      :   A dict of file name and etag is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_file_etags.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            bucket = self.get_bucket(bucket, log_file)
+
+            etags = {
+                object.key: object.e_tag
+                for object in bucket.objects.filter(Prefix=folder_name)
+            }
+
+            self.log_writer.log(
+                f"Got etags of {len(etags)} files from {folder_name} folder", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return etags
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def load_model(self, model_name, bucket, log_file, model_dir=None, compact=False):
         """
         Method Name :   load_model
-        Description :   This method loads the model from s3 bucket
+        Description :   This method loads the model from s3 bucket. With compact, the compact export of the model is
+                        read without unpickling when it is present, otherwise the pickled model is loaded.
 
         Output      :   A pandas series object consisting of runs for the particular experiment id
         On Failure  :   Write an exception log and then raise an exception
@@ -592,6 +676,26 @@ class S3_Operation:
 
             model_file = func()
 
+            if compact is True:
+                compact_file = (
+                    model_file[: -len(self.file_format)] + self.compact_file_format
+                )
+
+                f_obj = self.get_file_object(compact_file, bucket, log_file)
+
+                if not isinstance(f_obj, list):
+                    model = Compact_Model.from_bytes(
+                        self.read_object(f_obj, log_file, decode=False)
+                    )
+
+                    self.log_writer.log(
+                        f"Loaded compact {model_name} from bucket {bucket}", **log_dic
+                    )
+
+                    self.log_writer.start_log("exit", **log_dic)
+
+                    return model
+
             self.log_writer.log(f"Got {model_file} as model file", **log_dic)
 
             f_obj = self.get_file_object(model_file, bucket, log_file)
@@ -612,7 +716,8 @@ class S3_Operation:
     def save_model(self, model, model_dir, model_bucket, log_file, idx=None):
         """
         Method Name :   save_model
-        Description :   This method saves the model into particular model directory in s3 bucket with kwargs
+        Description :   This method saves the model into particular model directory in s3 bucket with kwargs.
+                        When idx is given, it is appended to the model name, like RandomForestClassifier2
 
         Output      :   A pandas series object consisting of runs for the particular experiment id
         On Failure  :   Write an exception log and then raise an exception
@@ -629,6 +734,9 @@ class S3_Operation:
         try:
             model_name = model.__class__.__name__
 
+            if idx is not None:
+                model_name = model_name + str(idx)
+
             model_file = model_name + self.file_format
 
             with open(file=model_file, mode="wb") as f:
@@ -655,6 +763,13 @@ class S3_Operation:
                 f"Uploaded  {model_file} to {model_bucket} bucket", **log_dic
             )
 
+            if self.compact_enabled is True and isinstance(
+                model, Compact_Model.supported_models
+            ):
+                self.save_compact_model(
+                    model, model_name, model_dir, model_bucket, log_file
+                )
+
             self.log_writer.start_log("exit", **log_dic)
 
         except Exception as e:
@@ -664,6 +779,194 @@ class S3_Operation:
 
             self.log_writer.exception_log(e, **log_dic)
 
+    def save_compact_model(self, model, model_name, model_dir, model_bucket, log_file):
+        """
+        Method Name :   save_compact_model
+        Description :   This method saves the compact export of the model next to the pickled model in s3 bucket
+
+        Output      :   The compact model is uploaded to s3 bucket
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.save_compact_model.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            compact_model = Compact_Model.from_model(
+                model, prune=self.compact_prune, value_dtype=self.compact_value_dtype
+            )
+
+            compact_file = model_name + self.compact_file_format
+
+            with open(file=compact_file, mode="wb") as f:
+                f.write(compact_model.to_bytes())
+
+            self.log_writer.log(
+                f"Saved compact {model_name} model as {compact_file} name", **log_dic
+            )
+
+            self.upload_file(
+                compact_file,
+                model_dir + "/" + compact_file,
+                model_bucket,
+                log_file,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def create_multipart_upload(self, fname, bucket, log_file):
+        """
+        Method Name :   create_multipart_upload
+        Description :   This method starts a multipart upload of a file to s3 bucket, so that the file can be uploaded
+                        in parts while it is being written
+
+        Output      :   The upload id of the multipart upload is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.create_multipart_upload.__name__,
+            __file__,
+            log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            upload = self.s3_client.create_multipart_upload(Bucket=bucket, Key=fname)
+
+            self.log_writer.log(
+                f"Started multipart upload of {fname} to {bucket} bucket", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return upload["UploadId"]
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def upload_part(self, data, fname, bucket, upload_id, part_number, log_file):
+        """
+        Method Name :   upload_part
+        Description :   This method uploads bytes as a part of a multipart upload. Every part except the last one
+                        must be at least 5 MB.
+
+        Output      :   A dict of part number and etag of the uploaded part is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.upload_part.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            part = self.s3_client.upload_part(
+                Bucket=bucket,
+                Key=fname,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=data,
+            )
+
+            self.log_writer.log(
+                f"Uploaded part {part_number} of {fname} with {len(data)} bytes",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return {"ETag": part["ETag"], "PartNumber": part_number}
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def complete_multipart_upload(self, fname, bucket, upload_id, parts, log_file):
+        """
+        Method Name :   complete_multipart_upload
+        Description :   This method completes a multipart upload, which creates the file from the uploaded parts
+
+        Output      :   The file is created in s3 bucket
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.complete_multipart_upload.__name__,
+            __file__,
+            log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            self.s3_client.complete_multipart_upload(
+                Bucket=bucket,
+                Key=fname,
+                UploadId=upload_id,
+                MultipartUpload={
+                    "Parts": sorted(parts, key=lambda part: part["PartNumber"])
+                },
+            )
+
+            self.log_writer.log(
+                f"Uploaded {fname} to {bucket} bucket in {len(parts)} parts", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def abort_multipart_upload(self, fname, bucket, upload_id, log_file):
+        """
+        Method Name :   abort_multipart_upload
+        Description :   This method aborts a multipart upload, which removes the parts uploaded so far
+
+        Output      :   The multipart upload is aborted
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.abort_multipart_upload.__name__,
+            __file__,
+            log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            self.s3_client.abort_multipart_upload(
+                Bucket=bucket, Key=fname, UploadId=upload_id
+            )
+
+            self.log_writer.log(f"Aborted multipart upload of {fname}", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
     def upload_df_as_csv(self, data_frame, local_fname, bucket_fname, bucket, log_file):
         """
         Method Name :   upload_df_as_csv
@@ -0,0 +1,9 @@
+from air_pressure.model_serving.load_generator import Load_Generator
+from utils.read_params import read_params
+
+if __name__ == "__main__":
+    config = read_params()
+
+    load_generator = Load_Generator(config["log"]["benchmark"])
+
+    load_generator.run()
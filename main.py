@@ -0,0 +1,9 @@
+from air_pressure.model_serving.prediction_service import Prediction_Service
+from utils.read_params import read_params
+
+if __name__ == "__main__":
+    config = read_params()
+
+    service = Prediction_Service(config["log"]["pred_service"])
+
+    service.serve()
@@ -0,0 +1,41 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+from sklearn.base import clone
+from sklearn.datasets import make_classification
+from sklearn.ensemble import AdaBoostClassifier, RandomForestClassifier
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, ROOT_DIR)
+
+
+@pytest.fixture(autouse=True)
+def root_dir(monkeypatch):
+    monkeypatch.chdir(ROOT_DIR)
+
+
+@pytest.fixture(scope="session")
+def classification_data():
+    X, y = make_classification(
+        n_samples=1500, n_features=12, weights=[0.9], random_state=0
+    )
+
+    return X.astype(np.float32), y, X[:700].astype(np.float32)
+
+
+@pytest.fixture(
+    scope="session",
+    params=[
+        RandomForestClassifier(n_estimators=25, max_depth=8, random_state=0),
+        RandomForestClassifier(n_estimators=10, random_state=1),
+        AdaBoostClassifier(n_estimators=30, random_state=0),
+    ],
+    ids=["random_forest", "deep_random_forest", "ada_boost"],
+)
+def tree_model(request, classification_data):
+    X, y, _ = classification_data
+
+    return clone(request.param).fit(X, y)
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from air_pressure.model_export.compact_model import Compact_Model
+
+
+def get_threshold_rows(model, X):
+    rows = []
+
+    for estimator in model.estimators_[:10]:
+        tree = estimator.tree_
+
+        if tree.node_count > 1:
+            row = X[:5].copy()
+
+            row[:, tree.feature[0]] = tree.threshold[0]
+
+            rows.append(row)
+
+    return np.vstack(rows)
+
+
+@pytest.mark.parametrize("prune", [True, False])
+def test_predictions_match_model(tree_model, classification_data, prune):
+    _, _, X_test = classification_data
+
+    compact = Compact_Model.from_model(tree_model, prune=prune)
+
+    np.testing.assert_array_equal(compact.predict(X_test), tree_model.predict(X_test))
+
+    np.testing.assert_allclose(
+        compact.predict_proba(X_test), tree_model.predict_proba(X_test), atol=1e-12
+    )
+
+
+def test_predictions_match_model_at_thresholds(tree_model, classification_data):
+    _, _, X_test = classification_data
+
+    X_edge = get_threshold_rows(tree_model, X_test)
+
+    compact = Compact_Model.from_model(tree_model)
+
+    np.testing.assert_array_equal(compact.predict(X_edge), tree_model.predict(X_edge))
+
+
+def test_pruning_keeps_fewer_nodes(tree_model):
+    pruned = Compact_Model.from_model(tree_model, prune=True)
+
+    unpruned = Compact_Model.from_model(tree_model, prune=False)
+
+    assert len(pruned.threshold) <= len(unpruned.threshold)
+
+
+def test_bytes_round_trip(tree_model, classification_data):
+    _, _, X_test = classification_data
+
+    compact = Compact_Model.from_model(tree_model)
+
+    loaded = Compact_Model.from_bytes(compact.to_bytes())
+
+    assert loaded.model_name == tree_model.__class__.__name__
+
+    np.testing.assert_array_equal(loaded.classes_, tree_model.classes_)
+
+    np.testing.assert_array_equal(loaded.predict(X_test), tree_model.predict(X_test))
+
+
+def test_read_only_arrays(tree_model, classification_data):
+    _, _, X_test = classification_data
+
+    compact = Compact_Model.from_model(tree_model)
+
+    compact.set_read_only()
+
+    assert not compact.threshold.flags.writeable
+
+    np.testing.assert_array_equal(compact.predict(X_test), tree_model.predict(X_test))
+
+
+def test_unsupported_model(classification_data):
+    X, y, _ = classification_data
+
+    with pytest.raises(TypeError):
+        Compact_Model.from_model(LogisticRegression().fit(X, y))
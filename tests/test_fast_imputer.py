@@ -0,0 +1,129 @@
+import pickle
+
+import numpy as np
+import pytest
+from sklearn.impute import KNNImputer
+
+from air_pressure.data_preprocessing.fast_imputer import Fast_Imputer
+
+
+@pytest.fixture(scope="module")
+def reference():
+    return np.random.default_rng(0).normal(size=(400, 8))
+
+
+@pytest.fixture(scope="module")
+def values():
+    rng = np.random.default_rng(1)
+
+    values = rng.normal(size=(300, 8))
+
+    values[rng.random(values.shape) < 0.25] = np.nan
+
+    values[0] = np.nan
+
+    return values
+
+
+@pytest.mark.parametrize("weights", ["uniform", "distance"])
+def test_imputed_values_match_knn_imputer(reference, values, weights):
+    expected = KNNImputer(n_neighbors=3, weights=weights).fit(reference)
+
+    imputer = Fast_Imputer(
+        reference, n_neighbors=3, weights=weights, n_candidates=len(reference)
+    )
+
+    np.testing.assert_allclose(
+        imputer.transform(values), expected.transform(values), rtol=1e-9, atol=1e-12
+    )
+
+
+def test_observed_values_are_kept(reference, values):
+    imputed = Fast_Imputer(reference).transform(values)
+
+    observed = ~np.isnan(values)
+
+    np.testing.assert_array_equal(imputed[observed], values[observed])
+
+    assert not np.isnan(imputed).any()
+
+
+def test_reference_is_sampled(reference):
+    imputer = Fast_Imputer(reference, reference_size=100, random_state=0)
+
+    again = Fast_Imputer(reference, reference_size=100, random_state=0)
+
+    assert imputer.reference.shape == (100, reference.shape[1])
+
+    np.testing.assert_array_equal(imputer.reference, again.reference)
+
+
+def test_candidates_find_most_neighbours():
+    rng = np.random.default_rng(3)
+
+    loadings = rng.normal(size=(3, 12))
+
+    reference = rng.normal(size=(2000, 3)) @ loadings
+
+    reference += 0.3 * rng.normal(size=reference.shape)
+
+    values = rng.normal(size=(300, 3)) @ loadings
+
+    values += 0.3 * rng.normal(size=values.shape)
+
+    values[rng.random(values.shape) < 0.25] = np.nan
+
+    expected = KNNImputer(n_neighbors=3).fit(reference).transform(values)
+
+    imputed = Fast_Imputer(reference, n_neighbors=3, n_candidates=100).transform(values)
+
+    missing = np.isnan(values)
+
+    close = np.isclose(imputed[missing], expected[missing], rtol=1e-9, atol=1e-12)
+
+    mean_error = np.abs(expected - reference.mean(axis=0))[missing].mean()
+
+    assert close.mean() > 0.85
+
+    assert np.abs(imputed - expected)[missing].mean() < 0.1 * mean_error
+
+
+def test_rows_of_unseen_patterns_do_not_build_trees(reference, monkeypatch):
+    imputer = Fast_Imputer(reference, n_candidates=len(reference))
+
+    expected = KNNImputer(n_neighbors=3).fit(reference)
+
+    built = []
+
+    monkeypatch.setattr(
+        "air_pressure.data_preprocessing.fast_imputer.BallTree",
+        lambda *args, **kwargs: built.append(args),
+    )
+
+    rng = np.random.default_rng(2)
+
+    for row in rng.normal(size=(50, reference.shape[1])):
+        row[rng.random(len(row)) < 0.5] = np.nan
+
+        np.testing.assert_allclose(
+            imputer.transform(row[np.newaxis]),
+            expected.transform(row[np.newaxis]),
+            rtol=1e-9,
+            atol=1e-12,
+        )
+
+    assert built == []
+
+
+def test_tree_is_not_pickled(reference, values):
+    imputer = Fast_Imputer(reference, batch_size=16)
+
+    expected = imputer.transform(values)
+
+    state = imputer.__getstate__()
+
+    assert state["tree"] is None
+
+    loaded = pickle.loads(pickle.dumps(imputer))
+
+    np.testing.assert_array_equal(loaded.transform(values), expected)
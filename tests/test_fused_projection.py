@@ -0,0 +1,134 @@
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.decomposition import PCA, IncrementalPCA
+from sklearn.impute import SimpleImputer
+from sklearn.preprocessing import StandardScaler
+
+from air_pressure.data_preprocessing.fused_projection import Fused_Projection
+from air_pressure.data_preprocessing.preprocessing_pipeline import (
+    Preprocessing_Pipeline,
+)
+
+
+@pytest.fixture(scope="module")
+def values():
+    rng = np.random.default_rng(0)
+
+    values = rng.normal(size=(500, 15)) * rng.uniform(0.1, 1000, size=15)
+
+    values[:, [3, 9]] = 7.0
+
+    return values
+
+
+@pytest.mark.parametrize(
+    "scaler, pca",
+    [
+        (StandardScaler(), PCA(n_components=5)),
+        (StandardScaler(), PCA(n_components=5, whiten=True)),
+        (StandardScaler(with_mean=False), PCA(n_components=5)),
+        (StandardScaler(), IncrementalPCA(n_components=5)),
+    ],
+    ids=["pca", "whiten", "without_mean", "incremental_pca"],
+)
+def test_projection_matches_scaler_and_pca(values, scaler, pca):
+    kept_idx = np.array([i for i in range(values.shape[1]) if i not in (3, 9)])
+
+    kept = values[:, kept_idx]
+
+    pca.fit(scaler.fit_transform(kept))
+
+    expected = pca.transform(scaler.transform(kept))
+
+    projection = Fused_Projection(
+        scaler, pca, kept_idx, values.shape[1], dtype=np.float64
+    )
+
+    np.testing.assert_allclose(
+        projection.transform(values), expected, rtol=1e-9, atol=1e-9
+    )
+
+
+def test_float32_projection(values):
+    scaler = StandardScaler().fit(values)
+
+    pca = PCA(n_components=5).fit(scaler.transform(values))
+
+    expected = pca.transform(scaler.transform(values))
+
+    projection = Fused_Projection(
+        scaler, pca, np.arange(values.shape[1]), values.shape[1]
+    )
+
+    components = projection.transform(values)
+
+    assert components.dtype == np.float32
+
+    np.testing.assert_allclose(components, expected, rtol=1e-4, atol=1e-3)
+
+
+def test_buffer_is_reused_per_thread(values):
+    scaler = StandardScaler().fit(values)
+
+    pca = PCA(n_components=5).fit(scaler.transform(values))
+
+    projection = Fused_Projection(
+        scaler, pca, np.arange(values.shape[1]), values.shape[1], dtype=np.float64
+    )
+
+    expected = projection.transform(values)
+
+    first = projection.transform(values, reuse_buffer=True)
+
+    np.testing.assert_array_equal(first, expected)
+
+    second = projection.transform(values[:100], reuse_buffer=True)
+
+    assert np.shares_memory(first, second)
+
+    np.testing.assert_array_equal(second, expected[:100])
+
+    with ThreadPoolExecutor(1) as executor:
+        other = executor.submit(
+            projection.transform, values[:100], reuse_buffer=True
+        ).result()
+
+    assert not np.shares_memory(other, second)
+
+    loaded = pickle.loads(pickle.dumps(projection))
+
+    np.testing.assert_array_equal(loaded.transform(values, reuse_buffer=True), expected)
+
+
+def test_fused_pipeline_matches_pipeline(values):
+    columns = [f"aa_{i:03d}" for i in range(values.shape[1])]
+
+    data = pd.DataFrame(values, columns=columns)
+
+    data[data > 500] = np.nan
+
+    imputer = SimpleImputer().fit(data.to_numpy())
+
+    zero_std_cols = [columns[3], columns[9]]
+
+    kept = pd.DataFrame(imputer.transform(data.to_numpy()), columns=columns)
+
+    kept = kept.drop(columns=zero_std_cols).to_numpy()
+
+    scaler = StandardScaler().fit(kept)
+
+    pca = PCA(n_components=5).fit(scaler.transform(kept))
+
+    pipeline = Preprocessing_Pipeline(
+        columns, imputer, scaler, pca, zero_std_cols, dtype=np.float64
+    )
+
+    expected = pipeline.transform(data)
+
+    pipeline.fuse()
+
+    np.testing.assert_allclose(pipeline.transform(data), expected, rtol=1e-9, atol=1e-9)
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from air_pressure.model_export.compact_model import Compact_Model
+from air_pressure.model_predictions.inference_engine import Flat_Tree_Engine
+
+
+@pytest.mark.parametrize("batch_size, levels_per_round", [(4096, 8), (128, 3), (1, 1)])
+def test_predictions_match_model(
+    tree_model, classification_data, batch_size, levels_per_round
+):
+    _, _, X_test = classification_data
+
+    engine = Flat_Tree_Engine(
+        tree_model, batch_size=batch_size, levels_per_round=levels_per_round
+    )
+
+    np.testing.assert_array_equal(engine.predict(X_test), tree_model.predict(X_test))
+
+    np.testing.assert_allclose(
+        engine.predict_proba(X_test), tree_model.predict_proba(X_test), atol=1e-12
+    )
+
+
+def test_leaves_match_compact_model(tree_model, classification_data):
+    _, _, X_test = classification_data
+
+    compact = Compact_Model.from_model(tree_model)
+
+    engine = Flat_Tree_Engine(compact, batch_size=256)
+
+    np.testing.assert_array_equal(engine.apply(X_test), compact.apply(X_test))
+
+
+def test_empty_batch(tree_model, classification_data):
+    _, _, X_test = classification_data
+
+    engine = Flat_Tree_Engine(tree_model)
+
+    assert len(engine.predict(X_test[:0])) == 0
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from air_pressure.data_preprocessing.missing_indicator import Missing_Indicator
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+
+    columns = [f"ag_00{i}" for i in range(6)]
+
+    columns += ["aa_000", "ab_000", "cs_000", "cs_001"]
+
+    values = rng.normal(size=(200, len(columns)))
+
+    values[rng.random(values.shape) < 0.3] = np.nan
+
+    return pd.DataFrame(values, columns=columns)
+
+
+def test_groups_are_prefixes_shared_by_columns(data):
+    indicator = Missing_Indicator(data.columns)
+
+    assert indicator.groups == ["ag", "cs"]
+
+    assert indicator.feature_names == ["missing_count", "ag_missing", "cs_missing"]
+
+
+def test_bitmap_packs_missing_pattern(data):
+    indicator = Missing_Indicator(data.columns)
+
+    bitmap = indicator.get_bitmap(data)
+
+    assert bitmap.dtype == np.uint8
+
+    assert bitmap.shape == (len(data), 2)
+
+    unpacked = np.unpackbits(bitmap, axis=1)[:, : len(data.columns)]
+
+    np.testing.assert_array_equal(unpacked.astype(bool), data.isna().to_numpy())
+
+
+def test_features_match_dense_mask(data):
+    indicator = Missing_Indicator(data.columns)
+
+    features = indicator.get_features(indicator.get_bitmap(data))
+
+    mask = data.isna()
+
+    expected = np.column_stack(
+        [
+            mask.sum(axis=1),
+            mask.filter(like="ag_").any(axis=1),
+            mask.filter(like="cs_").any(axis=1),
+        ]
+    )
+
+    assert features.dtype == np.float32
+
+    np.testing.assert_array_equal(features, expected)
+
+
+def test_bitmap_uses_fitted_column_order(data):
+    indicator = Missing_Indicator(data.columns)
+
+    shuffled = data[data.columns[::-1]]
+
+    np.testing.assert_array_equal(
+        indicator.get_bitmap(shuffled), indicator.get_bitmap(data)
+    )
@@ -0,0 +1,186 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from air_pressure.model_predictions.model_registry import Model_Registry
+
+
+class Null_Logger:
+    def log(self, *args, **kwargs):
+        pass
+
+    def start_log(self, *args, **kwargs):
+        pass
+
+    def exception_log(self, exception, *args, **kwargs):
+        raise exception
+
+
+class Model_Loader:
+    def __init__(self, size=96, delay=0.0, fail=False):
+        self.size = size
+
+        self.delay = delay
+
+        self.fail = fail
+
+        self.loads = []
+
+        self.lock = Lock()
+
+    def __call__(self, cluster):
+        with self.lock:
+            self.loads.append(cluster)
+
+        time.sleep(self.delay)
+
+        if self.fail:
+            raise RuntimeError(f"Model of cluster {cluster} could not be loaded")
+
+        return np.full(self.size // 8, cluster, dtype=np.float64)
+
+
+def get_registry(loader, clusters=range(4), max_bytes=None):
+    registry = Model_Registry(loader, clusters, "test.log", max_bytes=max_bytes)
+
+    registry.log_writer = Null_Logger()
+
+    return registry
+
+
+def test_concurrent_gets_load_model_once():
+    loader = Model_Loader(delay=0.2)
+
+    registry = get_registry(loader)
+
+    with ThreadPoolExecutor(16) as executor:
+        models = list(executor.map(registry.get, [1] * 16))
+
+    assert loader.loads == [1]
+
+    assert all(model is models[0] for model in models)
+
+    assert registry.loading == {}
+
+
+def test_concurrent_gets_of_clusters_load_each_once():
+    loader = Model_Loader(delay=0.05)
+
+    registry = get_registry(loader)
+
+    with ThreadPoolExecutor(16) as executor:
+        models = list(executor.map(registry.get, [0, 1, 2, 3] * 8))
+
+    assert sorted(loader.loads) == [0, 1, 2, 3]
+
+    assert [model[0] for model in models] == [0, 1, 2, 3] * 8
+
+    assert registry.n_bytes == 384
+
+
+def test_load_failure_is_raised_to_all_waiters():
+    loader = Model_Loader(delay=0.2, fail=True)
+
+    registry = get_registry(loader)
+
+    with ThreadPoolExecutor(8) as executor:
+        futures = [executor.submit(registry.get, 2) for _ in range(8)]
+
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result()
+
+    assert loader.loads == [2]
+
+    assert registry.loading == {}
+
+    assert registry.models == {}
+
+    loader.fail = False
+
+    assert registry.get(2)[0] == 2
+
+
+def test_unknown_cluster_raises_key_error():
+    registry = get_registry(Model_Loader())
+
+    with pytest.raises(KeyError):
+        registry.get(7)
+
+
+def test_least_recently_used_models_are_evicted_above_max_bytes():
+    loader = Model_Loader()
+
+    registry = get_registry(loader, max_bytes=240)
+
+    registry.get(0)
+
+    registry.get(1)
+
+    registry.get(0)
+
+    registry.get(2)
+
+    assert list(registry.models) == [0, 2]
+
+    assert registry.n_bytes == 192
+
+    registry.get(1)
+
+    assert loader.loads == [0, 1, 2, 1]
+
+
+def test_model_above_max_bytes_is_kept():
+    registry = get_registry(Model_Loader(size=400), max_bytes=240)
+
+    registry.get(0)
+
+    registry.get(1)
+
+    assert list(registry.models) == [1]
+
+
+def test_prewarm_keep_all_keeps_every_model():
+    loader = Model_Loader()
+
+    registry = get_registry(loader, max_bytes=144)
+
+    registry.prewarm(range(4), keep_all=True)
+
+    assert list(registry.models) == [0, 1, 2, 3]
+
+    assert len(registry.values()) == 4
+
+    assert registry.max_bytes is None
+
+
+def test_model_size_counts_tree_arrays():
+    X = np.random.default_rng(0).normal(size=(500, 10))
+
+    y = (X[:, 0] + X[:, 1] > 0).astype(int)
+
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y)
+
+    tree_bytes = sum(
+        est.tree_.__getstate__()["nodes"].nbytes + est.tree_.value.nbytes
+        for est in model.estimators_
+    )
+
+    size = Model_Registry.get_model_size(model)
+
+    assert tree_bytes <= size < tree_bytes * 1.1
+
+    assert Model_Registry.get_model_size([model, model]) == size
+
+
+def test_loaded_clusters_are_listed_from_least_recently_used():
+    registry = get_registry(Model_Loader())
+
+    for cluster in [2, 0, 3, 2]:
+        registry.get(cluster)
+
+    assert registry.get_loaded_clusters() == [0, 3, 2]
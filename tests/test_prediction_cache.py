@@ -0,0 +1,125 @@
+from threading import Thread
+
+import numpy as np
+import pandas as pd
+
+from air_pressure.model_serving.prediction_cache import Prediction_Cache
+
+
+def get_preds(keys, version):
+    return keys.astype(np.int64) * 10 + version
+
+
+def test_keys_do_not_depend_on_dtype():
+    cache = Prediction_Cache()
+
+    data = pd.DataFrame({"aa_000": [1.0, np.nan, 3.0], "ab_000": [4.0, 5.0, np.nan]})
+
+    as_text = data.astype(str).replace("nan", np.nan)
+
+    np.testing.assert_array_equal(cache.get_keys(data), cache.get_keys(as_text))
+
+    assert len(set(cache.get_keys(data).tolist())) == 3
+
+
+def test_least_recently_used_rows_are_evicted():
+    cache = Prediction_Cache(max_size=3)
+
+    cache.set_version(1)
+
+    keys = np.arange(4, dtype=np.uint64)
+
+    cache.put(keys[:3], get_preds(keys[:3], 1), 1)
+
+    cache.get(keys[:1], 1)
+
+    cache.put(keys[3:], get_preds(keys[3:], 1), 1)
+
+    _, missing = cache.get(keys, 1)
+
+    np.testing.assert_array_equal(missing, [False, True, False, False])
+
+
+def test_requests_of_old_version_do_not_change_cache():
+    cache = Prediction_Cache()
+
+    keys = np.arange(10, dtype=np.uint64)
+
+    cache.set_version(2)
+
+    cache.put(keys, get_preds(keys, 2), 2)
+
+    _, missing = cache.get(keys, 1)
+
+    cache.put(keys, get_preds(keys, 1), 1)
+
+    preds, missing_new = cache.get(keys, 2)
+
+    assert missing.all()
+
+    assert not missing_new.any()
+
+    np.testing.assert_array_equal(preds, get_preds(keys, 2))
+
+    assert cache.get_stats()["version"] == 2
+
+
+def test_concurrent_requests_during_reloads():
+    cache = Prediction_Cache(max_size=500)
+
+    cache.set_version(0)
+
+    rng = np.random.default_rng(0)
+
+    batches = [
+        rng.choice(2000, size=50, replace=False).astype(np.uint64) for _ in range(400)
+    ]
+
+    state = {"version": 0, "lookups": 0}
+
+    errors = []
+
+    def request(worker):
+        try:
+            for i, keys in enumerate(batches[worker::8]):
+                version = state["version"] - (i % 3 == 0)
+
+                preds, missing = cache.get(keys, version)
+
+                expected = get_preds(keys, version)
+
+                if not np.array_equal(preds[~missing], expected[~missing]):
+                    errors.append((version, keys))
+
+                cache.put(keys[missing], get_preds(keys[missing], version), version)
+
+                assert len(cache.entries) <= cache.max_size
+
+        except Exception as e:
+            errors.append(e)
+
+    def reload():
+        for version in range(1, 20):
+            state["version"] = version
+
+            cache.set_version(version)
+
+    threads = [Thread(target=request, args=(worker,)) for worker in range(8)]
+
+    threads.append(Thread(target=reload))
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    stats = cache.get_stats()
+
+    assert errors == []
+
+    assert stats["version"] == 19
+
+    assert stats["size"] <= 500
+
+    assert stats["hits"] + stats["misses"] == sum(len(keys) for keys in batches)
@@ -0,0 +1,113 @@
+import pytest
+
+pytest.importorskip("boto3")
+
+pytest.importorskip("mlflow")
+
+from air_pressure.model_predictions.prediction_from_model import Prediction
+from air_pressure.model_training.training_pipeline import Training_Pipeline
+
+
+class Null_Logger:
+    def log(self, *args, **kwargs):
+        pass
+
+    def start_log(self, *args, **kwargs):
+        pass
+
+    def exception_log(self, exception, *args, **kwargs):
+        raise exception
+
+
+class Fake_S3:
+    def __init__(self):
+        self.files = {}
+
+    def copy_data(self, from_fname, from_bucket, to_fname, to_bucket, log_file):
+        self.files[(to_bucket, to_fname)] = self.files[(from_bucket, from_fname)]
+
+    def delete_file(self, fname, bucket, log_file):
+        del self.files[(bucket, fname)]
+
+    def get_files_from_folder(self, folder_name, bucket, log_file):
+        return sorted(
+            fname
+            for file_bucket, fname in self.files
+            if file_bucket == bucket and fname.startswith(folder_name + "/")
+        )
+
+
+class Fake_Client:
+    def transition_model_version_stage(self, name, version, stage):
+        pass
+
+
+def get_training_pipeline(s3, monkeypatch):
+    monkeypatch.setenv("MLFLOW_TRACKING_URI", "http://localhost")
+
+    training_pipeline = Training_Pipeline("test.log")
+
+    training_pipeline.s3 = training_pipeline.mlflow_op.s3 = s3
+
+    training_pipeline.log_writer = Null_Logger()
+
+    training_pipeline.mlflow_op.log_writer = Null_Logger()
+
+    training_pipeline.mlflow_op.get_latest_model_version = lambda model_name: 1
+
+    training_pipeline.mlflow_op.get_mlflow_client = lambda server_uri: Fake_Client()
+
+    training_pipeline.stage = "Production"
+
+    training_pipeline.stage_model_dir = training_pipeline.config["model_dir"]["prod"]
+
+    return training_pipeline
+
+
+def train(training_pipeline, s3, model_names):
+    bucket = training_pipeline.model_bucket
+
+    for model_name in model_names:
+        model_file = f"{training_pipeline.trained_model_dir}/{model_name}.sav"
+
+        s3.files[(bucket, model_file)] = model_name
+
+    training_pipeline.transition_models(model_names)
+
+
+def test_cluster_with_new_model_class_serves_new_model(monkeypatch):
+    s3 = Fake_S3()
+
+    training_pipeline = get_training_pipeline(s3, monkeypatch)
+
+    shared_models = ["Preprocessing_Pipeline", "KMeans"]
+
+    first_run = ["AdaBoostClassifier0", "RandomForestClassifier2"]
+
+    second_run = ["AdaBoostClassifier0", "AdaBoostClassifier2"]
+
+    train(training_pipeline, s3, shared_models + first_run)
+
+    train(training_pipeline, s3, shared_models + second_run)
+
+    prediction = Prediction("test.log")
+
+    prediction.s3 = s3
+
+    prediction.log_writer = Null_Logger()
+
+    assert prediction.get_cluster_model_names() == {
+        0: "AdaBoostClassifier0",
+        2: "AdaBoostClassifier2",
+    }
+
+    prod_files = s3.get_files_from_folder(
+        training_pipeline.stage_model_dir, training_pipeline.model_bucket, "test.log"
+    )
+
+    assert prod_files == [
+        "production/AdaBoostClassifier0.sav",
+        "production/AdaBoostClassifier2.sav",
+        "production/KMeans.sav",
+        "production/Preprocessing_Pipeline.sav",
+    ]
@@ -0,0 +1,9 @@
+from air_pressure.model_training.training_pipeline import Training_Pipeline
+from utils.read_params import read_params
+
+if __name__ == "__main__":
+    config = read_params()
+
+    training_pipeline = Training_Pipeline(config["log"]["train_main"])
+
+    training_pipeline.train()
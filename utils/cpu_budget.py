@@ -0,0 +1,222 @@
+import os
+
+from threadpoolctl import threadpool_limits
+
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+
+class CPU_Budget:
+    """
+    Description :   This class shall be used to share a configured number of cores between the levels of
+                    parallelism in training, which are the cluster workers, the cv folds of the search, the
+                    estimator threads and the BLAS threads. A worker process gets its share of cores through an
+                    environment variable, so that every level inside the worker divides only that share.
+
+    Version     :   1.0
+    Revisions   :   None
+    """
+
+    budget_env_var = "AIR_PRESSURE_CPU_BUDGET"
+
+    thread_env_vars = (
+        "OMP_NUM_THREADS",
+        "OPENBLAS_NUM_THREADS",
+        "MKL_NUM_THREADS",
+        "BLIS_NUM_THREADS",
+        "VECLIB_MAXIMUM_THREADS",
+        "NUMEXPR_NUM_THREADS",
+    )
+
+    def __init__(self, log_file):
+        self.log_writer = App_Logger()
+
+        self.config = read_params()
+
+        self.log_file = log_file
+
+        self.n_cores = self.config["cpu_budget"]["n_cores"]
+
+        self.cv = self.config["model_utils"]["cv"]
+
+    @staticmethod
+    def limit_worker(n_cores, n_threads):
+        """
+        Method Name :   limit_worker
+        Description :   This method is the initializer of the worker processes. It sets the core budget of the worker,
+                        and limits the BLAS and OpenMP threads of the worker and of the processes it starts.
+
+        Output      :   The core budget and thread limits are set for the worker process
+        On Failure  :   Raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        try:
+            os.environ[CPU_Budget.budget_env_var] = str(n_cores)
+
+            for env_var in CPU_Budget.thread_env_vars:
+                os.environ[env_var] = str(n_threads)
+
+            threadpool_limits(limits=n_threads)
+
+        except Exception as e:
+            raise e
+
+    def get_cores(self):
+        """
+        Method Name :   get_cores
+        Description :   This method gets the number of cores available to the current process. Inside a worker
+                        process it is the share given by the parent, otherwise it is n_cores from params.yaml,
+                        where -1 means all the cores the process may run on.
+
+        Output      :   The number of cores
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_cores.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        try:
+            if self.budget_env_var in os.environ:
+                return int(os.environ[self.budget_env_var])
+
+            available = (
+                len(os.sched_getaffinity(0))
+                if hasattr(os, "sched_getaffinity")
+                else os.cpu_count()
+            )
+
+            return available if self.n_cores == -1 else min(self.n_cores, available)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_n_jobs(self, n_jobs=-1):
+        """
+        Method Name :   get_n_jobs
+        Description :   This method caps a configured n_jobs by the cores available to the current process. -1 means
+                        all the available cores.
+
+        Output      :   The number of jobs
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_n_jobs.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        try:
+            n_cores = self.get_cores()
+
+            return n_cores if n_jobs == -1 else max(1, min(n_jobs, n_cores))
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_worker_shares(self, n_tasks, n_workers=-1, n_candidates=1):
+        """
+        Method Name :   get_worker_shares
+        Description :   This method splits the cores between worker processes, one per task up to the number of cores
+                        or the configured n_workers, and finds the BLAS threads each worker may use after its search
+                        jobs over n_candidates candidates are given their cores
+
+        Output      :   The number of workers, the cores per worker and the threads per worker
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_worker_shares.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            n_workers = max(1, min(n_tasks, self.get_n_jobs(n_workers)))
+
+            worker_cores = max(1, self.get_cores() // n_workers)
+
+            worker_threads = max(
+                1, worker_cores // min(n_candidates * self.cv, worker_cores)
+            )
+
+            self.log_writer.log(
+                f"Split {self.get_cores()} cores into {n_workers} workers with {worker_cores} cores and {worker_threads} threads each",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return n_workers, worker_cores, worker_threads
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_search_jobs(self, n_jobs=-1, n_candidates=1):
+        """
+        Method Name :   get_search_jobs
+        Description :   This method gets the number of parallel jobs for the hyperparameter search, which is at most
+                        the number of fits of the search, n_candidates times the number of cv folds, so that the
+                        cores which no fit would run on are left to the estimator threads
+
+        Output      :   The number of search jobs
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_search_jobs.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        try:
+            return min(n_candidates * self.cv, self.get_n_jobs(n_jobs))
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_estimator_jobs(self, n_jobs=-1, n_candidates=1):
+        """
+        Method Name :   get_estimator_jobs
+        Description :   This method gets the number of threads for a single estimator fit, from the cores left after
+                        the search jobs
+
+        Output      :   The number of estimator threads
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.0
+        Revisions   :   None
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_estimator_jobs.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        try:
+            return max(
+                1, self.get_cores() // self.get_search_jobs(n_jobs, n_candidates)
+            )
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
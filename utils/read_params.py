@@ -1,7 +1,7 @@
 import yaml
 
 
-def read_params(config_path="parmas.yaml"):
+def read_params(config_path="params.yaml"):
     """
     Method Name :    read_params
     Description :    This method gets extra log params as dict